@@ -1,104 +1,152 @@
 # Project Imports
 import utilities.logger as logger
+import utilities.tracing as tracing
+import utilities.metrics as metrics
 import predict as prediction_module
 import algorithms.graph as graph_maker
+import algorithms.csr as csr
+from utilities.time import SLOT_MINUTES
 
 # Library Imports
 import heapq
 import random
 
 PATH_COST = 1
+INTERSECTION_DELAY = 0.00833333  # traffic light delay in hours
 
-heuristic_dict = {}
-flow_dict = {}
+SEARCH_SECONDS = metrics.STAGE_SECONDS.labels("search")
+EXPANSIONS = metrics.histogram(
+    "tps_search_expansions", "Nodes expanded per search", ["algorithm"], buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+).labels("astar")
+SEARCHES = metrics.counter("tps_searches_total", "Searches run, by whether a path was found", ["algorithm", "result"])
 
-def heuristic_function(nodeStart, nodeEnd, date_time, model):
-    global overall_time, overall_distance
+class SearchCancelled(Exception):
+    # Raised out of a search when its cancel event is set, e.g. from the GUI
+    pass
 
-    print(f"Calculating heuristic cost for NodeStart -> {nodeStart}, NodeEnd -> {nodeEnd}")
+def predict_node_flow(graph, node, date_time, model, horizon=0):
+    return prediction_module.predict_new_model(
+        str(graph.scats[graph.node_scat[node]]), date_time, graph.direction_name(node), model, horizon
+    )
 
-    end_scat = nodeEnd.split("_")[0]
-    end_direction = nodeEnd.split("_")[1]
+def heuristic_function(graph, nodeStart, nodeEnd, date_time, model, segments, flow_lookup=predict_node_flow, horizon=0):
+    if logger.LEVEL <= 10:
+        logger.debug("Calculating heuristic cost for NodeStart -> %s, NodeEnd -> %s", graph.node_name(nodeStart), graph.node_name(nodeEnd))
 
-    # Old predict
-    #flow = prediction_module.predict_flow(end_scat, date_time, end_direction, model)
+    start_scat = graph.node_scat[nodeStart]
+    end_scat = graph.node_scat[nodeEnd]
 
-    # New predict
-    flow = prediction_module.predict_new_model(end_scat, date_time, end_direction, model)
+    # Flow forecast from the departure time for the slot the segment is entered in
+    flow = flow_lookup(graph, nodeEnd, date_time, model, horizon)
 
-    # add flow by scat to dictionary
-    flow_dict[end_scat] = flow
+    distance = graph.distance(start_scat, end_scat)
+    speed = graph_maker.calculate_speed(start_scat, flow)
 
-    if "_" in nodeStart:
-        nodeStart = nodeStart.split("_")[0]
+    # Record the segment for this query's path metrics
+    segments[(start_scat, end_scat, horizon)] = (distance, speed, flow)
 
-    distance = graph_maker.calculate_distance(nodeStart, end_scat)
-    speed = graph_maker.calculate_speed(nodeStart, flow)
+    return distance / speed
 
-    heuristic_dict[f"{nodeStart}_{end_scat}"] = {"distance": distance, "speed": speed}
 
-    return distance / speed
+# progress(found, num_paths) is called as each path is found; setting the cancel
+# threading.Event stops the search with SearchCancelled before its next expansion
+def astar(graph, start_node, end_node, date_time, num_paths=5, model="lstm", flow_lookup=predict_node_flow, progress=None, cancel=None):
+    with tracing.span("astar.search", start=str(start_node), end=str(end_node), date_time=date_time), SEARCH_SECONDS.time():
+        return _astar(graph, start_node, end_node, date_time, num_paths, model, flow_lookup, progress, cancel)
+
 
+def _astar(graph, start_node, end_node, date_time, num_paths, model, flow_lookup, progress=None, cancel=None):
+    # Translate the string / scat number API into integer node ids
+    if not isinstance(graph, csr.CSRGraph):
+        graph = csr.compile_graph(graph)
 
-def parse_node(node_str):
-    return int(node_str.split("_")[0])
+    start = graph.node_id(start_node)
+    end_scat = graph.scat_id(end_node)
+
+    if start is None or end_scat is None:
+        logger.log("No paths found")
+        return None
 
+    node_scat = graph.node_scat
+    offsets = graph.offsets
+    targets = graph.targets
+    node_count = len(graph)
 
-def astar(graph, start_node, end_node, date_time, num_paths=5, model="lstm"):
+    segments = {}  # (scat, scat) -> (distance, speed, flow), local to this query
     found_paths = []
     path_penalties = {}  # Store penalties for used edges
     attempts = 0
     max_attempts = 3  # Prevent infinite loops if 5 paths don't exist
-    
+    expansions = 0
+    edges = 0
+
     while len(found_paths) < num_paths and attempts < max_attempts:
         # Reinitialize search parameters
         open_set = []
-        closed_set = set()
-        parent = {}
-        g_score = {start_node: 0}
-        f_score = {start_node: 0}
-        
-        heapq.heappush(open_set, (f_score[start_node], start_node))
-        
+        in_open = set()
+        closed_set = bytearray(node_count)
+        parent = [-1] * node_count
+        g_score = [float("inf")] * node_count
+        g_score[start] = 0
+        arrival = [0.0] * node_count  # estimated hours after departure each node is reached
+        entry_horizon = [0] * node_count  # forecast horizon of the segment into each node
+
+        heapq.heappush(open_set, (0, start))
+        in_open.add(start)
+
         while open_set:
+            if cancel is not None and cancel.is_set():
+                raise SearchCancelled()
+
             current_f, current_node = heapq.heappop(open_set)
-            
-            if parse_node(current_node) == end_node:
+            in_open.discard(current_node)
+            expansions += 1
+            current_scat = node_scat[current_node]
+
+            if current_scat == end_scat:
                 # Path found
                 logger.log(f"Found path {len(found_paths) + 1}!")
                 # Reconstruct the current path
-                path = []
+                nodes = []
                 temp_node = current_node
-                
-                while temp_node:
-                    path.append(parse_node(temp_node))
-                    temp_node = parent.get(temp_node)
-                    
-                path.reverse()
-                
+
+                while temp_node != -1:
+                    nodes.append(temp_node)
+                    temp_node = parent[temp_node]
+
+                nodes.reverse()
+                path = [node_scat[node] for node in nodes]
+
                 # Calculate metrics
                 overall_time = 0
                 overall_distance = 0
-                
+                flows = []
+
                 for i in range(len(path) - 1):
-                    start = path[i]
-                    end = path[i + 1]
-                    
-                    overall_distance += heuristic_dict[f"{start}_{end}"]["distance"]
-                    
+                    distance, speed, flow = segments[(path[i], path[i + 1], entry_horizon[nodes[i + 1]])]
+                    flows.append(flow)
+
+                    overall_distance += distance
+
                     if i != 0 and i != len(path) - 1:
-                        overall_time += 0.00833333  # traffic light delay
-                    
-                    overall_time += heuristic_dict[f"{start}_{end}"]["distance"] / heuristic_dict[f"{start}_{end}"]["speed"]
-                
-                if path not in [path_info['path'] for path_info in found_paths]:
-                    logger.log("Path unique - adding to list")
+                        overall_time += INTERSECTION_DELAY
+
+                    overall_time += distance / speed
+
+                scat_path = [graph.scats[scat] for scat in path]
+
+                if scat_path not in [path_info['path'] for path_info in found_paths]:
+                    logger.debug("Path unique - adding to list")
                     found_paths.append({
-                        'path': path,
+                        'path': scat_path,
                         'distance': round(overall_distance, 2),
-                        'time': round(overall_time * 60, 2)
+                        'time': round(overall_time * 60, 2),
+                        'flows': flows
                     })
-                    
+
+                    if progress is not None:
+                        progress(len(found_paths), num_paths)
+
                     # Add penalties to edges in the found path
                     penalty_factor = 0.5 * (attempts + 1)  # Increase penalties with each attempt
                     for i in range(len(path) - 1):
@@ -106,52 +154,67 @@ def astar(graph, start_node, end_node, date_time, num_paths=5, model="lstm"):
                         if edge not in path_penalties:
                             path_penalties[edge] = 0
                         path_penalties[edge] += PATH_COST * penalty_factor
-                    
+
                     if len(found_paths) >= num_paths:
                         break
-                
+
                 # Don't break here - continue searching for more paths
                 continue
 
-            closed_set.add(current_node)
-            neighbors = graph.get(parse_node(current_node), [])
+            closed_set[current_node] = 1
 
-            for neighbor in neighbors:
-                if neighbor in closed_set:
+            # Segments leaving this node are costed for the slot it is reached in
+            horizon = int(arrival[current_node] * 60 // SLOT_MINUTES)
+            delay = INTERSECTION_DELAY if current_node != start else 0
+
+            for index in range(offsets[current_scat], offsets[current_scat + 1]):
+                neighbor = targets[index]
+
+                if closed_set[neighbor]:
                     continue
-                
+
                 # Calculate edge penalty
-                edge = (parse_node(current_node), parse_node(neighbor))
-                edge_penalty = path_penalties.get(edge, 0)
-                    
+                edge_penalty = path_penalties.get((current_scat, node_scat[neighbor]), 0)
+
                 tentative_g_score = g_score[current_node] + edge_penalty
-                
-                if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
+
+                if tentative_g_score < g_score[neighbor]:
                     parent[neighbor] = current_node
                     g_score[neighbor] = tentative_g_score
-                    
+
+                    edges += 1
+                    travel_time = heuristic_function(graph, current_node, neighbor, date_time, model, segments, flow_lookup, horizon)
+                    arrival[neighbor] = arrival[current_node] + delay + travel_time
+                    entry_horizon[neighbor] = horizon
+
                     # Add edge penalty to heuristic calculation
-                    h_score = heuristic_function(current_node, neighbor, date_time, model) + edge_penalty
-                    f_score[neighbor] = g_score[neighbor] + h_score
-                    
-                    if neighbor not in [node for _, node in open_set]:
-                        heapq.heappush(open_set, (f_score[neighbor], neighbor))
-        
+                    h_score = travel_time + edge_penalty
+
+                    if neighbor not in in_open:
+                        heapq.heappush(open_set, (g_score[neighbor] + h_score, neighbor))
+                        in_open.add(neighbor)
+
         attempts += 1
         # Increase penalties for next attempt if we haven't found enough paths
         for edge in path_penalties:
             path_penalties[edge] *= 1.5
-    
+
+    # Counted locally and reported once, keeping the loop free of tracing calls
+    tracing.count("astar.expansions", expansions)
+    tracing.count("astar.edges", edges)
+    EXPANSIONS.observe(expansions)
+    SEARCHES.labels("astar", "found" if found_paths else "not_found").inc()
+
     if not found_paths:
         logger.log("No paths found")
         return None
-    
+
     found_paths.sort(key=lambda x: x['time'])
-    
+
     for i, path_info in enumerate(found_paths):
         logger.log(f"Path {i + 1}:")
         logger.log(f"Nodes: {path_info['path']}")
         logger.log(f"Distance: {path_info['distance']} km")
         logger.log(f"Time: {path_info['time']} minutes")
-    
-    return found_paths
\ No newline at end of file
+
+    return found_paths
@@ -1,41 +1,53 @@
 # Project Imports
 import utilities.logger as logger
+import algorithms.csr as csr
 
 # Library Imports
 from collections import deque
 
 def bfs(graph, start_node, end_node):
+    # Translate scat numbers into integer scat ids
+    if not isinstance(graph, csr.CSRGraph):
+        graph = csr.compile_graph(graph)
+
+    start = graph.scat_id(start_node)
+    end = graph.scat_id(end_node)
+
+    if start is None or end is None:
+        return None
+
+    node_scat = graph.node_scat
+    offsets = graph.offsets
+    targets = graph.targets
+
     # Initialize a queue for BFS and add the start node
-    queue = deque([start_node])
-    # Keep track of visited nodes to avoid cycles
-    visited = set()
-    visited.add(start_node)
-    # Keep track of the parent of each node to reconstruct the path
-    parent = {start_node: None}
+    queue = deque([start])
+    # Keep track of the parent of each node to reconstruct the path, -2 marks unvisited
+    parent = [-2] * len(graph.scats)
+    parent[start] = -1
 
     while queue:
         # Dequeue a node from the front of the queue
         current_node = queue.popleft()
-        logger.log(f'Visiting: {current_node}')
+        logger.debug('Visiting: %s', graph.scats[current_node])
 
         # Check if we've reached the end node
-        if current_node == end_node:
+        if current_node == end:
             logger.log('Found the end node!')
             # Reconstruct the path from end_node to start_node
             path = []
-            while current_node:
-                path.append(current_node)
+            while current_node != -1:
+                path.append(graph.scats[current_node])
                 current_node = parent[current_node]
             path.reverse()
             return path
 
         # Get all adjacent nodes of the current node
-        neighbors = graph.get(current_node, [])
-        for neighbor in neighbors:
-            if neighbor not in visited:
+        for index in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = node_scat[targets[index]]
+            if parent[neighbor] == -2:
                 # If the neighbor hasn't been visited, add it to the queue and mark it as visited
                 queue.append(neighbor)
-                visited.add(neighbor)
                 parent[neighbor] = current_node
 
     return None  # If no path found
\ No newline at end of file
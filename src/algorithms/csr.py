@@ -0,0 +1,126 @@
+# Project Imports
+import algorithms.graph as graph_maker
+import utilities.tracing as tracing
+
+# Library Imports
+from array import array
+import math
+
+# Direction codes, in the same order as the direction encoder categories
+DIRECTIONS = ("N", "S", "E", "W", "NE", "NW", "SE", "SW")
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+NO_DIRECTION = -1
+
+
+# Integer indexed, compressed sparse row form of graph_maker.generate_graph().
+# Every SCATS site has a scat id (its index in `scats`). Search nodes are
+# (scat, direction) pairs; node ids 0..len(scats)-1 are the direction-less
+# start nodes, so a scat id is also the id of its bare node. The outgoing
+# edges of every node at a site are targets[offsets[scat]:offsets[scat + 1]].
+class CSRGraph:
+    def __init__(self, scats, offsets, targets, node_scat, node_direction, latitudes, longitudes):
+        self.scats = scats
+        self.offsets = offsets
+        self.targets = targets
+        self.node_scat = node_scat
+        self.node_direction = node_direction
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+
+        self.scat_index = {scat: index for index, scat in enumerate(scats)}
+        self.node_index = {
+            (node_scat[node], node_direction[node]): node for node in range(len(node_scat))
+        }
+
+    def __len__(self):
+        return len(self.node_scat)
+
+    def scat_id(self, scat_number):
+        return self.scat_index.get(int(scat_number))
+
+    def node_id(self, node_str):
+        # Accepts "4034_SW" style node names as well as bare scat numbers
+        parts = str(node_str).split("_")
+        scat = self.scat_id(parts[0])
+
+        if scat is None:
+            return None
+
+        if len(parts) == 1:
+            return scat
+
+        return self.node_index.get((scat, DIRECTION_CODES.get(parts[1], NO_DIRECTION)))
+
+    def direction_name(self, node):
+        code = self.node_direction[node]
+        return DIRECTIONS[code] if code != NO_DIRECTION else None
+
+    def node_name(self, node):
+        scat = self.scats[self.node_scat[node]]
+        direction = self.direction_name(node)
+        return f"{scat}_{direction}" if direction else str(scat)
+
+    def neighbours(self, node):
+        scat = self.node_scat[node]
+        return self.targets[self.offsets[scat]:self.offsets[scat + 1]]
+
+    def distance(self, start_scat, end_scat):
+        # Same approximation as graph_maker.calculate_distance, 0.01 of a degree is 1km
+        a = abs(self.latitudes[start_scat] - self.latitudes[end_scat]) * 100
+        b = abs(self.longitudes[start_scat] - self.longitudes[end_scat]) * 100
+
+        return math.sqrt(a**2 + b**2)
+
+
+@tracing.traced("graph.compile")
+def compile_graph(graph):
+    # Collect every site that appears as a source or as an edge target
+    edges = {}
+    scat_numbers = set()
+
+    for scat, entries in graph.items():
+        scat = int(scat)
+        scat_numbers.add(scat)
+        edges.setdefault(scat, [])
+
+        for entry in entries:
+            target_scat, _, direction = str(entry).partition("_")
+            target = (int(float(target_scat)), DIRECTION_CODES.get(direction, NO_DIRECTION))
+
+            scat_numbers.add(target[0])
+            if target not in edges[scat]:
+                edges[scat].append(target)
+
+    scats = array("i", sorted(scat_numbers))
+    scat_index = {scat: index for index, scat in enumerate(scats)}
+
+    # Bare nodes first, so that node id == scat id for them
+    node_scat = array("i", range(len(scats)))
+    node_direction = array("b", [NO_DIRECTION] * len(scats))
+    node_index = {(index, NO_DIRECTION): index for index in range(len(scats))}
+
+    offsets = array("i", [0])
+    targets = array("i")
+
+    for scat in scats:
+        for target_scat, direction in edges.get(scat, []):
+            key = (scat_index[target_scat], direction)
+
+            if key not in node_index:
+                node_index[key] = len(node_scat)
+                node_scat.append(key[0])
+                node_direction.append(direction)
+
+            targets.append(node_index[key])
+
+        offsets.append(len(targets))
+
+    latitudes = array("d")
+    longitudes = array("d")
+
+    for scat in scats:
+        latitude, longitude = graph_maker.get_coords_by_scat(scat)
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+
+    return CSRGraph(scats, offsets, targets, node_scat, node_direction, latitudes, longitudes)
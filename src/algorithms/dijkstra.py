@@ -0,0 +1,244 @@
+# Project Imports
+import utilities.logger as logger
+import utilities.tracing as tracing
+import utilities.metrics as metrics
+import predict as prediction_module
+from utilities.time import SLOT_MINUTES, format_slot, to_slot
+import algorithms.graph as graph_maker
+import algorithms.csr as csr
+
+# Library Imports
+import heapq
+
+INTERSECTION_DELAY = 0.00833333  # traffic light delay in hours, same as astar
+
+FLOW_CACHE = metrics.counter("tps_flow_cache_total", "Flow cache lookups", ["cache", "result"])
+CACHE_HITS = FLOW_CACHE.labels("flow_table", "hit")
+CACHE_MISSES = FLOW_CACHE.labels("flow_table", "miss")
+
+# Shared with astar, registering the same name returns the same metric
+EXPANSIONS = metrics.histogram(
+    "tps_search_expansions", "Nodes expanded per search", ["algorithm"], buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+).labels("dijkstra")
+SEARCHES = metrics.counter("tps_searches_total", "Searches run, by whether a path was found", ["algorithm", "result"])
+
+
+class FlowTable:
+    # Caches predicted flows per (node, slot offset) for one departure time and model.
+    # Misses are filled a whole site at a time, so every direction of a SCATS site
+    # is predicted with a single batched model call. Multi-horizon models cover the
+    # following slots from the same call, so a site is only predicted again once a
+    # search runs past its last horizon.
+    def __init__(self, graph, date_time, model, predictor=prediction_module):
+        self.graph = graph
+        self.model = model
+        self.predictor = predictor
+        self.departure = to_slot(date_time)
+        self.flows = {}  # (node, slot) -> flows for each horizon from that slot
+        self.fetched = set()
+        self.horizons = {}  # scat -> number of horizons its model forecasts
+        self.model_calls = 0
+
+        # Directed nodes grouped by site, used to batch predictions per site
+        self.site_nodes = {}
+        for node in range(len(graph.scats), len(graph)):
+            self.site_nodes.setdefault(graph.node_scat[node], []).append(node)
+
+    def seed(self, node_flows, slot=0):
+        # Reuse flows already predicted elsewhere (e.g. the engine's slot cache). Only
+        # sites with every direction present count as fetched, the rest are predicted
+        for scat, nodes in self.site_nodes.items():
+            if (scat, slot) in self.fetched or any(node not in node_flows for node in nodes):
+                continue
+
+            self.fetched.add((scat, slot))
+            self.horizons[scat] = len(node_flows[nodes[0]])
+
+            for node in nodes:
+                self.flows[(node, slot)] = node_flows[node]
+
+    def slot_date_time(self, slot):
+        return format_slot(self.departure + slot)
+
+    def prefetch(self, slot=0, scats=None):
+        # Every missing site in one request, so a batching predictor can overlap them
+        sites = [scat for scat in (self.site_nodes if scats is None else scats) if (scat, slot) not in self.fetched]
+        self.fetched.update((scat, slot) for scat in sites)
+        sites = [scat for scat in sites if self.site_nodes.get(scat)]
+
+        if not sites:
+            return
+
+        site_flows = self.predictor.predict_horizons_sites(
+            [(str(self.graph.scats[scat]), self.slot_date_time(slot), self.site_directions(scat)) for scat in sites],
+            self.model,
+        )
+
+        for scat, flows in zip(sites, site_flows):
+            self.store_site(scat, slot, flows)
+
+    def site_directions(self, scat):
+        return [self.graph.direction_name(node) for node in self.site_nodes[scat]]
+
+    def fetch_site(self, scat, slot):
+        self.fetched.add((scat, slot))
+
+        if not self.site_nodes.get(scat):
+            return
+
+        flows = self.predictor.predict_horizons_batch(
+            str(self.graph.scats[scat]), self.slot_date_time(slot), self.site_directions(scat), self.model
+        )
+        self.store_site(scat, slot, flows)
+
+    def store_site(self, scat, slot, flows):
+        self.model_calls += 1
+        tracing.count("flow_table.fetches")
+        nodes = self.site_nodes[scat]
+
+        if flows is not None:
+            self.horizons[scat] = len(flows[0])
+
+        for index, node in enumerate(nodes):
+            self.flows[(node, slot)] = flows[index] if flows is not None else None
+
+    def get(self, node, slot=0):
+        scat = self.graph.node_scat[node]
+
+        # Read the slot from the latest prediction whose horizons cover it
+        horizons = self.horizons.get(scat, 1)
+        base = slot - slot % horizons
+
+        if (scat, base) not in self.fetched:
+            CACHE_MISSES.inc()
+            self.fetch_site(scat, base)
+        else:
+            CACHE_HITS.inc()
+
+        flows = self.flows.get((node, base))
+        return prediction_module.select_horizon(flows, slot - base) if flows is not None else None
+
+
+def travel_times(graph, source, date_time, model="lstm", flow_table=None):
+    # Single source, time dependent Dijkstra over SCATS sites. Each edge is costed
+    # with the flow predicted for the slot in which it is entered, and returns the
+    # fastest travel time (minutes) and its distance (km) to every reachable site.
+    if not isinstance(graph, csr.CSRGraph):
+        graph = csr.compile_graph(graph)
+
+    if flow_table is None:
+        flow_table = FlowTable(graph, date_time, model)
+
+    scat_count = len(graph.scats)
+
+    with tracing.span("dijkstra.search", source=str(source), date_time=date_time), metrics.STAGE_SECONDS.labels("search").time():
+        times, distances = _dijkstra(graph, graph.scat_id(source), flow_table)
+
+    result = {}
+    for scat in range(scat_count):
+        if times[scat] != float("inf"):
+            result[graph.scats[scat]] = {
+                'time': round(times[scat] * 60, 2),
+                'distance': round(distances[scat], 2)
+            }
+
+    return result
+
+
+def travel_time_matrix(graph, sources, destinations, date_time, model="lstm", predictor=prediction_module, flow_table=None):
+    # Many to many travel times, sharing one flow table across every source so each
+    # site is predicted once per slot regardless of how many sources reach it
+    if not isinstance(graph, csr.CSRGraph):
+        graph = csr.compile_graph(graph)
+
+    if flow_table is None:
+        flow_table = FlowTable(graph, date_time, model, predictor)
+
+    flow_table.prefetch()
+
+    times = []
+    distances = []
+
+    for source in sources:
+        source_times, source_distances = _dijkstra(graph, graph.scat_id(source), flow_table)
+        time_row = []
+        distance_row = []
+
+        for destination in destinations:
+            scat = graph.scat_id(destination)
+
+            if scat is None or source_times[scat] == float("inf"):
+                time_row.append(None)
+                distance_row.append(None)
+            else:
+                time_row.append(round(source_times[scat] * 60, 2))
+                distance_row.append(round(source_distances[scat], 2))
+
+        times.append(time_row)
+        distances.append(distance_row)
+
+    logger.log(f"Built {len(sources)}x{len(destinations)} travel time matrix with {flow_table.model_calls} model calls")
+
+    return {
+        'sources': list(sources),
+        'destinations': list(destinations),
+        'time': times,
+        'distance': distances
+    }
+
+
+def _dijkstra(graph, source, flow_table):
+    scat_count = len(graph.scats)
+    times = [float("inf")] * scat_count
+    distances = [float("inf")] * scat_count
+
+    if source is None:
+        SEARCHES.labels("dijkstra", "not_found").inc()
+        return times, distances
+
+    node_scat = graph.node_scat
+    offsets = graph.offsets
+    targets = graph.targets
+    settled = bytearray(scat_count)
+    expansions = 0
+
+    times[source] = 0
+    distances[source] = 0
+    open_set = [(0, source)]
+
+    while open_set:
+        current_time, current = heapq.heappop(open_set)
+
+        if settled[current]:
+            continue
+        settled[current] = 1
+        expansions += 1
+
+        # Flow is looked up for the 15 minute slot the vehicle leaves this site in
+        slot = int(current_time * 60 // SLOT_MINUTES)
+        delay = INTERSECTION_DELAY if current != source else 0
+
+        for index in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[index]
+            neighbor_scat = node_scat[neighbor]
+
+            if settled[neighbor_scat]:
+                continue
+
+            flow = flow_table.get(neighbor, slot)
+            if flow is None:
+                continue
+
+            distance = graph.distance(current, neighbor_scat)
+            arrival = current_time + delay + distance / graph_maker.calculate_speed(current, flow)
+
+            if arrival < times[neighbor_scat]:
+                times[neighbor_scat] = arrival
+                distances[neighbor_scat] = distances[current] + distance
+                heapq.heappush(open_set, (arrival, neighbor_scat))
+
+    # A search is found when it reaches any site besides its source
+    EXPANSIONS.observe(expansions)
+    SEARCHES.labels("dijkstra", "found" if expansions > 1 else "not_found").inc()
+
+    return times, distances
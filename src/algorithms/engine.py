@@ -0,0 +1,150 @@
+# Project Imports
+import predict as prediction_module
+import algorithms.graph as graph_maker
+import algorithms.csr as csr
+import algorithms.astar as astar
+import algorithms.dijkstra as dijkstra
+import utilities.tracing as tracing
+import utilities.metrics as metrics
+
+# Library Imports
+from collections import OrderedDict
+import threading
+
+# Departure slots whose predicted flows are kept, least recently used evicted first
+MAX_CACHED_SLOTS = 8
+
+FLOW_CACHE = metrics.counter("tps_flow_cache_total", "Flow cache lookups", ["cache", "result"])
+CACHE_HITS = FLOW_CACHE.labels("engine", "hit")
+CACHE_MISSES = FLOW_CACHE.labels("engine", "miss")
+
+
+class RoutingEngine:
+    # Holds the compiled graph, the predictor and a shared flow cache. All per
+    # query state lives in the search functions, so one engine can serve
+    # concurrent queries from several threads.
+    def __init__(self, graph=None, model="lstm", predictor=prediction_module, max_slots=MAX_CACHED_SLOTS):
+        if graph is None:
+            graph = graph_maker.generate_graph()
+
+        if not isinstance(graph, csr.CSRGraph):
+            graph = csr.compile_graph(graph)
+
+        self.graph = graph
+        self.model = model
+        self.predictor = predictor
+
+        # (date_time, model) -> {node: predicted flow for each forecast horizon}, one
+        # entry per departure slot so a long running service keeps only recent slots
+        self._flow_cache = OrderedDict()
+        self.max_slots = max_slots
+        self._lock = threading.Lock()
+
+    def slot_flows(self, date_time, model):
+        # The node -> flows dict of a slot, marked as recently used. Call with the lock held.
+        key = (date_time, model)
+        flows = self._flow_cache.get(key)
+
+        if flows is None:
+            flows = self._flow_cache[key] = {}
+
+            while len(self._flow_cache) > self.max_slots:
+                self._flow_cache.popitem(last=False)
+        else:
+            self._flow_cache.move_to_end(key)
+
+        return flows
+
+    def evict_slot(self, date_time, model):
+        with self._lock:
+            self._flow_cache.pop((date_time, model), None)
+
+    def flow(self, graph, node, date_time, model, horizon=0):
+        with self._lock:
+            flows = self.slot_flows(date_time, model).get(node)
+
+        if flows is None:
+            tracing.count("engine.cache_misses")
+            CACHE_MISSES.inc()
+
+            # Predict outside the lock so other queries aren't blocked on inference
+            flows = self.predictor.predict_horizons_batch(
+                str(graph.scats[graph.node_scat[node]]), date_time, [graph.direction_name(node)], model
+            )
+
+            if flows is None:
+                return None
+
+            # Failed predictions are not cached so they can be retried
+            flows = flows[0]
+            with self._lock:
+                self.slot_flows(date_time, model)[node] = flows
+        else:
+            tracing.count("engine.cache_hits")
+            CACHE_HITS.inc()
+
+        return prediction_module.select_horizon(flows, horizon)
+
+    def flow_table(self, date_time, model):
+        # A FlowTable for one query, starting from the flows already cached for its slot
+        flow_table = dijkstra.FlowTable(self.graph, date_time, model, self.predictor)
+
+        with self._lock:
+            cached = dict(self.slot_flows(date_time, model))
+
+        flow_table.seed(cached)
+        return flow_table
+
+    def store_flows(self, flow_table, date_time, model):
+        # Cache what a FlowTable predicted for the departure slot, failures left out
+        with self._lock:
+            slot_flows = self.slot_flows(date_time, model)
+
+            for (node, slot), flow in flow_table.flows.items():
+                if slot == 0 and flow is not None:
+                    slot_flows[node] = flow
+
+    def prefetch_flows(self, date_time, model=None):
+        # Predict every directed node (and every horizon) for one departure slot,
+        # one batched call per site
+        model = model or self.model
+        flow_table = self.flow_table(date_time, model)
+        flow_table.prefetch()
+        self.store_flows(flow_table, date_time, model)
+
+        return flow_table.model_calls
+
+    def clear_cache(self):
+        with self._lock:
+            self._flow_cache.clear()
+
+    def route(self, start, end, date_time, num_paths=5, model=None, progress=None, cancel=None):
+        return astar.astar(
+            self.graph,
+            start,
+            end,
+            date_time,
+            num_paths=num_paths,
+            model=model or self.model,
+            flow_lookup=self.flow,
+            progress=progress,
+            cancel=cancel,
+        )
+
+    def travel_times(self, source, date_time, model=None):
+        model = model or self.model
+        flow_table = self.flow_table(date_time, model)
+        result = dijkstra.travel_times(self.graph, source, date_time, model, flow_table)
+        self.store_flows(flow_table, date_time, model)
+
+        return result
+
+    def travel_time_matrix(self, sources, destinations, date_time, model=None):
+        model = model or self.model
+        flow_table = self.flow_table(date_time, model)
+        result = dijkstra.travel_time_matrix(
+            self.graph, sources, destinations, date_time, model, self.predictor, flow_table
+        )
+        self.store_flows(flow_table, date_time, model)
+
+        return result
@@ -1,11 +1,14 @@
 # System Imports
 import math
+import os
 
 # Library Imports
 import pandas as pd
 
 # Project Imports
 import utilities.logger as logger
+import utilities.tracing as tracing
+import utilities.metrics as metrics
 
 # Constant Variables
 LAT_OFFSET = 0.00155
@@ -13,30 +16,40 @@ LONG_OFFSET = 0.00125
 
 # Global Variables
 df = None
+coords_cache = {}  # SCAT number -> (latitude, longitude), cleared when the data is reloaded
+
+GRAPH_LOOKUPS = metrics.counter("tps_graph_lookups_total", "SCAT coordinate lookups", ["result"])
+LOOKUP_HITS = GRAPH_LOOKUPS.labels("hit")
+LOOKUP_MISSES = GRAPH_LOOKUPS.labels("miss")
 
 def init():
     load_data()
     # generate_graph()
 
+@tracing.traced("graph.load_data")
 def load_data():
     global df, scat_df, position_df
     # Load in the 'scats_data.csv' file
     file_location = "../training_data/scats_data.csv"
 
     df = pd.read_csv(file_location)
+    coords_cache.clear()
 
     # Load in the 'scats_site_listing.csv' file
     file_location = "../training_data/scats_site_listing.csv"
 
     scat_df = pd.read_csv(file_location)
 
-    # Load in the 'traffic_count_locations.csv' file
+    # Load in the 'traffic_count_locations.csv' file, if present (it is not used for routing)
     file_location = "../training_data/traffic_count_locations.csv"
 
-    position_df = pd.read_csv(file_location)
+    position_df = None
+
+    if os.path.exists(file_location):
+        position_df = pd.read_csv(file_location)
 
-    position_df = position_df.drop_duplicates(subset=["TFM_DESC"])
-    position_df["TFM_DESC"] = position_df["TFM_DESC"].str.upper().apply(format_tfm_desc)
+        position_df = position_df.drop_duplicates(subset=["TFM_DESC"])
+        position_df["TFM_DESC"] = position_df["TFM_DESC"].str.upper().apply(format_tfm_desc)
 
     # Fix location names.
     df["Location"] = df["Location"].replace(
@@ -61,6 +74,8 @@ def format_tfm_desc(text):
     # Join the words back together
     return ' '.join(words)
 
+@tracing.traced("graph.build")
+@metrics.timed(metrics.STAGE_SECONDS.labels("graph_build"))
 def generate_graph():
     global df
 
@@ -153,7 +168,7 @@ def generate_graph():
                     graph[scat].append(entry)
             
 
-    logger.log(graph)
+    logger.debug(graph)
     logger.log("[+] Graph generated successfully")
 
     return graph
@@ -226,7 +241,7 @@ def generate_graph_old():
                 if entry not in graph[intersection]:
                     graph[intersection].append(entry)
 
-    logger.log(graph)
+    logger.debug(graph)
     logger.log("[+] Graph generated successfully")
 
     return graph
@@ -265,10 +280,22 @@ def does_scat_exist(scat_number):
     return int(scat_number) in df["SCATS Number"].values
 
 def get_coords_by_scat(scat_number):
-    global df
-
     scat_number = int(scat_number)
 
+    # Every edge looks up both of its ends, only filter the data once per site
+    coords = coords_cache.get(scat_number)
+
+    if coords is None:
+        LOOKUP_MISSES.inc()
+        coords = coords_cache[scat_number] = find_coords(scat_number)
+    else:
+        LOOKUP_HITS.inc()
+
+    return coords
+
+def find_coords(scat_number):
+    global df
+
     # get all rows with the SCAT number
     rows = df[df["SCATS Number"] == scat_number]
 
@@ -0,0 +1,132 @@
+import sys
+sys.dont_write_bytecode = True
+
+# Project Imports
+import utilities.logger as logger
+
+# Library Imports
+import argparse
+import json
+import os
+import re
+import subprocess
+
+# Import time of each entry point, measured with python -X importtime in a fresh
+# interpreter so nothing is cached. Run from src/:
+# python -m benchmarks.imports
+#
+# The exit status is 1 when a module's cumulative import time goes over its budget,
+# e.g. when a module level import of keras, sklearn or matplotlib creeps back in, or
+# when a module fails to import. --allow-missing skips modules that fail only because
+# an optional dependency (e.g. PyQt5 for main) isn't installed.
+# The largest imports under each module are listed to show where the time went.
+
+# Milliseconds, a few times the measured time to allow for slower machines
+BUDGETS = {
+    "main": 1500,
+    "server": 1500,
+    "forecast": 1000,
+    "predict": 1000,
+    "evaluate": 500,
+    "test": 1000,
+    "algorithms.engine": 1000,
+}
+
+
+def import_times(module):
+    # Cumulative milliseconds per imported module, and the nesting depth of each
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, _, cumulative, name = line.split("|", 3) if line.count("|") == 3 else ("", *line.split("|"))
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append((name.strip(), depth, int(cumulative) / 1000))
+
+    return times, None
+
+
+def missing_dependency(failure):
+    # True when the import failed on a third party package rather than a project module
+    match = re.match(r"ModuleNotFoundError: No module named '([^']+)'", failure)
+
+    if match is None:
+        return False
+
+    package = match.group(1).split(".")[0]
+    return not (os.path.isdir(package) or os.path.isfile(f"{package}.py"))
+
+
+def heaviest(times, count):
+    # The largest direct imports of the measured module
+    children = [(name, ms) for name, depth, ms in times if depth == 1]
+    return sorted(children, key=lambda child: -child[1])[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", help="Modules to measure", nargs="+", default=list(BUDGETS))
+    parser.add_argument("--top", help="Heaviest imports to list per module", type=int, default=3)
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--allow-missing", help="Skip modules whose dependencies aren't installed", action="store_true")
+
+    args = parser.parse_args()
+
+    results = {}
+    over_budget = []
+    failed = []
+
+    for module in args.module:
+        times, failure = import_times(module)
+
+        if times is None and args.allow_missing and missing_dependency(failure):
+            print(f"{module:<20}{'skipped':>12}   {failure}")
+            continue
+
+        if times is None:
+            print(f"{module:<20}{'import failed':>12}   {failure}")
+            failed.append(module)
+            continue
+
+        total = next(ms for name, depth, ms in times if name == module and depth == 0)
+        budget = BUDGETS.get(module)
+        children = heaviest(times, args.top)
+
+        status = "" if budget is None else ("ok" if total <= budget else "OVER BUDGET")
+        print(
+            f"{module:<20}{total:>9.0f} ms   budget {budget or '-':>5}  {status:<12}"
+            + ", ".join(f"{name} {ms:.0f}" for name, ms in children)
+        )
+
+        results[module] = {"ms": total, "budget_ms": budget, "heaviest": dict(children)}
+        if budget is not None and total > budget:
+            over_budget.append(module)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+        logger.log(f"Wrote {args.output}")
+
+    if failed:
+        logger.error(f"Import failed: {', '.join(failed)}")
+
+    if over_budget:
+        logger.error(f"Import time over budget: {', '.join(over_budget)}")
+
+    if failed or over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
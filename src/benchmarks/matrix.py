@@ -0,0 +1,90 @@
+import sys
+sys.dont_write_bytecode = True
+
+# Project Imports
+import algorithms.graph as graph_maker
+import algorithms.csr as csr
+import algorithms.astar as astar
+import algorithms.dijkstra as dijkstra
+import predict as prediction_module
+import utilities.logger as logger
+
+# Library Imports
+import argparse
+import contextlib
+import io
+import time
+
+# Compares building a one-to-many travel time matrix against repeated
+# point-to-point astar calls. Run from src/: python -m benchmarks.matrix
+
+
+def count_calls(function, counter):
+    def wrapper(*args, **kwargs):
+        counter[0] += 1
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def run_point_to_point(graph, source, destinations, date_time, model):
+    calls = [0]
+    predict_new_model = prediction_module.predict_new_model
+    prediction_module.predict_new_model = count_calls(predict_new_model, calls)
+
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for destination in destinations:
+                astar.astar(graph, str(source), destination, date_time, num_paths=1, model=model)
+        elapsed = time.perf_counter() - start
+    finally:
+        prediction_module.predict_new_model = predict_new_model
+
+    return elapsed, calls[0]
+
+
+def run_matrix(graph, source, destinations, date_time, model):
+    calls = [0]
+    predict_horizons_batch = prediction_module.predict_horizons_batch
+    prediction_module.predict_horizons_batch = count_calls(predict_horizons_batch, calls)
+
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            dijkstra.travel_time_matrix(graph, [source], destinations, date_time, model)
+        elapsed = time.perf_counter() - start
+    finally:
+        prediction_module.predict_horizons_batch = predict_horizons_batch
+
+    return elapsed, calls[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", help="Depot SCATS number", type=int, default=2000)
+    parser.add_argument("--destinations", help="Number of destinations (default all sites)", type=int)
+    parser.add_argument("--model", help="Model type (lstm, gru, saes or cnn)", default="lstm")
+    parser.add_argument("--date_time", help="Departure time as dd/mm/yyyy HH:MM", default="1/10/2006 08:00")
+
+    args = parser.parse_args()
+
+    graph_maker.init()
+    with contextlib.redirect_stdout(io.StringIO()):
+        prediction_module.init([args.model])
+        graph = csr.compile_graph(graph_maker.generate_graph())
+
+    destinations = [scat for scat in graph.scats if scat != args.source][:args.destinations]
+
+    logger.log(f"Benchmarking {len(destinations)} destinations from {args.source} ({args.model})")
+
+    matrix_time, matrix_calls = run_matrix(graph, args.source, destinations, args.date_time, args.model)
+    astar_time, astar_calls = run_point_to_point(graph, args.source, destinations, args.date_time, args.model)
+
+    print(f"{'method':<16}{'seconds':>10}{'model calls':>14}")
+    print(f"{'matrix':<16}{matrix_time:>10.3f}{matrix_calls:>14}")
+    print(f"{'astar x ' + str(len(destinations)):<16}{astar_time:>10.3f}{astar_calls:>14}")
+    print(f"speedup: {astar_time / matrix_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
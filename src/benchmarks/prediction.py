@@ -0,0 +1,199 @@
+import sys
+sys.dont_write_bytecode = True
+
+# Project Imports
+import predict as prediction_module
+import utilities.logger as logger
+
+# Library Imports
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+import numpy as np
+
+# Prediction latency, throughput and memory of each backend on the real models in
+# saved_new_models, CPU only. Every backend and model type is measured in a fresh
+# process across batch sizes: batch 1 goes through predict_new_model, the way A*
+# predicts, larger batches through predict_site_batch. Run from src/:
+# python -m benchmarks.prediction --scats 970 --model lstm gru --backends keras compiled numpy
+#
+# cold is the first call at a batch size after the model is loaded with empty date
+# caches, warm the distribution of the calls that follow. peak KB is the Python and
+# numpy heap of one warm call, rss MB the process growth from loading the model on.
+
+BATCH_SIZES = [1, 8, 64, 512]
+MODEL_TYPES = ["lstm", "gru", "saes", "cnn"]
+
+
+def time_calls(function, repeats):
+    function()  # warm up
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return np.array(timings) * 1000
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def clear_date_caches():
+    from utilities.time import parse_date_time, round_to_nearest_15_minutes, format_date_universal
+
+    for function in (parse_date_time, round_to_nearest_15_minutes, format_date_universal):
+        function.cache_clear()
+
+
+def load_site(backend, scats, model_type):
+    # Loads one site the way predict.init does, without loading every other site
+    prediction_module.BACKEND = backend
+    model_path = f"{prediction_module.NEW_MODEL_DIR}/{prediction_module.model_file_name(scats, model_type)}"
+
+    if not os.path.exists(model_path):
+        return None
+
+    model = prediction_module.load_model(model_path)
+    prediction_module.all_models[f"{scats}_{model_type}"] = prediction_module.load_model_data(model, str(scats), model_type)
+
+    return prediction_module.all_models[f"{scats}_{model_type}"]
+
+
+def make_call(model_data, scats, model_type, date_time, batch_size):
+    from utilities.time import format_slot, to_slot
+
+    directions = list(model_data["flow_csv"]["direction"].unique())
+
+    if batch_size == 1:
+        return lambda: prediction_module.predict_new_model(str(scats), date_time, directions[0], model_type)
+
+    # Every direction of the site over consecutive slots, one model call
+    start = to_slot(date_time)
+    queries = [
+        (format_slot(start + index // len(directions)), directions[index % len(directions)])
+        for index in range(batch_size)
+    ]
+
+    return lambda: prediction_module.predict_site_batch(str(scats), queries, model_type)
+
+
+def benchmark_model(backend, scats, model_type, date_time, batch_sizes, repeats):
+    # Runs in its own process, so the first call is really cold and RSS is this model's
+    rss_before = max_rss_mb()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model_data = load_site(backend, scats, model_type)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    if model_data is None:
+        return []
+
+    rows = []
+    for batch_size in batch_sizes:
+        call = make_call(model_data, scats, model_type, date_time, batch_size)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            clear_date_caches()
+
+            start = time.perf_counter()
+            call()
+            cold_ms = (time.perf_counter() - start) * 1000
+
+            timings = time_calls(call, repeats)
+
+            # Measured apart from the timed calls, tracing allocations slows them down
+            tracemalloc.start()
+            call()
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+
+        rows.append({
+            "backend": backend,
+            "model": model_type,
+            "batch": batch_size,
+            "load_ms": load_ms,
+            "cold_ms": cold_ms,
+            "p50_ms": float(np.percentile(timings, 50)),
+            "p95_ms": float(np.percentile(timings, 95)),
+            "p99_ms": float(np.percentile(timings, 99)),
+            "throughput": batch_size / (np.median(timings) / 1000),
+            "peak_kb": peak_kb,
+        })
+
+    rss_mb = max_rss_mb() - rss_before
+    for row in rows:
+        row["rss_mb"] = rss_mb
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scats", help="SCATS site to predict", type=int, default=970)
+    parser.add_argument("--model", help="Model types to measure", nargs="+", default=MODEL_TYPES, choices=MODEL_TYPES)
+    parser.add_argument("--date_time", help="Prediction time as dd/mm/yyyy HH:MM", default="1/10/2006 08:00")
+    parser.add_argument("--repeats", help="Timed warm calls per batch size", type=int, default=50)
+    parser.add_argument("--batch", help="Batch sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument(
+        "--backends",
+        help="Backends to compare, the first is the baseline",
+        nargs="+",
+        default=["keras", "compiled"],
+        choices=sorted(prediction_module.MODEL_EXTENSIONS),
+    )
+    parser.add_argument("--output", help="JSON file to write the results to")
+
+    args = parser.parse_args()
+
+    logger.log(f"Benchmarking {', '.join(args.model)} predictions for {args.scats} on {', '.join(args.backends)}")
+
+    print(
+        f"{'backend':<10}{'model':<6}{'batch':>6}{'load ms':>9}{'cold ms':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'preds/s':>10}{'peak KB':>9}{'rss MB':>8}"
+    )
+
+    rows = []
+    baselines = {}
+    for model_type in args.model:
+        for backend in args.backends:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results = executor.submit(
+                    benchmark_model, backend, args.scats, model_type, args.date_time, args.batch, args.repeats
+                ).result()
+
+            if not results:
+                print(f"{backend:<10}{model_type:<6}{'no model files':>15}")
+                continue
+
+            for row in results:
+                # Speedup over the first backend at the same model type and batch size
+                baseline = baselines.setdefault((model_type, row["batch"]), row["p50_ms"])
+
+                print(
+                    f"{backend:<10}{model_type:<6}{row['batch']:>6}{row['load_ms']:>9.0f}{row['cold_ms']:>9.2f}"
+                    f"{row['p50_ms']:>9.3f}{row['p95_ms']:>9.3f}{row['p99_ms']:>9.3f}{row['throughput']:>10.0f}"
+                    f"{row['peak_kb']:>9.0f}{row['rss_mb']:>8.0f}   {baseline / row['p50_ms']:.1f}x"
+                )
+
+            rows += results
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"scats": args.scats, "date_time": args.date_time, "results": rows}, f, indent=2)
+
+        logger.log(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
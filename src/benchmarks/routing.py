@@ -0,0 +1,250 @@
+import sys
+sys.dont_write_bytecode = True
+
+# Project Imports
+import algorithms.graph as graph_maker
+import algorithms.csr as csr
+import algorithms.astar as astar
+import algorithms.dijkstra as dijkstra
+from algorithms.engine import RoutingEngine
+from utilities.time import SLOTS_PER_DAY, format_slot, to_slot
+import predict as prediction_module
+import utilities.logger as logger
+import utilities.profiling as profiling
+
+# Library Imports
+import argparse
+import contextlib
+import heapq
+import io
+import json
+import random
+import time
+import types
+import numpy as np
+
+# Routing benchmark over a reproducible origin / destination / departure workload.
+# Each engine answers every query headlessly and reports latency percentiles, node
+# expansions, model calls and flow cache hit rates. Run from src/:
+# python -m benchmarks.routing --queries 50 --engines astar engine --output routing.json
+#
+# As a regression gate, compare with an earlier run's JSON: the exit status is 1
+# when an engine's p95 latency, expansions or model calls grow past --tolerance.
+# python -m benchmarks.routing --workload routing.json --baseline routing.json
+
+ENGINES = ["astar", "engine", "dijkstra"]
+FIRST_DAY = "1/10/2006 00:00"  # the month of traffic data the models have history for
+DAYS = 30
+
+
+def generate_workload(graph, queries, seed, departures=None, first_day=FIRST_DAY, days=DAYS):
+    # Queries depart from a pool of departure slots, a small pool models many users
+    # routing around the same time and exercises the shared flow caches
+    rng = random.Random(seed)
+    first_slot = to_slot(first_day)
+
+    # Start from the second day so every departure has a day of history
+    slots = [first_slot + rng.randrange(SLOTS_PER_DAY, days * SLOTS_PER_DAY) for _ in range(departures or queries)]
+
+    workload = []
+    for _ in range(queries):
+        origin, destination = rng.sample(graph.scats, 2)
+        workload.append({"origin": origin, "destination": destination, "date_time": format_slot(rng.choice(slots))})
+
+    return workload
+
+
+@contextlib.contextmanager
+def instrument(counters):
+    # Counts heap pops (node expansions) in both searches, every prediction call and
+    # every flow cache lookup
+    def counting(function, name):
+        def wrapper(*args, **kwargs):
+            counters[name] += 1
+            return function(*args, **kwargs)
+        return wrapper
+
+    patched = [
+        (astar, "heapq", types.SimpleNamespace(heappush=heapq.heappush, heappop=counting(heapq.heappop, "expansions"))),
+        (dijkstra, "heapq", types.SimpleNamespace(heappush=heapq.heappush, heappop=counting(heapq.heappop, "expansions"))),
+        (prediction_module, "predict_new_model", counting(prediction_module.predict_new_model, "model_calls")),
+        (prediction_module, "predict_horizons_batch", counting(prediction_module.predict_horizons_batch, "model_calls")),
+        (dijkstra.FlowTable, "get", counting(dijkstra.FlowTable.get, "lookups")),
+        (RoutingEngine, "flow", counting(RoutingEngine.flow, "lookups")),
+    ]
+
+    originals = [(owner, name, getattr(owner, name)) for owner, name, _ in patched]
+
+    try:
+        for owner, name, replacement in patched:
+            setattr(owner, name, replacement)
+        yield
+    finally:
+        for owner, name, original in originals:
+            setattr(owner, name, original)
+
+
+def make_runner(engine_name, graph, model, num_paths):
+    # Each runner answers one query, returning astar's paths or dijkstra's time
+    if engine_name == "astar":
+        # Every edge is predicted, there is no cache to hit
+        return lambda query: astar.astar(
+            graph, str(query["origin"]), query["destination"], query["date_time"], num_paths=num_paths, model=model
+        )
+
+    if engine_name == "engine":
+        # The flow cache is shared by the whole workload, the way the server keeps it
+        engine = RoutingEngine(graph, model)
+        return lambda query: engine.route(
+            str(query["origin"]), query["destination"], query["date_time"], num_paths
+        )
+
+    if engine_name == "dijkstra":
+        # Single source search with a flow table per query
+        def run(query):
+            flow_table = dijkstra.FlowTable(graph, query["date_time"], model)
+            times = dijkstra.travel_times(graph, query["origin"], query["date_time"], model, flow_table)
+            return times.get(query["destination"])
+
+        return run
+
+    raise ValueError(f"Unknown engine: {engine_name}")
+
+
+def summarize_route(result):
+    # A comparable answer per query: the best path and its time
+    if isinstance(result, list) and result:
+        return {"path": result[0]["path"], "time": result[0]["time"]}
+    if isinstance(result, dict):
+        return {"time": result["time"]}
+    return None
+
+
+def run_engine(engine_name, graph, workload, model, num_paths):
+    run = make_runner(engine_name, graph, model, num_paths)
+    queries = []
+
+    for query in workload:
+        counters = {"expansions": 0, "model_calls": 0, "lookups": 0}
+
+        with instrument(counters), contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = run(query)
+            elapsed = time.perf_counter() - start
+
+        queries.append({**counters, "latency_ms": elapsed * 1000, "route": summarize_route(result)})
+
+    latencies = [query["latency_ms"] for query in queries]
+    lookups = sum(query["lookups"] for query in queries)
+    model_calls = sum(query["model_calls"] for query in queries)
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "expansions": float(np.mean([query["expansions"] for query in queries])),
+        "model_calls": model_calls / len(queries),
+        # Lookups answered without a model call, astar has no cache to hit
+        "cache_hit_rate": max(0.0, 1 - model_calls / lookups) if lookups else None,
+        "queries": queries,
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Regressions past tolerance on the gated metrics, and the routes that changed
+    regressions = []
+
+    for engine_name, result in results.items():
+        previous = baseline.get(engine_name)
+        if previous is None:
+            continue
+
+        for metric in ("p95_ms", "expansions", "model_calls"):
+            if previous[metric] and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{engine_name} {metric}: {previous[metric]:.3f} -> {result[metric]:.3f}")
+
+        changed = sum(
+            1 for query, previous_query in zip(result["queries"], previous["queries"])
+            if query["route"] != previous_query["route"]
+        )
+        if changed:
+            logger.log(f"{engine_name}: {changed} of {len(result['queries'])} routes differ from the baseline")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", help="Number of queries to generate", type=int, default=50)
+    parser.add_argument("--seed", help="Workload seed", type=int, default=0)
+    parser.add_argument("--departures", help="Distinct departure times in the workload (default one per query)", type=int)
+    parser.add_argument("--workload", help="JSON file of an earlier run to take the workload from")
+    parser.add_argument("--engines", help="Engines to run", nargs="+", default=["astar", "engine"], choices=ENGINES)
+    parser.add_argument("--model", help="Model type (lstm, gru, saes or cnn)", default="lstm")
+    parser.add_argument("--paths", help="Paths per astar query", type=int, default=1)
+    parser.add_argument(
+        "--backend",
+        help="Prediction backend (keras, compiled, tflite or numpy)",
+        choices=sorted(prediction_module.MODEL_EXTENSIONS),
+        default=prediction_module.BACKEND,
+    )
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--profile", help="Profile each engine's run of the workload into this directory", nargs="?", const="./profiles")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to gate against")
+    parser.add_argument("--tolerance", help="Allowed growth over the baseline", type=float, default=0.2)
+
+    args = parser.parse_args()
+    prediction_module.BACKEND = args.backend
+
+    graph_maker.init()
+    with contextlib.redirect_stdout(io.StringIO()):
+        prediction_module.init([args.model])
+        graph = csr.compile_graph(graph_maker.generate_graph())
+
+    if args.workload:
+        with open(args.workload, encoding="utf-8") as f:
+            workload = json.load(f)["workload"]
+    else:
+        workload = generate_workload(graph, args.queries, args.seed, args.departures)
+
+    logger.log(f"Benchmarking {len(workload)} queries ({args.model}, {args.backend}) on {', '.join(args.engines)}")
+
+    results = {}
+    print(f"{'engine':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'expansions':>12}{'model calls':>13}{'cache hits':>12}")
+
+    for engine_name in args.engines:
+        if args.profile:
+            with profiling.profile(args.profile, profiling.profile_name("routing", engine_name, args.model)):
+                result = results[engine_name] = run_engine(engine_name, graph, workload, args.model, args.paths)
+        else:
+            result = results[engine_name] = run_engine(engine_name, graph, workload, args.model, args.paths)
+        hit_rate = f"{result['cache_hit_rate']:.1%}" if result["cache_hit_rate"] is not None else "-"
+
+        print(
+            f"{engine_name:<10}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            f"{result['expansions']:>12.1f}{result['model_calls']:>13.1f}{hit_rate:>12}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "backend": args.backend, "workload": workload, "results": results}, f, indent=2)
+
+        logger.log(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+        regressions = compare(results, baseline, args.tolerance)
+
+        for regression in regressions:
+            logger.log(f"Regression: {regression}")
+
+        if regressions:
+            sys.exit(1)
+
+        logger.log(f"No regressions past {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import sys
+sys.dont_write_bytecode = True
+
+# Project Imports
+import predict as prediction_module
+import utilities.logger as logger
+
+# Library Imports
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+
+# Fleet evaluation of the per-site models in saved_new_models: every site and model
+# type is scored on its held-out split in parallel worker processes, with batched
+# inference, and the results are written as CSV and JSON so each retrain can be
+# compared to the last. Run from src/: python evaluate.py --model lstm gru --workers 4
+# Pass the JSON of an earlier run with --baseline to print the change per model type,
+# and --backend/--variant (as in predict.py) to score an optimized variant.
+
+MODEL_TYPES = ["lstm", "gru", "saes", "cnn"]
+COLUMNS = ["scats", "model", "backend", "variant", "samples", "mae", "rmse", "mape", "latency_ms", "throughput", "duration"]
+
+
+def find_jobs(model_dir, model_types, scats_nums=None):
+    jobs = []
+
+    for model_type in model_types:
+        # e.g. "_lstm.keras", or "_lstm_int8.tflite" for a variant
+        suffix = prediction_module.model_file_name("", model_type, prediction_module.VARIANT)
+        sites = sorted(
+            (name[:-len(suffix)] for name in os.listdir(model_dir) if name.endswith(suffix) and name[:-len(suffix)].isdigit()),
+            key=int,
+        )
+
+        jobs += [(scats_num, model_type) for scats_num in sites if not scats_nums or scats_num in scats_nums]
+
+    return jobs
+
+
+def init_worker(threads, backend, variant):
+    # Spawned workers don't inherit the backend chosen in the parent
+    prediction_module.BACKEND = backend
+    prediction_module.VARIANT = variant
+
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(threads)
+    except RuntimeError:
+        pass  # TensorFlow is already running in this process
+
+
+def evaluate_site(scats_num, model_type, model_dir, csv_dir, batch_size):
+    from training.evaluation import load_split, load_scalers, evaluate_model
+
+    backend = prediction_module.BACKEND
+    variant = prediction_module.VARIANT
+    start = time.perf_counter()
+
+    try:
+        model = prediction_module.load_model(f"{model_dir}/{prediction_module.model_file_name(scats_num, model_type, variant)}", backend)
+
+        scalers = load_scalers(f"{model_dir}/{scats_num}_{model_type}_scalers.npz")
+        _, _, X_test, y_test = load_split(f"{csv_dir}/{scats_num}_trafficflow.csv", model_type, scalers)
+
+        result = evaluate_model(model, X_test, y_test, scalers[0], batch_size)
+        result["samples"] = len(X_test)
+    except Exception as e:
+        logger.log(f"Evaluating {scats_num} {model_type} failed: {e}")
+        result = {column: None for column in COLUMNS}
+
+    result.update({"scats": scats_num, "model": model_type, "backend": backend, "variant": variant, "duration": time.perf_counter() - start})
+    return result
+
+
+def summarize(rows):
+    # Per model type: mean error, median latency and total throughput over its sites
+    summary = {}
+
+    for model_type in dict.fromkeys(row["model"] for row in rows):
+        scored = [row for row in rows if row["model"] == model_type and row["mae"] is not None]
+
+        summary[model_type] = {
+            "sites": len(scored),
+            "failed": sum(1 for row in rows if row["model"] == model_type) - len(scored),
+            "mae": float(np.mean([row["mae"] for row in scored])) if scored else None,
+            "rmse": float(np.mean([row["rmse"] for row in scored])) if scored else None,
+            "mape": float(np.mean([row["mape"] for row in scored])) if scored else None,
+            "latency_ms": float(np.median([row["latency_ms"] for row in scored])) if scored else None,
+            "throughput": float(np.median([row["throughput"] for row in scored])) if scored else None,
+        }
+
+    return summary
+
+
+def print_summary(summary, baseline=None):
+    print(f"{'model':<7}{'sites':>6}{'failed':>7}{'MAE':>9}{'RMSE':>9}{'MAPE %':>9}{'latency ms':>12}{'samples/s':>12}")
+
+    for model_type, row in summary.items():
+        if row["mae"] is None:
+            print(f"{model_type:<7}{row['sites']:>6}{row['failed']:>7}")
+            continue
+
+        line = (
+            f"{model_type:<7}{row['sites']:>6}{row['failed']:>7}{row['mae']:>9.3f}{row['rmse']:>9.3f}"
+            f"{row['mape']:>9.3f}{row['latency_ms']:>12.3f}{row['throughput']:>12.0f}"
+        )
+
+        previous = (baseline or {}).get(model_type)
+        if previous and previous.get("mae") is not None:
+            line += (
+                f"   MAE {row['mae'] - previous['mae']:+.3f}, "
+                f"latency {row['latency_ms'] - previous['latency_ms']:+.3f} ms vs baseline"
+            )
+
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", help="Model types to evaluate", nargs="+", default=MODEL_TYPES, choices=MODEL_TYPES)
+    parser.add_argument("--scats", help="Sites to evaluate (default every site with a model)", nargs="+")
+    parser.add_argument("--workers", help="Worker processes", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--batch", help="Inference batch size", type=int, default=512)
+    prediction_module.add_backend_arguments(parser)
+    parser.add_argument("--model_dir", help="Directory of the per-site models", default=prediction_module.NEW_MODEL_DIR)
+    parser.add_argument("--output", help="Results file name without extension (.csv and .json are written)", default="evaluation")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+
+    args = parser.parse_args()
+    prediction_module.apply_backend_arguments(parser, args)
+
+    jobs = find_jobs(args.model_dir, args.model, args.scats)
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+
+    variant_text = f" {args.variant}" if args.variant else ""
+    logger.log(f"Evaluating {len(jobs)}{variant_text} models with the {args.backend} backend on {args.workers} workers")
+    start = time.perf_counter()
+
+    # Spawned workers so each gets its own TensorFlow runtime, sharing the cores
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(threads, args.backend, args.variant),
+    ) as executor:
+        futures = [
+            executor.submit(evaluate_site, scats_num, model_type, args.model_dir, prediction_module.CSV_DIR, args.batch)
+            for scats_num, model_type in jobs
+        ]
+
+        rows = []
+        for count, future in enumerate(as_completed(futures), start=1):
+            row = future.result()
+            rows.append(row)
+
+            if row["mae"] is not None:
+                logger.log(f"[{count} of {len(jobs)}] {row['model']} -> {row['scats']}: MAE {row['mae']:.3f}, "
+                           f"{row['latency_ms']:.3f} ms, {row['throughput']:.0f} samples/s")
+
+    rows.sort(key=lambda row: (MODEL_TYPES.index(row["model"]), int(row["scats"])))
+    summary = summarize(rows)
+
+    with open(f"{args.output}.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    with open(f"{args.output}.json", "w", encoding="utf-8") as f:
+        json.dump({"backend": args.backend, "variant": args.variant, "batch": args.batch, "summary": summary, "results": rows}, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+
+    print_summary(summary, baseline)
+    logger.log(f"Evaluated {len(rows)} models in {time.perf_counter() - start:.1f}s, wrote {args.output}.csv and {args.output}.json")
+
+
+if __name__ == "__main__":
+    main()
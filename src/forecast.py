@@ -0,0 +1,49 @@
+import sys
+sys.dont_write_bytecode = True
+
+# Project Imports
+import predict as prediction_module
+import utilities.logger as logger
+
+# Library Imports
+import argparse
+import csv
+import time
+
+# Writes a day-ahead (or any number of 15 minute steps) forecast table for every
+# loaded site. Run from src/: python forecast.py --date_time "1/10/2006 00:00"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", help="Model type (lstm, gru, saes or cnn)", default="lstm")
+    parser.add_argument("--date_time", help="First forecast slot as dd/mm/yyyy HH:MM", default="1/10/2006 00:00")
+    parser.add_argument("--steps", help="15 minute steps to forecast (96 is one day)", type=int, default=96)
+    parser.add_argument("--scats", help="Sites to forecast (default every loaded site)", nargs="+")
+    parser.add_argument("--output", help="CSV file to write", default="forecast.csv")
+    prediction_module.add_backend_arguments(parser)
+
+    args = parser.parse_args()
+    prediction_module.apply_backend_arguments(parser, args)
+    prediction_module.init([args.model])
+
+    scats_nums = args.scats or sorted(name.split("_")[0] for name in prediction_module.all_models)
+
+    start = time.perf_counter()
+    forecast = prediction_module.rollout(scats_nums, args.date_time, args.steps, args.model)
+    logger.log(f"Forecast {args.steps} steps for {len(forecast['flows'])} sites in {time.perf_counter() - start:.2f}s")
+
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["scats", "direction", "15 Minutes", "flow"])
+
+        for scats_num, directions in forecast["flows"].items():
+            for direction, flows in directions.items():
+                for date_time, flow in zip(forecast["date_times"], flows):
+                    writer.writerow([scats_num, direction, date_time, round(float(flow), 2)])
+
+    logger.log(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
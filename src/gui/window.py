@@ -8,23 +8,29 @@ from PyQt5.QtWidgets import (
     QLabel,
     QPushButton,
     QPlainTextEdit,
-    QComboBox
+    QComboBox,
+    QProgressBar
 )
 from PyQt5 import QtWebEngineWidgets, QtCore, QtWidgets
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QMessageBox
 from folium import plugins, IFrame
+from folium.utilities import image_to_url
 import qdarktheme
 import folium as folium
 
 # System Imports
+import json
 import sys
+import threading
 
 # Project Imports
 import algorithms.bfs as bfs
 import algorithms.astar as astar
 import algorithms.graph as graph_maker
+from algorithms.engine import RoutingEngine
 import utilities.logger as logger
+import utilities.profiling as profiling
 import predict as prediction_module
 import main as main
 
@@ -36,69 +42,103 @@ WINDOW_SIZE = (1200, 500)
 WINDOW_LOCATION = (160, 70)
 
 # Global variables
-graph = None
+engine = None
 map_widget = None
 selected_model = "lstm"  # Default model
+PROFILE_DIR = None  # set by main.py --profile, each query is profiled into it
+current_job = None  # the RoutingJob running on the thread pool, if any
+
+# Added to the base map page once. showRoutes replaces the previous query's layer
+# with a GeoJSON FeatureCollection, so Leaflet, the tiles and the site markers are
+# not reloaded per query. Each feature carries its Leaflet style, popup and tooltip.
+ROUTE_LAYER_SCRIPT = """
+var routeLayer = null;
+
+function showRoutes(routes) {
+    var map = window["MAP_NAME"];
+
+    if (routeLayer !== null) {
+        routeLayer.remove();
+    }
+
+    routeLayer = L.geoJSON(routes, {
+        style: function (feature) {
+            return feature.properties.style;
+        },
+        pointToLayer: function (feature, latlng) {
+            if (feature.properties.pin) {
+                var size = feature.properties.size;
+                var icon = L.icon({iconUrl: "PIN_URL", iconSize: [size, size], iconAnchor: [size / 2, size], popupAnchor: [0, -size]});
+                return L.marker(latlng, {icon: icon});
+            }
+            return L.circleMarker(latlng, feature.properties.style);
+        },
+        onEachFeature: function (feature, layer) {
+            layer.bindPopup(feature.properties.popup, {maxWidth: feature.properties.popup_width});
+            layer.bindTooltip(feature.properties.tooltip);
+        }
+    }).addTo(map);
+}
+"""
 
 def update_map(html):
     global map_widget
 
     map_widget.setHtml(html, QtCore.QUrl(""))
 
-# Create PIN markers for the SCATs site on the map
-def create_marker(scat, map_obj, color="green", size=30, tooltip=None, end=False):
-    tip = str(scat)
-    if tooltip:
-        tip = tooltip
+def show_routes(routes):
+    # Draws a query's routes into the page already loaded in the map widget
+    map_widget.page().runJavaScript(f"showRoutes({json.dumps(routes)});")
 
-    html = f"""
-        <div style="font-family: Arial; font-size: 11px; padding: 2px; text-align: center; min-width: 60px;">
-        <b>Scat Number: {scat}</b>
-        </div>
-        """
-    
-    if end:
-        html = f"""
+def add_route_layer(map_obj):
+    # The map's variable is looked up when showRoutes runs, folium declares it later in the page
+    pin_url = image_to_url("assets/pin.png")
+    script = ROUTE_LAYER_SCRIPT.replace("MAP_NAME", map_obj.get_name()).replace("PIN_URL", pin_url)
+
+    map_obj.get_root().script.add_child(folium.Element(script))
+
+def scat_popup_html(scat, label="Scat Number"):
+    return f"""
         <div style="font-family: Arial; font-size: 11px; padding: 2px; text-align: center; min-width: 60px;">
-        <b>End Scat: {scat}</b>
+        <b>{label}: {scat}</b>
         </div>
         """
 
-    popup = folium.Popup(html, max_width=200)
-
-    custom_icon = folium.CustomIcon(
-        icon_image="assets/pin.png",
-        icon_size=(size, size),
-        icon_anchor=(size // 2, size),
-        popup_anchor=(0, -size)
-    )
+def point_feature(scat, properties):
+    latitude, longitude = graph_maker.get_coords_by_scat(int(scat))
 
-    folium.Marker(
-        graph_maker.get_coords_by_scat(int(scat)),
-        popup=popup,
-        tooltip=tip,
-        icon=custom_icon,
-    ).add_to(map_obj)
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [longitude, latitude]},  # GeoJSON is longitude first
+        "properties": properties,
+    }
 
-# Create circle markers for the SCATs site on the map
+# PIN marker for a SCATs site on the route layer
+def marker_feature(scat, size=30, tooltip=None, end=False):
+    return point_feature(scat, {
+        "pin": True,
+        "size": size,
+        "popup": scat_popup_html(scat, "End Scat" if end else "Scat Number"),
+        "popup_width": 200,
+        "tooltip": tooltip or str(scat),
+    })
+
+# Circle marker for a SCATs site on the route layer
+def circle_marker_feature(scat, color="grey", size=2, tooltip=None, start=False):
+    return point_feature(scat, {
+        "style": {"radius": size, "color": color, "fill": True, "fillColor": color},
+        "popup": scat_popup_html(scat, "Start Scat" if start else "Scat Number"),
+        "popup_width": 75,
+        "tooltip": tooltip or str(scat),
+    })
+
+# Create circle markers for the SCATs site on the base map
 def create_circle_marker(scat, map_obj, color="grey", size=2, tooltip=None, start=False):
     tip = str(scat)
     if tooltip:
         tip = tooltip
-    
-    html = f"""
-        <div style="font-family: Arial; font-size: 11px; padding: 2px; text-align: center; min-width: 60px;">
-        <b>Scat Number: {scat}</b>
-        </div>
-        """
-    if start:
-        html = f"""
-        <div style="font-family: Arial; font-size: 11px; padding: 2px; text-align: center; min-width: 60px;">
-        <b>Start Scat: {scat}</b>
-        </div>
-        """
 
-    popup = folium.Popup(html, max_width=75)
+    popup = folium.Popup(scat_popup_html(scat, "Start Scat" if start else "Scat Number"), max_width=75)
 
     folium.CircleMarker(
         graph_maker.get_coords_by_scat(int(scat)),
@@ -132,9 +172,8 @@ def create_popup(index, time, distance):
         </table>
     </div>
     """
-    popup = folium.Popup(html, max_width=130)
 
-    return popup
+    return html
 
 # Function to run the pathfinding algorithm
 
@@ -157,8 +196,57 @@ def show_info_message(text, title):
     msg.setWindowIcon(QIcon('assets/app_icon.png'))
     msg.exec_()
 
+class RoutingSignals(QtCore.QObject):
+    # Emitted from the pool thread and delivered, queued, to the slots on the UI thread
+    progress = QtCore.pyqtSignal(int, int, str)  # done, total (0 while it can't be counted), message
+    finished = QtCore.pyqtSignal(object)  # the paths and their GeoJSON, or None if no path was found
+    failed = QtCore.pyqtSignal(str)
+    cancelled = QtCore.pyqtSignal()
+
+class RoutingJob(QtCore.QRunnable):
+    # One query: the search, with its per segment predictions, and the route GeoJSON are
+    # built on a pool thread so the window keeps responding. Only the slots
+    # connected to the signals touch widgets.
+    def __init__(self, start, end, date_time, model):
+        super().__init__()
+        self.start = start
+        self.end = end
+        self.date_time = date_time
+        self.model = model
+        self.signals = RoutingSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def report(self, done, total, message):
+        self.signals.progress.emit(done, total, message)
+
+    def run(self):
+        try:
+            if PROFILE_DIR is None:
+                result = find_and_draw_paths(self.start, self.end, self.date_time, self.model, self.report, self.cancel_event)
+            else:
+                with profiling.profile(PROFILE_DIR, profiling.profile_name("route", self.start, self.end, self.date_time)):
+                    result = find_and_draw_paths(self.start, self.end, self.date_time, self.model, self.report, self.cancel_event)
+        except astar.SearchCancelled:
+            logger.log(f"Pathfinding from {self.start} to {self.end} cancelled.")
+            self.signals.cancelled.emit()
+        except Exception as e:
+            logger.error(f"Pathfinding from {self.start} to {self.end} failed: {e}")
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
 def run_pathfinding(start, end, date_time):
-    global graph, menu_layout
+    global current_job
+
+    # The run button doubles as the cancel button while a query is running
+    if current_job is not None:
+        current_job.cancel()
+        run_button.setEnabled(False)
+        progress_label.setText("Cancelling...")
+        return
 
     startCheck = graph_maker.does_scat_exist(start)
     endCheck = graph_maker.does_scat_exist(end)
@@ -173,21 +261,57 @@ def run_pathfinding(start, end, date_time):
         return
     
     if endCheck == False:
-        show_info_message("End SCAT number {end} does not exist. Please enter a valid SCAT number.", "Invalid SCAT Number")
+        show_info_message(f"End SCAT number {end} does not exist. Please enter a valid SCAT number.", "Invalid SCAT Number")
         return
 
-    # clear flow data
-    astar.flow_dict = {}
+    current_job = RoutingJob(start, end, date_time, selected_model)
+    current_job.signals.progress.connect(show_progress)
+    current_job.signals.finished.connect(show_paths)
+    current_job.signals.failed.connect(show_failure)
+    current_job.signals.cancelled.connect(lambda: finish_job("Pathfinding cancelled."))
 
-    logger.log(f"Running pathfinding algorithm from {start} to {end}")
+    run_button.setText("Cancel")
+    show_progress(0, 0, f"Finding paths from {start} to {end}...")
+    progress_bar.show()
 
-    graph = graph_maker.generate_graph()
+    QtCore.QThreadPool.globalInstance().start(current_job)
 
-    map_obj = folium.Map(
-        location=(-37.820946, 145.060832), zoom_start=12, tiles="CartoDB Positron"
-    )
+def cancel_pathfinding():
+    # Called as the app quits, so the pool thread stops at its next expansion
+    if current_job is not None:
+        current_job.cancel()
+        QtCore.QThreadPool.globalInstance().waitForDone()
 
-    draw_all_scats(map_obj)
+def show_progress(done, total, message):
+    # Updates still queued from a job being cancelled would hide "Cancelling..."
+    if current_job is None or current_job.cancel_event.is_set():
+        return
+
+    # A zero total shows a busy indicator until there is something to count
+    progress_bar.setRange(0, total)
+    progress_bar.setValue(done)
+    progress_label.setText(message)
+    progress_label.show()
+
+def finish_job(message):
+    global current_job
+
+    current_job = None
+    run_button.setText("Run Pathfinding")
+    run_button.setEnabled(True)
+    progress_bar.hide()
+    progress_label.setText(message)
+
+def show_failure(message):
+    finish_job("Pathfinding failed.")
+    show_info_message(f"Pathfinding failed: {message}", "Pathfinding Error")
+
+def find_and_draw_paths(start, end, date_time, model, report, cancel_event):
+    # Runs on the pool thread: returns everything show_paths needs, touches no widgets.
+    # The routes are GeoJSON features drawn over the base map already in the page.
+    logger.log(f"Running pathfinding algorithm from {start} to {end}")
+
+    features = []
 
     logger.log(f"Using start and end node [{start}, {end}]")
 
@@ -197,11 +321,16 @@ def run_pathfinding(start, end, date_time):
     time = round_to_nearest_15_minutes(datetime_split[1])
     formatted_datetime = f"{date} {time}"
 
-    paths = astar.astar(graph, start, int(end), formatted_datetime, model = selected_model)
+    def path_found(found, num_paths):
+        report(found, num_paths, f"Found {found} of up to {num_paths} paths...")
+
+    paths = engine.route(start, int(end), formatted_datetime, model=model, progress=path_found, cancel=cancel_event)
 
     if paths is None or len(paths) == 0:
         logger.log("No paths found.")
-        return
+        return None
+
+    report(0, 0, "Drawing routes...")
 
     # Reverse the paths so the last path is drawn first
     reversed_paths = list(reversed(paths))
@@ -210,6 +339,9 @@ def run_pathfinding(start, end, date_time):
 
     # Draw each path with a different color
     for path_index, path_info in enumerate(reversed_paths):
+        if cancel_event.is_set():
+            raise astar.SearchCancelled()
+
         is_main_path = False
 
         # if last path, make it blue
@@ -229,8 +361,8 @@ def run_pathfinding(start, end, date_time):
 
             # If path is a main path
             if is_main_path:
-                # Check thresholds for traffic flow, from dict.
-                flow = astar.flow_dict.get(f"{next_node}")
+                # Check thresholds for traffic flow, from the path's segment flows.
+                flow = path_info['flows'][i]
 
                 if not flow:
                     flow = 0
@@ -241,16 +373,22 @@ def run_pathfinding(start, end, date_time):
 
             # if the node is not the first or last node draw cirlce
             if i != 0 and i != len(path_info['path']) - 1:
-                create_circle_marker(current, map_obj, color=color, size=2)
-
-            folium.PolyLine(
-                [(start_lat, start_long), (end_lat, end_long)],
-                color=color,
-                weight=2.5 if path_index == 0 else 2.0,
-                opacity=1.0 if path_index == 0 else 0.8,
-                popup=create_popup(display_index, path_info['time'], path_info['distance']),
-                tooltip=f'Path {display_index + 1} - Segment: {current} → {next_node}', 
-            ).add_to(map_obj)
+                features.append(circle_marker_feature(current, color=color, size=2))
+
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": [[start_long, start_lat], [end_long, end_lat]]},
+                "properties": {
+                    "style": {
+                        "color": color,
+                        "weight": 2.5 if path_index == 0 else 2.0,
+                        "opacity": 1.0 if path_index == 0 else 0.8,
+                    },
+                    "popup": create_popup(display_index, path_info['time'], path_info['distance']),
+                    "popup_width": 130,
+                    "tooltip": f'Path {display_index + 1} - Segment: {current} → {next_node}',
+                },
+            })
 
         # Add a summary for this path
         logger.log(
@@ -258,19 +396,37 @@ def run_pathfinding(start, end, date_time):
         display_index -= 1
 
      # add start and end markers on the map with the displayed scat number
-    create_circle_marker(start, map_obj, color="lightgreen",
-                         size=3, tooltip=f"Start - {start}", start=True)
-    create_marker(end, map_obj, tooltip=f"End - {end}", end=True)
+    features.append(circle_marker_feature(start, color="lightgreen",
+                                          size=3, tooltip=f"Start - {start}", start=True))
+    features.append(marker_feature(end, tooltip=f"End - {end}", end=True))
+
+    routes = {"type": "FeatureCollection", "features": features}
+
+    return {"paths": paths, "routes": routes, "date": date, "date_time": date_time, "model": model}
+
+def show_paths(result):
+    # Runs on the UI thread with the finished job's result
+    if result is None:
+        finish_job("No paths found.")
+        return
 
-    update_map(map_obj._repr_html_())
+    finish_job("")
+    progress_label.hide()
+
+    paths = result["paths"]
+    date = result["date"]
+    date_time = result["date_time"]
+    model = result["model"]
+
+    show_routes(result["routes"])
     
-    logger.log(f"Flow Dict -> {astar.flow_dict}")
+    logger.log(f"Segment Flows -> {paths[0]['flows']}")
     path_label_str = ""
 
     if len(paths) == 1:
-        path_label_str = f"Pathfinding complete. {len(paths)} path found. \nDate: {get_day_of_week(date)} {format_date_to_words(date_time)} \nModel: {selected_model.upper()}"
+        path_label_str = f"Pathfinding complete. {len(paths)} path found. \nDate: {get_day_of_week(date)} {format_date_to_words(date_time)} \nModel: {model.upper()}"
     else:
-        path_label_str = f"Pathfinding complete. {len(paths)} paths found. \nDate: {get_day_of_week(date)} {format_date_to_words(date_time)} \nModel: {selected_model.upper()}"
+        path_label_str = f"Pathfinding complete. {len(paths)} paths found. \nDate: {get_day_of_week(date)} {format_date_to_words(date_time)} \nModel: {model.upper()}"
     
     if (menu_layout.parent().findChild(QLabel, "path_display") is not None):
         menu_layout.parent().findChild(QLabel, "path_display").setText(path_label_str)
@@ -308,7 +464,7 @@ def run_pathfinding(start, end, date_time):
 
 # Create the menu widget for the GUI
 def make_menu():
-    global menu_layout
+    global menu_layout, run_button, progress_bar, progress_label
     logger.log("Creating menu...")
 
     # Create a widget for the menu
@@ -369,6 +525,17 @@ def make_menu():
     )
     menu_layout.addWidget(run_button)
 
+    # Progress of the running query, hidden while idle
+    progress_label = QLabel()
+    progress_label.setStyleSheet("font-size: 12px; color: white;")
+    progress_label.hide()
+    menu_layout.addWidget(progress_label)
+
+    progress_bar = QProgressBar()
+    progress_bar.setTextVisible(False)
+    progress_bar.hide()
+    menu_layout.addWidget(progress_bar)
+
     # Add a stretcher to push buttons to the top
     menu_layout.addStretch()
 
@@ -394,7 +561,7 @@ def update_selected_model(model):
 
 
 def create_map():
-    global graph, map_widget
+    global map_widget
 
     logger.log("Creating map...")
 
@@ -405,6 +572,7 @@ def create_map():
     map_widget = QtWebEngineWidgets.QWebEngineView()
 
     draw_all_scats(map_obj)
+    add_route_layer(map_obj)
 
     return map_obj
 
@@ -420,7 +588,7 @@ def draw_all_scats(map_obj):
 
 
 def make_window():
-    global graph, map_widget
+    global map_widget
 
     logger.log("Creating window...")
 
@@ -430,7 +598,8 @@ def make_window():
     main_widget.setLayout(main_layout)
     main_layout.setSpacing(0)  # Set spacing to zero
 
-    update_map(create_map()._repr_html_())
+    # The full page rather than _repr_html_'s iframe, so runJavaScript reaches showRoutes
+    update_map(create_map().get_root().render())
 
     map_widget.page().setBackgroundColor(QtCore.Qt.transparent)
 
@@ -442,7 +611,7 @@ def make_window():
 
 
 def run():
-    global app, graph
+    global app, engine
 
     app = QApplication(sys.argv)
     qdarktheme.setup_theme("dark")
@@ -457,9 +626,13 @@ def run():
 
     graph_maker.init()
     prediction_module.init()
+    engine = RoutingEngine()
     window.setCentralWidget(make_window())
 
     logger.log("Window created.")
 
+    # Stop a running query rather than waiting on it when the window is closed
+    app.aboutToQuit.connect(cancel_pathfinding)
+
     window.show()
     app.exec()
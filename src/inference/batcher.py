@@ -0,0 +1,158 @@
+# Project Imports
+import predict as prediction_module
+import utilities.logger as logger
+import utilities.tracing as tracing
+import utilities.metrics as metrics
+
+# Library Imports
+from concurrent.futures import Future
+import threading
+import time
+
+DEFAULT_WINDOW = 0.002  # seconds to collect requests before running a batch
+DEFAULT_MAX_BATCH = 1024
+
+# Shared with predict.py, which counts the failures it catches itself
+PREDICTION_ERRORS = metrics.counter("tps_prediction_errors_total", "Predictions that raised an error", ["model"])
+
+
+class PredictionBatcher:
+    # Micro-batching front for predict.py. Requests from any number of threads are
+    # collected for a short window, identical (site, date_time, direction, model)
+    # keys are merged, and every site model runs one batched inference with the
+    # results fanned back out to the waiting threads.
+    #
+    # Exposes predict_new_model / predict_new_model_batch / predict_horizons_batch /
+    # predict_horizons_sites, so it can be used as the predictor of a RoutingEngine. Requests resolve to
+    # every forecast horizon, so lookups for different horizons share a prediction.
+    def __init__(self, predictor=prediction_module, window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH):
+        self.predictor = predictor
+        self.window = window
+        self.max_batch = max_batch
+
+        self.stats = {"requests": 0, "deduplicated": 0, "batches": 0, "model_calls": 0, "errors": 0}
+
+        self._pending = {}   # key -> Future, waiting for the next batch
+        self._in_flight = {}  # key -> Future, in the batch being predicted
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, scats_num, date_time, direction, model_type="lstm"):
+        key = (str(scats_num), date_time, direction, model_type)
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Prediction batcher is closed")
+
+            self.stats["requests"] += 1
+            future = self._pending.get(key) or self._in_flight.get(key)
+
+            if future is not None:
+                self.stats["deduplicated"] += 1
+                return future
+
+            future = Future()
+            self._pending[key] = future
+            self._condition.notify()
+
+        return future
+
+    def predict_new_model(self, scats_num, date_time, direction, model_type="lstm", horizon=0):
+        flows = self.submit(scats_num, date_time, direction, model_type).result()
+        return prediction_module.select_horizon(flows, horizon) if flows is not None else None
+
+    def predict_new_model_batch(self, scats_num, date_time, directions, model_type="lstm", horizon=0):
+        flows = self.predict_horizons_batch(scats_num, date_time, directions, model_type)
+
+        if flows is None:
+            return None
+
+        return [prediction_module.select_horizon(direction_flows, horizon) for direction_flows in flows]
+
+    def predict_horizons_batch(self, scats_num, date_time, directions, model_type="lstm"):
+        futures = [self.submit(scats_num, date_time, direction, model_type) for direction in directions]
+        flows = [future.result() for future in futures]
+
+        # Match predict.predict_horizons_batch, which fails a site as a whole
+        if any(direction_flows is None for direction_flows in flows):
+            return None
+
+        return flows
+
+    def predict_horizons_sites(self, site_queries, model_type="lstm"):
+        # Submits every site before waiting on any, so a network-wide prefetch shares
+        # one collection window instead of paying it once per site
+        site_futures = [
+            [self.submit(scats_num, date_time, direction, model_type) for direction in directions]
+            for scats_num, date_time, directions in site_queries
+        ]
+
+        results = []
+        for futures in site_futures:
+            flows = [future.result() for future in futures]
+            results.append(None if any(direction_flows is None for direction_flows in flows) else flows)
+
+        return results
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+
+                if not self._pending:
+                    return
+
+                # Keep collecting until the window closes or the batch is full
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closed:
+                        break
+                    self._condition.wait(remaining)
+
+                batch = self._pending
+                self._pending = {}
+                self._in_flight = batch
+
+            self._dispatch(batch)
+
+            with self._condition:
+                self._in_flight = {}
+
+    def _dispatch(self, batch):
+        # One model call per site model, covering every date_time and direction asked of it
+        groups = {}
+        for key in batch:
+            groups.setdefault((key[0], key[3]), []).append(key)
+
+        self.stats["batches"] += 1
+        tracing.count("batcher.requests", len(batch))
+
+        for (scats_num, model_type), keys in groups.items():
+            try:
+                with tracing.span("batcher.dispatch", scats=scats_num, model=model_type, rows=len(keys)):
+                    flows = self.predictor.predict_site_batch(
+                        scats_num, [(key[1], key[2]) for key in keys], model_type, horizons=True
+                    )
+                self.stats["model_calls"] += 1
+            except Exception as e:
+                # Caught broadly because every waiter on this batch must be resolved,
+                # an exception escaping here would leave them blocked forever
+                self.stats["errors"] += 1
+                PREDICTION_ERRORS.labels(model_type).inc()
+                logger.error("Batched prediction failed for scats %s (%s): %r", scats_num, model_type, e)
+                flows = None
+
+            for index, key in enumerate(keys):
+                batch[key].set_result(flows[index] if flows is not None else None)
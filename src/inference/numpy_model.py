@@ -0,0 +1,315 @@
+import sys
+sys.dont_write_bytecode = True
+
+# Library Imports
+import argparse
+import io
+import json
+import os
+import re
+import zipfile
+import numpy as np
+
+# Pure NumPy forward pass for the architectures in training/model.py, loaded
+# straight from the saved .keras files (config.json + model.weights.h5). Every
+# layer works on a whole batch at once, so thousands of sites / time slots can
+# be evaluated per call without TensorFlow.
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def relu(x):
+    return np.maximum(x, 0)
+
+
+def linear(x):
+    return x
+
+
+ACTIVATIONS = {
+    "sigmoid": sigmoid,
+    "relu": relu,
+    "tanh": np.tanh,
+    "linear": linear,
+    None: linear,
+}
+
+
+def get_activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation: {name}")
+    return ACTIVATIONS[name]
+
+
+def build_dense(config, weights):
+    kernel = weights[0]
+    bias = weights[1] if config.get("use_bias", True) else 0
+    activation = get_activation(config.get("activation"))
+
+    def dense(x):
+        return activation(x @ kernel + bias)
+
+    return dense
+
+
+def build_batch_normalization(config, weights):
+    gamma, beta, mean, variance = weights
+    # Fold the moving statistics into one scale and offset
+    scale = gamma / np.sqrt(variance + config.get("epsilon", 1e-3))
+    offset = beta - mean * scale
+
+    def batch_normalization(x):
+        return x * scale + offset
+
+    return batch_normalization
+
+
+def build_activation(config, weights):
+    return get_activation(config.get("activation"))
+
+
+def build_identity(config, weights):
+    return linear
+
+
+def build_flatten(config, weights):
+    def flatten(x):
+        return x.reshape(x.shape[0], -1)
+
+    return flatten
+
+
+def build_lstm(config, weights):
+    kernel, recurrent_kernel, bias = weights
+    units = recurrent_kernel.shape[0]
+    activation = get_activation(config.get("activation", "tanh"))
+    recurrent_activation = get_activation(config.get("recurrent_activation", "sigmoid"))
+    return_sequences = config.get("return_sequences", False)
+
+    def lstm(x):
+        batch, timesteps, _ = x.shape
+        # Input projections for every timestep in one matmul
+        projected = x @ kernel + bias
+        h = np.zeros((batch, units), dtype=x.dtype)
+        c = np.zeros((batch, units), dtype=x.dtype)
+        outputs = []
+
+        for t in range(timesteps):
+            z = projected[:, t] + h @ recurrent_kernel
+            i = recurrent_activation(z[:, :units])
+            f = recurrent_activation(z[:, units:2 * units])
+            candidate = activation(z[:, 2 * units:3 * units])
+            o = recurrent_activation(z[:, 3 * units:])
+
+            c = f * c + i * candidate
+            h = o * activation(c)
+            outputs.append(h)
+
+        return np.stack(outputs, axis=1) if return_sequences else h
+
+    return lstm
+
+
+def build_gru(config, weights):
+    kernel, recurrent_kernel, bias = weights
+    units = recurrent_kernel.shape[0]
+    activation = get_activation(config.get("activation", "tanh"))
+    recurrent_activation = get_activation(config.get("recurrent_activation", "sigmoid"))
+    return_sequences = config.get("return_sequences", False)
+
+    if not config.get("reset_after", True):
+        raise ValueError("Only reset_after=True GRU layers are supported")
+
+    input_bias, recurrent_bias = bias[0], bias[1]
+
+    def gru(x):
+        batch, timesteps, _ = x.shape
+        projected = x @ kernel + input_bias
+        h = np.zeros((batch, units), dtype=x.dtype)
+        outputs = []
+
+        for t in range(timesteps):
+            x_t = projected[:, t]
+            recurrent = h @ recurrent_kernel + recurrent_bias
+
+            z = recurrent_activation(x_t[:, :units] + recurrent[:, :units])
+            r = recurrent_activation(x_t[:, units:2 * units] + recurrent[:, units:2 * units])
+            candidate = activation(x_t[:, 2 * units:] + r * recurrent[:, 2 * units:])
+
+            h = z * h + (1 - z) * candidate
+            outputs.append(h)
+
+        return np.stack(outputs, axis=1) if return_sequences else h
+
+    return gru
+
+
+def build_conv1d(config, weights):
+    kernel = weights[0]  # (kernel_size, in_channels, filters)
+    bias = weights[1] if config.get("use_bias", True) else 0
+    activation = get_activation(config.get("activation"))
+    kernel_size = kernel.shape[0]
+
+    if tuple(config.get("strides", [1])) != (1,) or tuple(config.get("dilation_rate", [1])) != (1,):
+        raise ValueError("Only stride 1, undilated Conv1D layers are supported")
+
+    padding = config.get("padding", "valid")
+
+    def conv1d(x):
+        if padding == "same":
+            left = (kernel_size - 1) // 2
+            x = np.pad(x, ((0, 0), (left, kernel_size - 1 - left), (0, 0)))
+
+        # (batch, steps, channels, kernel_size) windows, contracted against the kernel
+        windows = np.lib.stride_tricks.sliding_window_view(x, kernel_size, axis=1)
+        return activation(np.einsum("btck,kcf->btf", windows, kernel) + bias)
+
+    return conv1d
+
+
+def build_max_pooling1d(config, weights):
+    pool_size = config.get("pool_size", [2])[0]
+    strides = (config.get("strides") or [pool_size])[0]
+
+    if strides != pool_size or config.get("padding", "valid") != "valid":
+        raise ValueError("Only non-overlapping, valid MaxPooling1D layers are supported")
+
+    def max_pooling1d(x):
+        steps = x.shape[1] // pool_size
+        x = x[:, :steps * pool_size]
+        return x.reshape(x.shape[0], steps, pool_size, x.shape[2]).max(axis=2)
+
+    return max_pooling1d
+
+
+LAYER_BUILDERS = {
+    "Dense": build_dense,
+    "BatchNormalization": build_batch_normalization,
+    "Activation": build_activation,
+    "Dropout": build_identity,
+    "Flatten": build_flatten,
+    "LSTM": build_lstm,
+    "GRU": build_gru,
+    "Conv1D": build_conv1d,
+    "MaxPooling1D": build_max_pooling1d,
+}
+
+
+def to_snake_case(name):
+    # Same naming keras uses for the layer groups in model.weights.h5
+    name = re.sub(r"\W+", "", name)
+    name = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
+    return re.sub("([a-z])([A-Z])", r"\1_\2", name).lower()
+
+
+def read_layer_weights(weights_file, group_name):
+    group = weights_file["layers"][group_name]
+
+    # Recurrent layers keep their weights on the cell
+    if "cell" in group:
+        group = group["cell"]
+
+    variables = group["vars"]
+    return [np.array(variables[str(i)], dtype=np.float32) for i in range(len(variables))]
+
+
+class NumpyModel:
+    def __init__(self, layers, input_shape):
+        self.layers = layers
+        self.input_shape = input_shape
+
+    def __call__(self, X):
+        x = np.asarray(X, dtype=np.float32).reshape((-1,) + tuple(self.input_shape[1:]))
+
+        for layer in self.layers:
+            x = layer(x)
+
+        return x
+
+    def predict(self, X, verbose=0):
+        return self(X)
+
+
+def load_numpy_model(model_path):
+    import h5py
+
+    with zipfile.ZipFile(model_path) as archive:
+        config = json.loads(archive.read("config.json"))
+        weights_bytes = archive.read("model.weights.h5")
+
+    if config.get("class_name") != "Sequential":
+        raise ValueError(f"Only Sequential models are supported, got {config.get('class_name')}")
+
+    layers = []
+    input_shape = None
+    name_counts = {}
+
+    with h5py.File(io.BytesIO(weights_bytes), "r") as weights_file:
+        for layer in config["config"]["layers"]:
+            class_name = layer["class_name"]
+            layer_config = layer["config"]
+
+            if class_name == "InputLayer":
+                input_shape = layer_config.get("batch_shape") or layer_config.get("batch_input_shape")
+                continue
+
+            if input_shape is None:
+                input_shape = layer_config.get("batch_input_shape")
+
+            if class_name not in LAYER_BUILDERS:
+                raise ValueError(f"Unsupported layer type: {class_name}")
+
+            # Weight groups are named by class: dense, dense_1, dense_2, ...
+            base_name = to_snake_case(class_name)
+            count = name_counts.get(base_name, 0)
+            name_counts[base_name] = count + 1
+            group_name = base_name if count == 0 else f"{base_name}_{count}"
+
+            weights = read_layer_weights(weights_file, group_name) if group_name in weights_file["layers"] else []
+            layers.append(LAYER_BUILDERS[class_name](layer_config, weights))
+
+    return NumpyModel(layers, input_shape)
+
+
+def validate(model_path, samples=256, tolerance=1e-4, seed=0):
+    # Compare the NumPy forward pass against keras on random inputs
+    from keras.models import load_model
+
+    keras_model = load_model(model_path)
+    numpy_model = load_numpy_model(model_path)
+
+    X = np.random.default_rng(seed).random((samples,) + tuple(keras_model.inputs[0].shape[1:]), dtype=np.float32)
+    error = float(np.abs(numpy_model.predict(X) - keras_model.predict(X, verbose=0)).max())
+
+    return error, error <= tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("models", help="Model files or directories of .keras models to validate", nargs="+")
+    parser.add_argument("--samples", help="Random inputs per model", type=int, default=256)
+    parser.add_argument("--tolerance", help="Maximum absolute error", type=float, default=1e-4)
+
+    args = parser.parse_args()
+
+    model_paths = []
+    for path in args.models:
+        if os.path.isdir(path):
+            model_paths += [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".keras")]
+        else:
+            model_paths.append(path)
+
+    failures = 0
+    for model_path in model_paths:
+        error, passed = validate(model_path, args.samples, args.tolerance)
+        failures += not passed
+        print(f"{'OK  ' if passed else 'FAIL'} {model_path}: max abs error {error:.2e}")
+
+    print(f"{len(model_paths) - failures} of {len(model_paths)} models within {args.tolerance}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import sys
+sys.dont_write_bytecode = True
+
+# Project Imports
+from training.evaluation import load_split, load_scalers, evaluate_model
+import predict as prediction_module
+import utilities.logger as logger
+
+# Library Imports
+import argparse
+import csv
+import gzip
+import os
+import numpy as np
+import pandas as pd
+
+# Post-training optimization of the per-site models. Writes quantized and pruned
+# variants next to the originals (970_lstm_int8.tflite, 970_lstm_pruned.keras, ...),
+# evaluates each on a held-out split and reports accuracy against latency and size.
+# Run from src/: python -m inference.optimize --model lstm --scats 970 2000
+#
+# A variant is served with predict.VARIANT, e.g. python main.py --backend tflite --variant int8
+
+# variant -> (file extension, quantization, pruned)
+VARIANTS = {
+    "float16": (prediction_module.VARIANT_EXTENSIONS["float16"], "float16", False),
+    "int8": (prediction_module.VARIANT_EXTENSIONS["int8"], "int8", False),
+    "pruned": (prediction_module.VARIANT_EXTENSIONS["pruned"], None, True),
+    "pruned_int8": (prediction_module.VARIANT_EXTENSIONS["pruned_int8"], "int8", True),
+}
+
+DEFAULT_SPARSITY = 0.5
+DEFAULT_FINE_TUNE_EPOCHS = 5
+
+
+def apply_masks(model, masks):
+    for layer, layer_masks in zip(model.layers, masks):
+        if layer_masks:
+            layer.set_weights([weight * mask for weight, mask in zip(layer.get_weights(), layer_masks)])
+
+
+def prune_model(model, sparsity, X_train=None, y_train=None, fine_tune_epochs=0):
+    # Magnitude pruning: zero the smallest weights of every kernel, leaving biases
+    # and normalisation parameters untouched, then optionally retrain the rest with
+    # the pruned weights held at zero
+    import keras
+
+    pruned = keras.models.clone_model(model)
+    pruned.set_weights(model.get_weights())
+
+    masks = []
+    for layer in pruned.layers:
+        layer_masks = []
+
+        for weight in layer.get_weights():
+            if weight.ndim < 2:
+                layer_masks.append(np.ones_like(weight))
+            else:
+                layer_masks.append((np.abs(weight) >= np.quantile(np.abs(weight), sparsity)).astype(weight.dtype))
+
+        masks.append(layer_masks if any(mask.ndim >= 2 for mask in layer_masks) else [])
+
+    apply_masks(pruned, masks)
+
+    if fine_tune_epochs and X_train is not None:
+        class KeepPruned(keras.callbacks.Callback):
+            def on_train_batch_end(self, batch, logs=None):
+                apply_masks(self.model, masks)
+
+        pruned.compile(loss="mse", optimizer="rmsprop", metrics=["mape"])
+        pruned.fit(X_train, y_train, batch_size=256, epochs=fine_tune_epochs, verbose=0, callbacks=[KeepPruned()])
+
+    return pruned
+
+
+def file_sizes(path):
+    with open(path, "rb") as f:
+        contents = f.read()
+
+    # Pruned weights only shrink a model once it is compressed
+    return len(contents), len(gzip.compress(contents))
+
+
+def optimize_model(scats_num, model_type, variants, sparsity, fine_tune_epochs, model_dir):
+    import keras
+    from inference.compiled import CompiledModel
+    from inference.tflite import TFLiteModel, export_tflite
+
+    model_path = f"{model_dir}/{scats_num}_{model_type}.keras"
+    model = keras.models.load_model(model_path)
+
+    scalers = load_scalers(f"{model_dir}/{scats_num}_{model_type}_scalers.npz")
+    flow_scaler = scalers[0]
+
+    csv_path = f"{prediction_module.CSV_DIR}/{scats_num}_trafficflow.csv"
+    X_train, y_train, X_test, y_test = load_split(csv_path, model_type, scalers)
+
+    # The originals are timed through the compiled backend, the fastest keras path
+    rows = [{"variant": "original", "path": model_path, **evaluate_model(CompiledModel(model), X_test, y_test, flow_scaler)}]
+    pruned = None
+
+    for variant in variants:
+        extension, quantization, is_pruned = VARIANTS[variant]
+        variant_path = f"{model_dir}/{scats_num}_{model_type}_{variant}.{extension}"
+
+        source = model
+        if is_pruned:
+            if pruned is None:
+                pruned = prune_model(model, sparsity, X_train, y_train, fine_tune_epochs)
+            source = pruned
+
+        if extension == "tflite":
+            export_tflite(source, variant_path, quantization)
+            variant_model = TFLiteModel(variant_path)
+        else:
+            source.save(variant_path)
+            variant_model = CompiledModel(source)
+
+        rows.append({"variant": variant, "path": variant_path, **evaluate_model(variant_model, X_test, y_test, flow_scaler)})
+
+    for row in rows:
+        row["scats"] = scats_num
+        row["model"] = model_type
+        row["bytes"], row["gzip_bytes"] = file_sizes(row["path"])
+
+    return rows
+
+
+def print_summary(rows):
+    # Averages per model type and variant across every optimized site
+    df = pd.DataFrame(rows)
+    summary = df.groupby(["model", "variant"], sort=False)[["mae", "rmse", "mape", "latency_ms", "bytes", "gzip_bytes"]].mean()
+
+    print(f"{'model':<7}{'variant':<13}{'MAE':>9}{'RMSE':>9}{'MAPE %':>9}{'latency ms':>12}{'KB':>9}{'gzip KB':>9}")
+    for (model_type, variant), row in summary.iterrows():
+        print(
+            f"{model_type:<7}{variant:<13}{row['mae']:>9.3f}{row['rmse']:>9.3f}{row['mape']:>9.3f}"
+            f"{row['latency_ms']:>12.3f}{row['bytes'] / 1024:>9.1f}{row['gzip_bytes'] / 1024:>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", help="Model types to optimize", nargs="+", default=["lstm"])
+    parser.add_argument("--scats", help="Sites to optimize (default every site with the model)", nargs="+")
+    parser.add_argument("--variants", help="Variants to build", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--sparsity", help="Fraction of each kernel pruned", type=float, default=DEFAULT_SPARSITY)
+    parser.add_argument(
+        "--fine_tune",
+        help="Epochs to retrain pruned models with their pruned weights held at zero",
+        type=int,
+        default=DEFAULT_FINE_TUNE_EPOCHS,
+    )
+    parser.add_argument("--model_dir", help="Directory of .keras models", default=prediction_module.NEW_MODEL_DIR)
+    parser.add_argument("--report", help="CSV file to write the results to", default="optimization_report.csv")
+
+    args = parser.parse_args()
+
+    rows = []
+    for model_type in args.model:
+        scats_nums = args.scats or sorted(
+            name.split("_")[0] for name in os.listdir(args.model_dir) if name.endswith(f"_{model_type}.keras")
+        )
+
+        for scats_num in scats_nums:
+            logger.log(f"Optimizing {scats_num} {model_type}: {', '.join(args.variants)}")
+            rows += optimize_model(scats_num, model_type, args.variants, args.sparsity, args.fine_tune, args.model_dir)
+
+    columns = ["scats", "model", "variant", "mae", "rmse", "mape", "latency_ms", "throughput", "bytes", "gzip_bytes", "path"]
+    with open(args.report, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print_summary(rows)
+    logger.log(f"Wrote {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Library Imports
+import os
+import tempfile
+import threading
+import numpy as np
+
+
+def get_interpreter_class():
+    # Prefer the standalone LiteRT / tflite runtimes so TensorFlow isn't loaded to predict
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class TFLiteModel:
+    # Runs an exported .tflite model behind the same predict() call predict.py makes
+    # on keras models. The models are exported with a batch size of 1 (the recurrent
+    # layers don't convert with a dynamic batch), so batches are invoked row by row.
+    def __init__(self, model_path):
+        self.interpreter = get_interpreter_class()(model_path=model_path)
+        self.interpreter.allocate_tensors()
+
+        input_details = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()[0]
+
+        self.input_index = input_details["index"]
+        self.input_dtype = input_details["dtype"]
+        self.input_shape = tuple(input_details["shape"])
+        self.output_index = output_details["index"]
+        self.output_size = int(np.prod(output_details["shape"][1:]))
+
+        # An interpreter can only run one invocation at a time
+        self.lock = threading.Lock()
+
+    def predict(self, X, verbose=0):
+        X = np.asarray(X, dtype=self.input_dtype).reshape((-1,) + self.input_shape[1:])
+        outputs = np.empty((len(X), self.output_size), dtype=np.float32)
+
+        with self.lock:
+            for i in range(len(X)):
+                self.interpreter.set_tensor(self.input_index, X[i:i + 1])
+                self.interpreter.invoke()
+                outputs[i] = self.interpreter.get_tensor(self.output_index).reshape(-1)
+
+        return outputs
+
+
+# Post-training quantization options: "float16" stores float16 weights, "int8"
+# quantizes the weights to int8 (dynamic range, activations stay float)
+QUANTIZATIONS = ("float16", "int8")
+
+
+def export_tflite(model, tflite_path, quantization=None):
+    import tensorflow as tf
+    import keras
+
+    if quantization is not None and quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unsupported quantization: {quantization}")
+
+    input_shape = [1] + list(model.inputs[0].shape[1:])
+
+    # Export a fixed batch-1 inference signature, then convert it
+    with tempfile.TemporaryDirectory() as export_dir:
+        archive = keras.export.ExportArchive()
+        archive.track(model)
+        archive.add_endpoint(
+            "serve",
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec(input_shape, tf.float32)],
+        )
+        archive.write_out(export_dir, verbose=False)
+
+        converter = tf.lite.TFLiteConverter.from_saved_model(export_dir)
+
+        if quantization is not None:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        if quantization == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+
+        tflite_model = converter.convert()
+
+    with open(tflite_path, "wb") as f:
+        f.write(tflite_model)
+
+    return tflite_path
+
+
+def export_directory(model_dir):
+    # Convert every .keras model in a directory, writing the .tflite next to it
+    from keras.models import load_model
+
+    exported = []
+
+    for file_name in sorted(os.listdir(model_dir)):
+        if not file_name.endswith(".keras"):
+            continue
+
+        model_path = os.path.join(model_dir, file_name)
+        tflite_path = model_path[:-len(".keras")] + ".tflite"
+
+        export_tflite(load_model(model_path), tflite_path)
+        exported.append(tflite_path)
+
+        print(f"Exported {model_path} -> {tflite_path}")
+
+    return exported
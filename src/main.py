@@ -2,18 +2,33 @@
 import sys
 sys.dont_write_bytecode = True
 
-import pandas as pd
+import argparse
 import signal
 
 # Project Imports
 import gui.window as window
 import utilities.logger as logger
+import predict as prediction_module
 
 # Global Variables
 VERSION = "1.5.0"
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    prediction_module.add_backend_arguments(parser)
+
+    parser.add_argument(
+        "--profile",
+        help="Profile every routing query into this directory (default ./profiles)",
+        nargs="?",
+        const="./profiles",
+    )
+
+    args, _ = parser.parse_known_args()
+    prediction_module.apply_backend_arguments(parser, args)
+    window.PROFILE_DIR = args.profile
+
     logger.log(f"Launching TPS GUI - Version {VERSION}")
 
     # Register Ctrl+C signal handler
@@ -3,72 +3,192 @@ import sys
 sys.dont_write_bytecode = True
 
 from utilities import logger
+from utilities import tracing
+from utilities import metrics
 from utilities.time import *
 
-from tcn import TCN
 import os
-from keras.models import load_model
-from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
 from datetime import datetime
 
-import training.data as data
-from train import MODELS, TEST_CSV_DIRECTION
-
 import numpy as np
 import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
+
+# keras, tensorflow, sklearn and matplotlib are imported where they are used, so
+# importing this module stays cheap (check with python -X importtime -c "import predict")
 
 MODEL_DIR = "./saved_models"
 NEW_MODEL_DIR = "./saved_new_models"
 CSV_DIR = "../training_data/new_traffic_flows"
 
+# Inference backend used by init(): "keras" loads the .keras models, "tflite"
+# loads the exported .tflite models (see train.py --export) and "numpy" runs the
+# .keras weights through inference/numpy_model.py, neither of which need keras.
+# "compiled" calls each keras model through a traced tf.function instead of model.predict
+BACKEND = "keras"
+MODEL_EXTENSIONS = {"keras": "keras", "tflite": "tflite", "numpy": "keras", "compiled": "keras"}
+
+# Optional model variant to load instead of the originals, e.g. "int8" loads
+# 970_lstm_int8.tflite for the tflite backend (see inference/optimize.py)
+VARIANT = None
+VARIANT_EXTENSIONS = {"float16": "tflite", "int8": "tflite", "pruned": "keras", "pruned_int8": "tflite"}
+
 # key value (scats_num) -> model instance
 all_models = {}
 
-def init():
+PREDICTIONS = metrics.counter("tps_predictions_total", "Flows predicted", ["model"])
+MODEL_CALLS = metrics.counter("tps_model_calls_total", "Model inference calls", ["model"])
+PREDICTION_ERRORS = metrics.counter("tps_prediction_errors_total", "Predictions that raised an error", ["model"])
+
+def load_model(model_path, backend=None):
+    backend = backend or BACKEND
+
+    if backend == "tflite":
+        from inference.tflite import TFLiteModel
+        return TFLiteModel(model_path)
+
+    if backend == "numpy":
+        from inference.numpy_model import load_numpy_model
+        return load_numpy_model(model_path)
+
+    if backend == "compiled":
+        from inference.compiled import load_compiled_model
+        return load_compiled_model(model_path)
+
+    from keras.models import load_model as load_keras_model
+    return load_keras_model(model_path)
+
+def add_backend_arguments(parser):
+    # --backend and --variant, shared by the entry points that load models
+    parser.add_argument(
+        "--backend",
+        help="Prediction backend (keras, compiled, tflite or numpy)",
+        choices=sorted(MODEL_EXTENSIONS),
+        default=BACKEND,
+    )
+    parser.add_argument(
+        "--variant",
+        help="Optimized model variant to load, e.g. int8 (tflite) or pruned (see inference/optimize.py)",
+        choices=sorted(VARIANT_EXTENSIONS),
+        default=VARIANT,
+    )
+
+def apply_backend_arguments(parser, args):
+    global BACKEND, VARIANT
+
+    # Each variant is saved in one format, only the backends reading it can load it
+    if args.variant is not None:
+        extension = VARIANT_EXTENSIONS[args.variant]
+
+        if MODEL_EXTENSIONS[args.backend] != extension:
+            backends = sorted(backend for backend, backend_extension in MODEL_EXTENSIONS.items() if backend_extension == extension)
+            parser.error(f"--variant {args.variant} is saved as .{extension}, use --backend {' or '.join(backends)}")
+
+    BACKEND = args.backend
+    VARIANT = args.variant
+
+def model_file_name(scats_num, model_type, variant=None):
+    # 970_lstm.keras, or 970_lstm_int8.tflite for a variant
+    suffix = f"_{variant}" if variant else ""
+    return f"{scats_num}_{model_type}{suffix}.{MODEL_EXTENSIONS[BACKEND]}"
+
+@tracing.traced("predict.init")
+def init(model_types=None):
     count = 0
+    model_extension = MODEL_EXTENSIONS[BACKEND]
 
     # Load all lstm models from NEW_MODEL_DIR, key value (scats_num) -> model instance
     for model_name in os.listdir(NEW_MODEL_DIR):
         file_split = model_name.split(".")
 
-        file_name = file_split[0]
         file_ext = file_split[1]
 
-        if file_ext != "keras":
+        if file_ext != model_extension:
             continue
 
-        count += 1
-
         # Load Model
-        scats_split = model_name.split("_")
+        scats_split = file_split[0].split("_")
 
         scats_num = scats_split[0]
-        model_type = scats_split[1].replace(".keras", "")
+        model_type = scats_split[1]
+        variant = "_".join(scats_split[2:]) or None
+
+        # Only load the selected variant (the originals by default)
+        if variant != VARIANT:
+            continue
+
+        file_name = f"{scats_num}_{model_type}"
+
+        # Only load the requested model types, if given
+        if model_types is not None and model_type not in model_types:
+            continue
+
+        count += 1
 
         model_path = f"{NEW_MODEL_DIR}/{model_name}"
-        model = load_model(model_path)
 
-        # Load Traffic Flow CSV
-        csv_path = f"{CSV_DIR}/{scats_num}_trafficflow.csv"
-        df = pd.read_csv(csv_path, encoding="utf-8").fillna(0)
+        with tracing.span("model.load", scats=scats_num, model=model_type), metrics.STAGE_SECONDS.labels("model_load").time():
+            model = load_model(model_path)
+            all_models[file_name] = load_model_data(model, scats_num, model_type)
 
-        # Load Scalers
-        scaler_path = f"{NEW_MODEL_DIR}/{scats_num}_{model_type}_scalers.npz"
-        saved_data = np.load(scaler_path, allow_pickle=True)
+        logger.log(f"[{count} of 160] Loaded model, scalers and flow for {model_type} -> {scats_num}{f' ({variant})' if variant else ''}")
 
-        all_models[file_name] = {
-            "model": model,
-            "flow_csv": df,
-            "scaler": saved_data
-        }
+    # A missing variant or model type would otherwise only show up as failed predictions
+    if count == 0:
+        variant_text = f" {VARIANT}" if VARIANT else ""
+        raise FileNotFoundError(f"No{variant_text} .{model_extension} models in {NEW_MODEL_DIR} for {', '.join(model_types or ['any model type'])}")
+
+    logger.log(f"All models loaded successfully, list size -> {len(all_models)}")
 
-        logger.log(f"[{count} of 160] Loaded model, scalers and flow for {model_type} -> {scats_num}")
+def load_model_data(model, scats_num, model_type):
+    # Load Traffic Flow CSV
+    df = pd.read_csv(f"{CSV_DIR}/{scats_num}_trafficflow.csv", encoding="utf-8").fillna(0)
 
-    print("All models loaded successfully, list size -> ", len(all_models))
+    # Load Scalers
+    saved_data = np.load(f"{NEW_MODEL_DIR}/{scats_num}_{model_type}_scalers.npz", allow_pickle=True)
+
+    model_data = {
+        "model": model,
+        "flow_csv": df,
+        "scaler": saved_data,
+        "flow_scaler": saved_data['flow_scaler'].item(),
+        "temporal_scaler": saved_data['temporal_scaler'].item(),
+    }
+
+    # One-hot row for each direction the encoder knows
+    direction_encoder = saved_data['direction_encoder'].item()
+    categories = direction_encoder.categories_[0]
+    model_data["direction_rows"] = dict(zip(categories, np.eye(len(categories))))
+
+    # Process historical data once, so predictions only need to search it
+    history = df.copy()
+    history['slot'] = parse_slots(history['15 Minutes'])
+
+    # Add dummy direction if less than 4 directions
+    unique_directions = history['direction'].unique()
+
+    # If we have less than 4 directions, add a dummy direction
+    if len(unique_directions) < 4:
+        first_direction_data = history[history['direction'] == unique_directions[0]].copy()
+        first_direction_data['direction'] = 'D'
+        history = pd.concat([history, first_direction_data])
+
+    # Sorted as datetimes to keep the order rows sharing a timestamp have always had
+    history['datetime'] = slots_to_datetimes(history['slot'])
+    history = history.sort_values('datetime')
+
+    model_data["slots"] = history['slot'].values
+    model_data["flows"] = history['Lane 1 Flow (Veh/15 Minutes)'].values
+
+    return model_data
+
+def scale(values, scaler):
+    # MinMaxScaler.transform without sklearn's per call input validation
+    return values * scaler.scale_ + scaler.min_
 
 def plot_results(y_true, y_pred):
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+
     d = "2016-10-1 00:00"
     x = pd.date_range(d, periods=96, freq="15min")
 
@@ -89,103 +209,249 @@ def plot_results(y_true, y_pred):
 
     plt.show()
 
-def predict_new_model(scats_num, date_time, direction, model_type="lstm"):
+@tracing.traced("predict.features")
+@metrics.timed(metrics.STAGE_SECONDS.labels("features"))
+def build_inputs(model_data, target_slots, directions, model_type="lstm"):
+    # Model input for each (target slot, direction) pair, and a mask of the pairs
+    # that have the 4 flow values needed before their target time
+    targets = np.asarray(target_slots, dtype=np.int64)
+
+    # Find the last 4 flow values before each target slot
+    ends = np.searchsorted(model_data["slots"], targets, side="right")
+    has_history = ends >= 4
+    windows = np.maximum(ends[:, None] + np.arange(-4, 0), 0)
+
+    # Scale the historical flows and temporal features
+    scaled_flows = scale(model_data["flows"][windows], model_data["flow_scaler"])
+    scaled_temporal = scale(slot_temporal_features(targets), model_data["temporal_scaler"])
+
+    # Encode directions
+    direction_rows = model_data["direction_rows"]
+    direction_encoded = np.array([direction_rows[direction] for direction in directions])
+
+    # Create one input sequence per pair, 14 features per timestep
+    X_pred = np.empty((len(targets), 4, 14))
+    X_pred[:, :, 0] = scaled_flows  # Flow
+    X_pred[:, :, 1:6] = scaled_temporal[:, None]  # Temporal features
+    X_pred[:, :, 6:] = direction_encoded[:, None]  # Direction
+
+    if model_type.lower() == "saes":
+        # Flatten the input from (n, 4, 14) to (n, 56)
+        X_pred = X_pred.reshape(len(targets), -1)
+
+    return X_pred, has_history
+
+def build_model_input(scats_num, date_time, directions, model_type="lstm"):
+    # Load the model data
+    model_data = all_models[scats_num + "_" + model_type]
+
+    if model_data is None:
+        raise FileNotFoundError(f"Model not found for scats {scats_num} and type {model_type}")
+
+    # Convert input datetime string to its 15 minute slot
+    target_slot = to_slot(date_time)
+
+    X_pred, has_history = build_inputs(model_data, [target_slot] * len(directions), directions, model_type)
+
+    if not has_history.all():
+        return None
+
+    return model_data["model"], model_data["flow_scaler"], X_pred
+
+def predict_horizons(model, flow_scaler, X_pred):
+    # Unscaled flows, one row per input and one column per forecast horizon
+    with tracing.span("predict.inference", rows=len(X_pred)), metrics.STAGE_SECONDS.labels("inference").time():
+        predicted = model.predict(X_pred, verbose=0)
+
+    tracing.count("predict.model_calls")
+    return flow_scaler.inverse_transform(predicted.reshape(-1, 1)).reshape(len(X_pred), -1)
+
+def record_predictions(model_type, rows):
+    MODEL_CALLS.labels(model_type).inc()
+    PREDICTIONS.labels(model_type).inc(rows)
+
+def select_horizon(flows, horizon):
+    # Slots past a model's last horizon use the furthest forecast it makes
+    return flows[min(horizon, len(flows) - 1)]
+
+def predict_new_model(scats_num, date_time, direction, model_type="lstm", horizon=0):
     try:
-        # Load the model data
-        model_data = all_models[scats_num + "_" + model_type]
+        model_input = build_model_input(scats_num, date_time, [direction], model_type)
 
-        if model_data is None:
-            raise FileNotFoundError(f"Model not found for scats {scats_num} and type {model_type}")
-
-        model = model_data["model"]
-        df = model_data["flow_csv"].copy()  # Create a copy to avoid modifying original
-        saved_data = model_data["scaler"]
-
-        # Load the saved data
-        flow_scaler = saved_data['flow_scaler'].item()
-        temporal_scaler = saved_data['temporal_scaler'].item()
-        direction_encoder = saved_data['direction_encoder'].item()
-
-        # Process historical data
-        df['datetime'] = pd.to_datetime(df['15 Minutes'], dayfirst=True)
-        
-        # Add dummy direction if less than 4 directions
-        unique_directions = df['direction'].unique()
-
-        # If we have less than 4 directions, add a dummy direction
-        if len(unique_directions) < 4:
-            first_direction_data = df[df['direction'] == unique_directions[0]].copy()
-            first_direction_data['direction'] = 'D'
-            df = pd.concat([df, first_direction_data])
-
-        # Convert input datetime string to datetime object
-        target_datetime = pd.to_datetime(date_time, format='%d/%m/%Y %H:%M')
-        
-        # Extract temporal features for target datetime
-        temporal_features = np.array([[
-            target_datetime.hour,
-            target_datetime.minute,
-            target_datetime.dayofweek,
-            target_datetime.day,
-            target_datetime.month
-        ]])
-        
-        # Scale temporal features
-        scaled_temporal = temporal_scaler.transform(temporal_features)
-        
-        # Encode direction
-        direction_encoded = direction_encoder.transform([[direction]])
-        
-        df = df.sort_values('datetime')
-        
-        # Find the last 4 flow values before target_datetime
-        mask = df['datetime'] <= target_datetime
-        recent_flows = df[mask].tail(4)['Lane 1 Flow (Veh/15 Minutes)'].values
-        
-        if len(recent_flows) < 4:
-            print(f"Not enough historical data for {scats_num} {direction} at {date_time}")
+        if model_input is None:
+            logger.warning("Not enough historical data for %s %s at %s", scats_num, direction, date_time)
             return 0
-        
-        # Scale the historical flows
-        scaled_flows = flow_scaler.transform(recent_flows.reshape(-1, 1)).reshape(-1)
-        
-        # Create the input sequence
-        X_pred = np.zeros((1, 4, 14))  # 14 features
-        
-        # Fill in historical values and features
-        for i in range(4):
-            X_pred[0, i, 0] = scaled_flows[i]  # Flow
-            X_pred[0, i, 1:6] = scaled_temporal[0]  # Temporal features
-            X_pred[0, i, 6:] = direction_encoded[0]  # Direction
-
-        if model_type.lower() == "saes":
-            # Flatten the input from (1, 4, 14) to (1, 56)
-            X_pred = X_pred.reshape(1, -1)
 
         # Make prediction
-        predicted = model.predict(X_pred, verbose=0)
-        predicted_flow = flow_scaler.inverse_transform(predicted.reshape(-1, 1))[0][0]
+        predicted_flow = select_horizon(predict_horizons(*model_input)[0], horizon)
+        record_predictions(model_type, 1)
 
-        print(f"[{model_type}] Predicted traffic flow for scats {scats_num} at {date_time} in direction {direction}: {predicted_flow:.2f} vehicles per 15 minutes")
+        logger.debug("[%s] Predicted traffic flow for scats %s at %s in direction %s: %.2f vehicles per 15 minutes", model_type, scats_num, date_time, direction, predicted_flow)
         return predicted_flow
 
     except Exception as e:
-        print(f"Error in prediction: {str(e)}")
+        PREDICTION_ERRORS.labels(model_type).inc()
+        logger.error("Error in prediction: %s", e)
+        return None
+
+def predict_new_model_batch(scats_num, date_time, directions, model_type="lstm", horizon=0):
+    # Predict every direction of one site with a single model call
+    flows = predict_horizons_batch(scats_num, date_time, directions, model_type)
+
+    if flows is None:
+        return None
+
+    return [select_horizon(direction_flows, horizon) for direction_flows in flows]
+
+def predict_horizons_batch(scats_num, date_time, directions, model_type="lstm"):
+    # Every forecast horizon for every direction of one site, from a single model call
+    try:
+        model_input = build_model_input(scats_num, date_time, directions, model_type)
+
+        if model_input is None:
+            logger.warning("Not enough historical data for %s at %s", scats_num, date_time)
+            return [[0] for _ in directions]
+
+        predicted_flows = predict_horizons(*model_input)
+        record_predictions(model_type, len(directions))
+
+        logger.debug("[%s] Predicted traffic flow for scats %s at %s in directions %s", model_type, scats_num, date_time, directions)
+        return [list(direction_flows) for direction_flows in predicted_flows]
+
+    except Exception as e:
+        PREDICTION_ERRORS.labels(model_type).inc()
+        logger.error("Error in prediction: %s", e)
+        return None
+
+def predict_horizons_sites(site_queries, model_type="lstm"):
+    # predict_horizons_batch for many (scats_num, date_time, directions) sites, one
+    # model call each; the batcher's version waits on every site at once
+    return [
+        predict_horizons_batch(scats_num, date_time, directions, model_type)
+        for scats_num, date_time, directions in site_queries
+    ]
+
+def predict_site_batch(scats_num, queries, model_type="lstm", horizons=False):
+    # Predict any number of (date_time, direction) queries for one site with a single
+    # model call. Returns flows in query order, 0 where there isn't enough history,
+    # or the list of every forecast horizon per query if horizons is set.
+    try:
+        model_data = all_models[scats_num + "_" + model_type]
+        flows = [[0] if horizons else 0 for _ in queries]
+
+        target_slots = [to_slot(date_time) for date_time, _ in queries]
+        X_pred, has_history = build_inputs(model_data, target_slots, [direction for _, direction in queries], model_type)
+
+        for date_time in sorted({queries[i][0] for i in np.flatnonzero(~has_history)}):
+            logger.warning("Not enough historical data for %s at %s", scats_num, date_time)
+
+        if not has_history.any():
+            return flows
+
+        predicted_flows = predict_horizons(model_data["model"], model_data["flow_scaler"], X_pred[has_history])
+        record_predictions(model_type, int(has_history.sum()))
+
+        for index, row in zip(np.flatnonzero(has_history), predicted_flows):
+            flows[index] = list(row) if horizons else row[0]
+
+        logger.debug("[%s] Predicted %d traffic flows for scats %s in one call", model_type, len(queries), scats_num)
+        return flows
+
+    except Exception as e:
+        PREDICTION_ERRORS.labels(model_type).inc()
+        logger.error("Error in prediction: %s", e)
         return None
 
+def rollout(scats_nums, date_time, steps=96, model_type="lstm"):
+    # Forecast every direction of each site for `steps` 15 minute slots from date_time,
+    # feeding each step's predictions back in as the newest lag. Every step is one
+    # batched call per site model covering all of its directions, and multi-horizon
+    # models advance by all their horizons per call. Returns the slot times and
+    # scats -> direction -> flows; sites without enough history are left out.
+    start = to_slot(date_time)
+    date_times = [format_slot(start + step) for step in range(steps)]
+
+    sites = {}
+    for scats_num in scats_nums:
+        scats_num = str(scats_num)
+        model_data = all_models.get(scats_num + "_" + model_type)
+
+        if model_data is None:
+            logger.warning("Model not found for scats %s and type %s", scats_num, model_type)
+            continue
+
+        directions = list(model_data["flow_csv"]["direction"].unique())
+        model_input = build_model_input(scats_num, date_time, directions, model_type)
+
+        if model_input is None:
+            logger.warning("Not enough historical data for %s at %s", scats_num, date_time)
+            continue
+
+        model, flow_scaler, X_pred = model_input
+
+        sites[scats_num] = {
+            "model": model,
+            "flow_scaler": flow_scaler,
+            "temporal_scaler": model_data["temporal_scaler"],
+            "directions": directions,
+            "X": X_pred.reshape(len(directions), 4, 14),
+            "flows": np.zeros((len(directions), steps)),
+            "step": 0,
+        }
+
+    model_calls = 0
+
+    for step in range(steps):
+        # Sites with multi-horizon models already cover this slot until they catch up
+        due = [site for site in sites.values() if site["step"] == step]
+
+        if not due:
+            continue
+
+        temporal_features = slot_temporal_features([start + step])
+
+        for site in due:
+            X = site["X"]
+            X[:, :, 1:6] = scale(temporal_features, site["temporal_scaler"])[0]
+
+            X_model = X.reshape(len(X), -1) if model_type.lower() == "saes" else X
+            with metrics.STAGE_SECONDS.labels("inference").time():
+                predicted = site["model"].predict(X_model, verbose=0).reshape(len(X), -1)[:, :steps - step]
+
+            model_calls += 1
+            record_predictions(model_type, len(X))
+
+            taken = predicted.shape[1]
+            site["flows"][:, step:step + taken] = site["flow_scaler"].inverse_transform(
+                predicted.reshape(-1, 1)
+            ).reshape(len(X), taken)
+
+            # Shift the predictions in as the most recent lags
+            X[:, :, 0] = np.concatenate([X[:, :, 0], predicted], axis=1)[:, -4:]
+            site["step"] = step + taken
+
+    logger.log(f"[{model_type}] Rolled out {steps} steps for {len(sites)} sites with {model_calls} model calls")
+
+    return {
+        "date_times": date_times,
+        "flows": {
+            scats_num: {
+                direction: list(site["flows"][index])
+                for index, direction in enumerate(site["directions"])
+            }
+            for scats_num, site in sites.items()
+        },
+    }
+
 def predict_individual_model(scats_num, date_time, direction, model_type="lstm"):
     global all_models
 
 
     # load the model into all_models
-    model_path = f"{NEW_MODEL_DIR}/{scats_num}_{model_type}.keras"
+    model_path = f"{NEW_MODEL_DIR}/{model_file_name(scats_num, model_type, VARIANT)}"
     model = load_model(model_path)
 
-    all_models[scats_num + "_" + model_type] = {
-        "model": model,
-        "flow_csv": pd.read_csv(f"{CSV_DIR}/{scats_num}_trafficflow.csv", encoding="utf-8").fillna(0),
-        "scaler": np.load(f"{NEW_MODEL_DIR}/{scats_num}_{model_type}_scalers.npz", allow_pickle=True)
-    }
+    all_models[scats_num + "_" + model_type] = load_model_data(model, scats_num, model_type)
 
     logger.log(f"Model loaded successfully for {scats_num} -> {model_type}")
 
@@ -252,9 +518,11 @@ def cpredict(model_path, data_path):
 def original_predict(model_path, train_csv):
     lags = 4
 
-    model = load_model(model_path)
+    model = load_model(model_path, "keras")
     print("Model loaded successfully!")
 
+    import training.data as data
+
     X_train, y_train, scaler = data.original_process(train_csv, lags)
 
     y_train = scaler.inverse_transform(y_train.reshape(-1, 1)).reshape(1, -1)[0]
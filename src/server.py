@@ -0,0 +1,323 @@
+import sys
+sys.dont_write_bytecode = True
+
+# Project Imports
+import algorithms.graph as graph_maker
+import predict as prediction_module
+import utilities.logger as logger
+import utilities.metrics as metrics
+import utilities.profiling as profiling
+from algorithms.engine import RoutingEngine
+from inference.batcher import PredictionBatcher
+from utilities.time import format_date_universal, round_to_nearest_15_minutes
+
+# Library Imports
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import json
+import os
+import time
+
+# Headless routing service. Run from src/: python server.py --port 8080
+#
+#   GET  /health
+#   GET  /metrics  counters and latency histograms in the Prometheus text format
+#   POST /route    {"start": 2000, "end": 3002, "date_time": "1/10/2006 08:00", "num_paths": 5, "model": "lstm"}
+#   POST /routes   {"queries": [<route body>, ...]}
+#   POST /predict  {"scats": 970, "directions": ["N", "S"], "date_time": "1/10/2006 08:00", "model": "lstm"}
+
+MAX_BODY_SIZE = 1024 * 1024
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUESTS = metrics.counter("tps_http_requests_total", "HTTP requests handled", ["path", "status"])
+REQUEST_SECONDS = metrics.histogram("tps_http_request_seconds", "HTTP request latency", ["path"])
+
+KNOWN_PATHS = {"/health", "/metrics", "/route", "/routes", "/predict"}
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def format_slot(date_time):
+    # Same formatting the GUI applies before routing
+    date, time = str(date_time).split(" ")
+    return f"{format_date_universal(date)} {round_to_nearest_15_minutes(time)}"
+
+
+class RoutingServer:
+    def __init__(self, engine, search_workers=None, profile_dir=None):
+        self.engine = engine
+        self.profile_dir = profile_dir
+
+        # TensorFlow inference is serialised on its own executor, searches run beside it
+        self.inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self.search_executor = ThreadPoolExecutor(max_workers=search_workers or os.cpu_count(), thread_name_prefix="search")
+
+        # (date_time, model) -> task warming the engine's flow cache for that slot, the
+        # engine's most recent slots only, evicted together with their cached flows
+        self.slot_tasks = OrderedDict()
+        # in-flight /predict requests, keyed by (scats, date_time, model, directions)
+        self.predict_tasks = {}
+
+    async def warm_slot(self, date_time, model):
+        # Concurrent requests for the same slot share one batched prediction pass
+        key = (date_time, model)
+        task = self.slot_tasks.get(key)
+
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = asyncio.ensure_future(
+                loop.run_in_executor(self.inference_executor, self.prefetch_flows, date_time, model)
+            )
+            self.slot_tasks[key] = task
+            self.evict_slots()
+
+            # Drop failed warm ups so the next request retries them
+            def forget_failed(done):
+                if done.cancelled() or done.exception() is not None:
+                    self.slot_tasks.pop(key, None)
+
+            task.add_done_callback(forget_failed)
+
+        else:
+            self.slot_tasks.move_to_end(key)
+
+        await task
+
+    def evict_slots(self):
+        # Oldest finished warm ups first; one still running is kept so its flows
+        # don't land in the cache after the slot was dropped
+        for key in list(self.slot_tasks):
+            if len(self.slot_tasks) <= self.engine.max_slots:
+                break
+
+            if self.slot_tasks[key].done():
+                del self.slot_tasks[key]
+                self.engine.evict_slot(*key)
+
+    def check_model(self, model):
+        loaded = {key.split("_")[1] for key in prediction_module.all_models}
+
+        if not isinstance(model, str) or model not in loaded:
+            raise HttpError(400, f"Model {model!r} is not loaded, expected one of {', '.join(sorted(loaded))}")
+
+    def prefetch_flows(self, date_time, model):
+        if self.profile_dir is None:
+            return self.engine.prefetch_flows(date_time, model)
+
+        with profiling.profile(self.profile_dir, profiling.profile_name("prefetch", date_time, model)):
+            return self.engine.prefetch_flows(date_time, model)
+
+    def search(self, start, end, date_time, num_paths, model):
+        if self.profile_dir is None:
+            return self.engine.route(start, end, date_time, num_paths, model)
+
+        with profiling.profile(self.profile_dir, profiling.profile_name("route", start, end, date_time, model)):
+            return self.engine.route(start, end, date_time, num_paths, model)
+
+    async def route(self, body):
+        try:
+            start = str(int(body["start"]))
+            end = int(body["end"])
+            date_time = format_slot(body["date_time"])
+            num_paths = int(body.get("num_paths", 5))
+        except (KeyError, ValueError, TypeError) as e:
+            raise HttpError(400, f"Invalid route query: {e}")
+
+        model = body.get("model", self.engine.model)
+        self.check_model(model)
+
+        await self.warm_slot(date_time, model)
+
+        loop = asyncio.get_running_loop()
+        paths = await loop.run_in_executor(
+            self.search_executor, self.search, start, end, date_time, num_paths, model
+        )
+
+        return {"start": int(start), "end": end, "date_time": date_time, "model": model, "paths": paths or []}
+
+    async def routes(self, body):
+        queries = body.get("queries")
+
+        if not isinstance(queries, list):
+            raise HttpError(400, "Expected a 'queries' list")
+
+        results = await asyncio.gather(*(self.route(query) for query in queries), return_exceptions=True)
+
+        return {"results": [
+            {"error": str(result)} if isinstance(result, Exception) else result for result in results
+        ]}
+
+    async def predict(self, body):
+        try:
+            scats = str(int(body["scats"]))
+            directions = tuple(body.get("directions") or [body["direction"]])
+            date_time = format_slot(body["date_time"])
+        except (KeyError, ValueError, TypeError) as e:
+            raise HttpError(400, f"Invalid prediction query: {e}")
+
+        model = body.get("model", self.engine.model)
+        self.check_model(model)
+
+        key = (scats, date_time, model, directions)
+        task = self.predict_tasks.get(key)
+
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = asyncio.ensure_future(loop.run_in_executor(
+                self.inference_executor,
+                self.engine.predictor.predict_new_model_batch,
+                scats, date_time, list(directions), model,
+            ))
+            self.predict_tasks[key] = task
+            task.add_done_callback(lambda _: self.predict_tasks.pop(key, None))
+
+        flows = await task
+
+        if flows is None:
+            raise HttpError(404, f"No {model} prediction available for scats {scats}")
+
+        return {
+            "scats": int(scats),
+            "date_time": date_time,
+            "model": model,
+            "flows": {direction: float(flow) for direction, flow in zip(directions, flows)},
+        }
+
+    async def dispatch(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return {"status": "ok"}
+
+        if method == "GET" and path == "/metrics":
+            return metrics.render()
+
+        routes = {"/route": self.route, "/routes": self.routes, "/predict": self.predict}
+
+        if method != "POST" or path not in routes:
+            raise HttpError(404, f"No endpoint for {method} {path}")
+
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HttpError(400, f"Invalid JSON: {e}")
+
+        if not isinstance(payload, dict):
+            raise HttpError(400, "Expected a JSON object")
+
+        return await routes[path](payload)
+
+    async def handle(self, reader, writer):
+        status = 200
+        path = None
+        start = time.perf_counter()
+
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+
+            if len(request_line) < 2:
+                raise HttpError(400, "Malformed request line")
+
+            method, path = request_line[0].upper(), request_line[1].split("?")[0]
+
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_SIZE:
+                raise HttpError(413, "Request body too large")
+
+            body = await reader.readexactly(length) if length else b""
+            response = await self.dispatch(method, path, body)
+
+        except HttpError as e:
+            status, response = e.status, {"error": str(e)}
+        except Exception as e:
+            logger.log(f"Error handling request: {e}")
+            status, response = 500, {"error": str(e)}
+
+        # Only /metrics answers with text, everything else is JSON
+        if isinstance(response, str):
+            payload, content_type = response.encode("utf-8"), METRICS_CONTENT_TYPE
+        else:
+            payload, content_type = json.dumps(response, default=float).encode("utf-8"), "application/json"
+
+        # Unknown paths share one label, so a scan can't grow the registry
+        label = path if path in KNOWN_PATHS else "other"
+        REQUESTS.labels(label, str(status)).inc()
+        REQUEST_SECONDS.labels(label).observe(time.perf_counter() - start)
+
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.log(f"Routing service listening on http://{host}:{port}")
+
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", help="Address to bind", default="127.0.0.1")
+    parser.add_argument("--port", help="Port to listen on", type=int, default=8080)
+    parser.add_argument(
+        "--model",
+        help="Model types to load, the first is the default (e.g. lstm gru)",
+        nargs="+",
+        default=["lstm"],
+    )
+    parser.add_argument("--workers", help="Search worker threads", type=int)
+    parser.add_argument(
+        "--profile",
+        help="Profile every slot warm up and route search into this directory (default ./profiles)",
+        nargs="?",
+        const="./profiles",
+    )
+    prediction_module.add_backend_arguments(parser)
+    parser.add_argument(
+        "--metrics_file",
+        help="Also write the /metrics output to this file every 15s, e.g. for node_exporter's textfile collector",
+    )
+
+    args = parser.parse_args()
+    prediction_module.apply_backend_arguments(parser, args)
+
+    if args.metrics_file:
+        metrics.start_file_export(args.metrics_file)
+
+    graph_maker.init()
+    prediction_module.init(args.model)
+
+    # Predictions from concurrent searches are micro-batched per site model
+    engine = RoutingEngine(model=args.model[0], predictor=PredictionBatcher())
+    server = RoutingServer(engine, args.workers, args.profile)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.log("Stopping routing service.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,25 @@ import sys
 
 sys.dont_write_bytecode = True
 
-from training.data import original_process_test
-from train import TEST_CSV_DIRECTION, LAG
-
-from sklearn.metrics import (
-    mean_absolute_error,
-    root_mean_squared_error,
-    mean_absolute_percentage_error,
-)
+from training.data import load_dataset
+from training.config import TEST_CSV_DIRECTION, LAG
+
 import numpy as np
-import tensorflow as tf
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
 
 
 def test():
-    # Load the test data
-    _, X_test, _, y_test, _, _ = original_process_test(TEST_CSV_DIRECTION, LAG)
+    # Imported here so importing this module stays cheap
+    from sklearn.metrics import (
+        mean_absolute_error,
+        root_mean_squared_error,
+        mean_absolute_percentage_error,
+    )
+    import tensorflow as tf
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    # Load the test data, the held-out end of the chronological split
+    _, _, X_test, y_test, _ = load_dataset(TEST_CSV_DIRECTION, LAG, feature_set="original")
 
     # Load the trained models
     models = {
@@ -0,0 +1,44 @@
+import os
+import sys
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Project Imports
+import algorithms.graph as graph_maker
+import algorithms.csr as csr
+
+# Library Imports
+import pytest
+
+# Run from src/: python -m pytest tests
+
+# A toy network, in the same form as graph_maker.generate_graph(). Site 5 is only
+# ever a target and site 6 can't be reached from the others.
+TOY_GRAPH = {
+    1: ["2_N", "3_E", "2.0_N"],
+    2: ["3_S", "4_N"],
+    3: ["4_E", "2_W"],
+    4: ["5_W"],
+    6: ["1_S"],
+}
+
+# 0.01 of a degree is 1km, so edges are a few km and searches span several slots
+TOY_COORDS = {
+    1: (-37.80, 145.00),
+    2: (-37.77, 145.01),
+    3: (-37.80, 145.04),
+    4: (-37.74, 145.05),
+    5: (-37.74, 145.09),
+    6: (-37.85, 145.00),
+}
+
+
+@pytest.fixture
+def toy_dict():
+    return TOY_GRAPH
+
+
+@pytest.fixture
+def toy_graph(monkeypatch):
+    monkeypatch.setattr(graph_maker, "get_coords_by_scat", lambda scat: TOY_COORDS[int(scat)])
+    return csr.compile_graph(TOY_GRAPH)
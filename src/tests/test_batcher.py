@@ -0,0 +1,114 @@
+# Project Imports
+from inference.batcher import PREDICTION_ERRORS, PredictionBatcher
+
+# Library Imports
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pytest
+
+
+class RecordingPredictor:
+    # Flows encode the query, so every waiter can check it got its own answer
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def predict_site_batch(self, scats_num, queries, model_type="lstm", horizons=False):
+        with self.lock:
+            self.calls.append((scats_num, model_type, list(queries)))
+
+        return [[float(scats_num), float(date_time[-2:]), len(direction)] for date_time, direction in queries]
+
+
+def test_duplicate_requests_share_one_prediction():
+    predictor = RecordingPredictor()
+    batcher = PredictionBatcher(predictor, window=0.05)
+
+    try:
+        futures = [batcher.submit("4034", "1/10/2006 08:15", "N") for _ in range(5)]
+        futures.append(batcher.submit("4034", "1/10/2006 08:15", "NE"))
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.close()
+
+    assert results[:5] == [[4034.0, 15.0, 1]] * 5
+    assert results[5] == [4034.0, 15.0, 2]
+    assert batcher.stats["requests"] == 6
+    assert batcher.stats["deduplicated"] == 4
+    assert predictor.calls == [("4034", "lstm", [("1/10/2006 08:15", "N"), ("1/10/2006 08:15", "NE")])]
+
+
+def test_one_model_call_per_site_and_model():
+    predictor = RecordingPredictor()
+    batcher = PredictionBatcher(predictor, window=0.05)
+
+    try:
+        results = batcher.predict_horizons_sites([
+            ("4034", "1/10/2006 08:00", ["N", "S"]),
+            ("4034", "1/10/2006 08:15", ["N"]),
+            ("4035", "1/10/2006 08:00", ["SW"]),
+        ])
+        gru = batcher.predict_horizons_batch("4034", "1/10/2006 08:00", ["N"], "gru")
+    finally:
+        batcher.close()
+
+    assert results == [
+        [[4034.0, 0.0, 1], [4034.0, 0.0, 1]],
+        [[4034.0, 15.0, 1]],
+        [[4035.0, 0.0, 2]],
+    ]
+    assert gru == [[4034.0, 0.0, 1]]
+    assert sorted((scats, model, len(queries)) for scats, model, queries in predictor.calls) == [
+        ("4034", "gru", 1), ("4034", "lstm", 3), ("4035", "lstm", 1)
+    ]
+
+
+def test_concurrent_callers_get_their_own_horizon():
+    predictor = RecordingPredictor()
+    batcher = PredictionBatcher(predictor, window=0.01)
+    queries = [(str(4030 + index % 7), f"1/10/2006 08:{15 * (index % 4):02d}", "N") for index in range(300)]
+
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            flows = list(executor.map(lambda query: batcher.predict_new_model(*query, horizon=1), queries))
+    finally:
+        batcher.close()
+
+    assert flows == [float(date_time[-2:]) for _, date_time, _ in queries]
+    assert batcher.stats["batches"] < len(queries)
+    # Duplicates are merged within a batch, so no model call repeats a query
+    assert all(len(set(call[2])) == len(call[2]) for call in predictor.calls)
+
+
+def test_closed_batcher_rejects_requests():
+    batcher = PredictionBatcher(RecordingPredictor())
+    batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher.submit("4034", "1/10/2006 08:00", "N")
+
+
+class FailingPredictor:
+    # Raises for one site, so the rest of the batch still has to be answered
+    def predict_site_batch(self, scats_num, queries, model_type="lstm", horizons=False):
+        if scats_num == "4034":
+            raise RuntimeError("broken model")
+
+        return [[100.0, 110.0] for _ in queries]
+
+
+def test_failed_site_resolves_to_none_and_is_counted():
+    batcher = PredictionBatcher(FailingPredictor(), window=0.01)
+    errors = PREDICTION_ERRORS.labels("lstm").value
+
+    try:
+        results = batcher.predict_horizons_sites([
+            ("4034", "1/10/2006 08:00", ["N", "S"]),
+            ("4035", "1/10/2006 08:00", ["E"]),
+        ])
+    finally:
+        batcher.close()
+
+    assert results == [None, [[100.0, 110.0]]]
+    assert batcher.stats["errors"] == 1
+    assert PREDICTION_ERRORS.labels("lstm").value == errors + 1
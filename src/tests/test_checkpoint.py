@@ -0,0 +1,85 @@
+# Project Imports
+import train
+
+# Library Imports
+import json
+import numpy as np
+import keras
+
+CONFIG = {"batch": 16, "epochs": 6, "patience": 3, "checkpoint_every": 1, "resume": True}
+
+
+def tiny_model():
+    model = keras.Sequential([keras.Input((4,)), keras.layers.Dense(1)])
+    model.compile(loss="mse", optimizer="rmsprop")
+    return model
+
+
+def begin(callbacks, model):
+    # What model.fit does before the first epoch, in callback order
+    for callback in callbacks:
+        callback.set_model(model)
+        callback.on_train_begin()
+
+
+def test_checkpoint_saves_and_restores_callback_state(tmp_path):
+    checkpoint_path, state_path = str(tmp_path / "m_checkpoint.keras"), str(tmp_path / "m_checkpoint.json")
+    trainer = train.ModelTrainer()
+    model = tiny_model()
+
+    early_stopping, reduce_lr, checkpoint = trainer.get_callbacks(CONFIG, checkpoint_path, state_path)
+    begin([early_stopping, reduce_lr, checkpoint], model)
+
+    early_stopping.wait, early_stopping.best, early_stopping.best_epoch = 2, np.float32(0.25), 3
+    early_stopping.best_weights = [np.full((4, 1), 0.5), np.ones(1)]
+    reduce_lr.wait, reduce_lr.best, reduce_lr.cooldown_counter = 1, np.float64(0.3), 0
+    checkpoint.on_epoch_end(4, {"val_loss": 0.4})
+
+    with open(state_path) as f:
+        state = json.load(f)
+
+    assert state["epoch"] == 5
+    assert state["callbacks"] == {
+        "early_stopping": {"wait": 2, "best": 0.25, "best_epoch": 3},
+        "reduce_lr": {"wait": 1, "best": 0.3, "cooldown_counter": 0},
+    }
+
+    # The other callbacks reset in on_train_begin, the checkpoint runs last
+    callbacks = trainer.get_callbacks(CONFIG, checkpoint_path, state_path, state)
+    begin(callbacks, keras.models.load_model(checkpoint_path))
+    early_stopping, reduce_lr, _ = callbacks
+
+    assert (early_stopping.wait, early_stopping.best, early_stopping.best_epoch) == (2, 0.25, 3)
+    assert (reduce_lr.wait, reduce_lr.best, reduce_lr.cooldown_counter) == (1, 0.3, 0)
+    assert np.array_equal(early_stopping.best_weights[0], np.full((4, 1), 0.5))
+
+
+def test_resumed_fit_keeps_patience(tmp_path):
+    checkpoint_path, state_path = str(tmp_path / "m_checkpoint.keras"), str(tmp_path / "m_checkpoint.json")
+    model = tiny_model()
+    model.save(checkpoint_path)
+
+    # One epoch of patience left, and a best val_loss no epoch can beat
+    state = {
+        "epoch": 2,
+        "val_loss": 1.0,
+        "callbacks": {
+            "early_stopping": {"wait": CONFIG["patience"] - 1, "best": 0.0, "best_epoch": 1},
+            "reduce_lr": {"wait": 0, "best": 0.0, "cooldown_counter": 0},
+        },
+    }
+
+    X = np.random.default_rng(0).normal(size=(64, 4)).astype("float32")
+    y = X.sum(axis=1, keepdims=True) + 1
+    history = model.fit(
+        X, y,
+        batch_size=CONFIG["batch"],
+        epochs=CONFIG["epochs"],
+        initial_epoch=state["epoch"],
+        validation_split=0.25,
+        verbose=0,
+        callbacks=train.ModelTrainer().get_callbacks(CONFIG, checkpoint_path, state_path, state),
+    )
+
+    # Without the restored counters early stopping would wait another 3 epochs
+    assert len(history.history["loss"]) == 1
@@ -0,0 +1,65 @@
+# Project Imports
+import algorithms.csr as csr
+
+
+def dict_edges(graph):
+    # (scat, direction) targets of each site in the dict graph, duplicates dropped
+    edges = {}
+    for scat, entries in graph.items():
+        edges[scat] = []
+        for entry in entries:
+            target_scat, _, direction = entry.partition("_")
+            target = (int(float(target_scat)), direction)
+
+            if target not in edges[scat]:
+                edges[scat].append(target)
+
+    return edges
+
+
+def test_offsets(toy_graph):
+    assert list(toy_graph.scats) == [1, 2, 3, 4, 5, 6]
+    assert len(toy_graph.offsets) == len(toy_graph.scats) + 1
+    assert toy_graph.offsets[0] == 0
+    assert toy_graph.offsets[-1] == len(toy_graph.targets)
+    assert all(a <= b for a, b in zip(toy_graph.offsets, toy_graph.offsets[1:]))
+
+
+def test_edges_match_dict_graph(toy_dict, toy_graph):
+    expected = dict_edges(toy_dict)
+
+    for scat_id, scat in enumerate(toy_graph.scats):
+        edges = [
+            (toy_graph.scats[toy_graph.node_scat[node]], toy_graph.direction_name(node))
+            for node in toy_graph.neighbours(scat_id)
+        ]
+        assert edges == expected.get(scat, [])
+
+        # Directed nodes of a site share its edges
+        for node in range(len(toy_graph)):
+            if toy_graph.node_scat[node] == scat_id:
+                assert list(toy_graph.neighbours(node)) == list(toy_graph.neighbours(scat_id))
+
+
+def test_node_ids(toy_graph):
+    for scat_id, scat in enumerate(toy_graph.scats):
+        assert toy_graph.scat_id(scat) == scat_id
+        assert toy_graph.node_id(str(scat)) == scat_id
+        assert toy_graph.direction_name(scat_id) is None
+
+    node = toy_graph.node_id("2_N")
+    assert node >= len(toy_graph.scats)
+    assert toy_graph.node_name(node) == "2_N"
+    assert toy_graph.node_id("2_SE") is None
+    assert toy_graph.node_id("9999") is None
+
+
+def test_distance(toy_graph):
+    one, three = toy_graph.scat_id(1), toy_graph.scat_id(3)
+    assert abs(toy_graph.distance(one, three) - 4.0) < 1e-9
+    assert toy_graph.distance(one, one) == 0
+
+
+def test_node_arrays(toy_graph):
+    assert isinstance(toy_graph, csr.CSRGraph)
+    assert len(toy_graph) == len(toy_graph.node_scat) == len(toy_graph.node_direction)
@@ -0,0 +1,109 @@
+# Project Imports
+from training.data import chronological_split, dataset_cache_path, load_dataset
+from utilities.time import format_slot, to_slot
+
+# Library Imports
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+LAGS = 4
+HORIZONS = 2
+SLOTS = 40
+
+
+def site_frame(directions=("N", "S"), slots=SLOTS):
+    # Flow is the slot position, plus 100 per direction, so a window shows where it came from
+    start = to_slot("1/10/2006 00:00")
+    rows = [
+        {"15 Minutes": format_slot(start + index), "Lane 1 Flow (Veh/15 Minutes)": 100 * number + index, "direction": direction}
+        for number, direction in enumerate(directions)
+        for index in range(slots)
+    ]
+
+    # Shuffled, with an index that isn't 0..n-1, so windows can't rely on row labels
+    df = pd.DataFrame(rows).sample(frac=1, random_state=0)
+    df.index = df.index * 3 + 1000
+    return df
+
+
+def raw_flows(scalers, scaled):
+    return np.rint(scalers[0].inverse_transform(scaled.reshape(-1, 1)).reshape(scaled.shape)).astype(int)
+
+
+def test_windows_stay_within_one_direction():
+    X_train, y_train, X_test, y_test, scalers = chronological_split(site_frame(), LAGS, HORIZONS)
+
+    for X, y in ((X_train, y_train), (X_test, y_test)):
+        flows = np.concatenate([raw_flows(scalers, X[:, :, 0]), raw_flows(scalers, y)], axis=1)
+
+        # Consecutive slots of one direction, and its one-hot encoding on every step
+        assert (np.diff(flows, axis=1) == 1).all()
+        assert (X[:, :, 6:] == X[:, :1, 6:]).all()
+
+
+def test_split_at_the_cutoff():
+    X_train, y_train, X_test, y_test, scalers = chronological_split(site_frame(), LAGS, HORIZONS, test_size=0.2)
+    cutoff = int(SLOTS * 0.8)
+
+    train_targets = raw_flows(scalers, y_train) % 100
+    test_targets = raw_flows(scalers, y_test) % 100
+
+    # Windows whose targets straddle the cutoff are dropped
+    assert train_targets.max() < cutoff
+    assert test_targets.min() >= cutoff
+    assert len(X_train) == 2 * (cutoff - LAGS - HORIZONS + 1)
+    assert len(X_test) == 2 * (SLOTS - cutoff - HORIZONS + 1)
+
+    # Directions are interleaved in time order, and the flow scaler only saw training rows
+    assert (np.diff(train_targets[:, 0]) >= 0).all()
+    assert scalers[0].data_max_[0] == 100 + cutoff - 1
+
+
+def test_short_directions_are_skipped():
+    df = pd.concat([site_frame(("N",)), site_frame(("S",), slots=LAGS)])
+    X_train, _, X_test, _, _ = chronological_split(df, LAGS, HORIZONS)
+
+    assert len(X_train) + len(X_test) > 0
+    assert (X_train[:, :, 6] == 1).all() and (X_test[:, :, 6] == 1).all()
+
+
+@pytest.mark.parametrize("test_size", [0, 1, -0.2, 1.5])
+def test_test_size_is_validated(test_size):
+    with pytest.raises(ValueError):
+        chronological_split(site_frame(), LAGS, HORIZONS, test_size=test_size)
+
+
+def test_load_dataset_cache(tmp_path):
+    csv_path = str(tmp_path / "970_trafficflow.csv")
+    cache_dir = str(tmp_path / "cache")
+    site_frame().to_csv(csv_path, index=False)
+
+    first = load_dataset(csv_path, LAGS, HORIZONS, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    second = load_dataset(csv_path, LAGS, HORIZONS, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    for array, cached in zip(first[:4], second[:4]):
+        assert np.array_equal(array, cached)
+    assert second[4][0].data_max_ == first[4][0].data_max_
+
+
+def test_cache_key_covers_settings_and_contents(tmp_path):
+    csv_path = str(tmp_path / "970_trafficflow.csv")
+    site_frame().to_csv(csv_path, index=False)
+
+    def path(**changes):
+        settings = {"lags": LAGS, "horizons": HORIZONS, "test_size": 0.2, "feature_set": "temporal"}
+        settings.update(changes)
+        return dataset_cache_path(csv_path, cache_dir="cache", **settings)
+
+    base = path()
+    variants = [path(lags=8), path(horizons=1), path(test_size=0.1), path(feature_set="original")]
+    assert len({base, *variants}) == 5
+    assert os.path.basename(base).startswith("970_trafficflow_")
+
+    site_frame(slots=SLOTS + 1).to_csv(csv_path, index=False)
+    assert path() != base
@@ -0,0 +1,79 @@
+# Project Imports
+import algorithms.dijkstra as dijkstra
+import algorithms.graph as graph_maker
+from utilities.time import SLOT_MINUTES
+
+
+class StubFlowTable:
+    # Flows rise with the slot, so leaving later never arrives earlier. Site 4's
+    # north node has no prediction, so that edge can't be used.
+    def __init__(self, graph):
+        self.graph = graph
+        self.slots = set()
+
+    def get(self, node, slot=0):
+        self.slots.add(slot)
+
+        if self.graph.node_name(node) == "4_N":
+            return None
+
+        return 200 + 40 * node + 30 * slot
+
+
+def brute_force(graph, source, flow_table):
+    # Relax every edge until nothing changes, costed the same way as _dijkstra
+    source = graph.scat_id(source)
+    times = {source: 0}
+    distances = {source: 0}
+    changed = True
+
+    while changed:
+        changed = False
+
+        for current, current_time in list(times.items()):
+            slot = int(current_time * 60 // SLOT_MINUTES)
+            delay = dijkstra.INTERSECTION_DELAY if current != source else 0
+
+            for neighbor in graph.neighbours(current):
+                flow = flow_table.get(neighbor, slot)
+                neighbor_scat = graph.node_scat[neighbor]
+
+                if flow is None or neighbor_scat == source:
+                    continue
+
+                distance = graph.distance(current, neighbor_scat)
+                arrival = current_time + delay + distance / graph_maker.calculate_speed(current, flow)
+
+                if arrival < times.get(neighbor_scat, float("inf")):
+                    times[neighbor_scat] = arrival
+                    distances[neighbor_scat] = distances[current] + distance
+                    changed = True
+
+    return {
+        graph.scats[scat]: {'time': round(times[scat] * 60, 2), 'distance': round(distances[scat], 2)}
+        for scat in times
+    }
+
+
+def test_travel_times_match_brute_force(toy_graph):
+    for source in (1, 2, 3, 6):
+        flow_table = StubFlowTable(toy_graph)
+        result = dijkstra.travel_times(toy_graph, source, "1/8/2006 08:00", flow_table=flow_table)
+
+        assert result == brute_force(toy_graph, source, StubFlowTable(toy_graph))
+
+
+def test_travel_times_use_later_slots(toy_graph):
+    flow_table = StubFlowTable(toy_graph)
+    result = dijkstra.travel_times(toy_graph, 6, "1/8/2006 08:00", flow_table=flow_table)
+
+    assert set(result) == {1, 2, 3, 4, 5, 6}
+    assert result[6] == {'time': 0, 'distance': 0}
+    assert max(flow_table.slots) > 0
+
+
+def test_travel_times_unreachable(toy_graph):
+    result = dijkstra.travel_times(toy_graph, 5, "1/8/2006 08:00", flow_table=StubFlowTable(toy_graph))
+    assert result == {5: {'time': 0, 'distance': 0}}
+
+    assert dijkstra.travel_times(toy_graph, 9999, "1/8/2006 08:00", flow_table=StubFlowTable(toy_graph)) == {}
@@ -0,0 +1,122 @@
+# Project Imports
+from algorithms.engine import RoutingEngine
+
+
+class StubPredictor:
+    # Two horizons per direction, counting the sites and directions asked for
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    def predict_horizons_batch(self, scats_num, date_time, directions, model_type="lstm"):
+        self.calls.append((scats_num, date_time, tuple(directions)))
+
+        if scats_num in self.fail:
+            return None
+
+        return [[300.0 + 10 * index, 320.0] for index, _ in enumerate(directions)]
+
+    def predict_horizons_sites(self, site_queries, model_type="lstm"):
+        return [
+            self.predict_horizons_batch(scats_num, date_time, directions, model_type)
+            for scats_num, date_time, directions in site_queries
+        ]
+
+
+def test_travel_times_reuse_the_slot_cache(toy_graph):
+    predictor = StubPredictor()
+    engine = RoutingEngine(toy_graph, predictor=predictor)
+
+    first = engine.travel_times(1, "1/10/2006 08:00")
+    calls = len(predictor.calls)
+    assert calls > 0
+
+    assert engine.travel_times(1, "1/10/2006 08:00") == first
+    assert len(predictor.calls) == calls
+
+
+def test_matrix_reuses_prefetched_flows(toy_graph):
+    predictor = StubPredictor()
+    engine = RoutingEngine(toy_graph, predictor=predictor)
+
+    engine.prefetch_flows("1/10/2006 08:00")
+    calls = len(predictor.calls)
+
+    matrix = engine.travel_time_matrix([1, 6], [4, 5], "1/10/2006 08:00")
+    assert matrix["time"][0][0] is not None
+    assert all(date_time != "1/10/2006 08:00" for _, date_time, _ in predictor.calls[calls:])
+
+
+def test_slot_cache_evicts_least_recently_used(toy_graph):
+    predictor = StubPredictor()
+    engine = RoutingEngine(toy_graph, predictor=predictor, max_slots=2)
+    node = toy_graph.node_id("2_N")
+
+    engine.flow(toy_graph, node, "1/10/2006 08:00", "lstm")
+    engine.flow(toy_graph, node, "1/10/2006 08:15", "lstm")
+    engine.flow(toy_graph, node, "1/10/2006 08:00", "lstm")  # hit, now most recent
+    engine.flow(toy_graph, node, "1/10/2006 08:30", "lstm")
+
+    assert list(engine._flow_cache) == [("1/10/2006 08:00", "lstm"), ("1/10/2006 08:30", "lstm")]
+    assert len(predictor.calls) == 3
+
+    engine.flow(toy_graph, node, "1/10/2006 08:15", "lstm")
+    assert len(predictor.calls) == 4
+    assert list(engine._flow_cache) == [("1/10/2006 08:30", "lstm"), ("1/10/2006 08:15", "lstm")]
+
+
+def test_slots_are_kept_per_model(toy_graph):
+    predictor = StubPredictor()
+    engine = RoutingEngine(toy_graph, predictor=predictor)
+    node = toy_graph.node_id("2_N")
+
+    assert engine.flow(toy_graph, node, "1/10/2006 08:00", "lstm", horizon=1) == 320.0
+    engine.flow(toy_graph, node, "1/10/2006 08:00", "gru")
+    assert len(predictor.calls) == 2
+
+    engine.evict_slot("1/10/2006 08:00", "gru")
+    assert list(engine._flow_cache) == [("1/10/2006 08:00", "lstm")]
+
+
+def test_failed_predictions_are_not_cached(toy_graph):
+    predictor = StubPredictor(fail={"2"})
+    engine = RoutingEngine(toy_graph, predictor=predictor)
+    node = toy_graph.node_id("2_N")
+
+    assert engine.flow(toy_graph, node, "1/10/2006 08:00", "lstm") is None
+    assert engine.flow(toy_graph, node, "1/10/2006 08:00", "lstm") is None
+    assert len(predictor.calls) == 2
+
+    predictor.fail.clear()
+    assert engine.flow(toy_graph, node, "1/10/2006 08:00", "lstm") == 300.0
+    assert engine.flow(toy_graph, node, "1/10/2006 08:00", "lstm") == 300.0
+    assert len(predictor.calls) == 3
+
+
+def test_failed_sites_are_not_stored_from_flow_tables(toy_graph):
+    predictor = StubPredictor(fail={"4"})
+    engine = RoutingEngine(toy_graph, predictor=predictor)
+
+    engine.prefetch_flows("1/10/2006 08:00")
+    cached = engine._flow_cache[("1/10/2006 08:00", "lstm")]
+
+    assert toy_graph.node_id("2_N") in cached
+    assert toy_graph.node_id("4_N") not in cached
+
+
+def test_concurrent_lookups_share_the_cache(toy_graph):
+    from concurrent.futures import ThreadPoolExecutor
+
+    predictor = StubPredictor()
+    engine = RoutingEngine(toy_graph, predictor=predictor, max_slots=3)
+    queries = [
+        (node, f"1/10/2006 0{8 + index % 2}:{15 * (index % 4):02d}")
+        for index in range(200)
+        for node in range(len(toy_graph.scats), len(toy_graph))
+    ]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        flows = list(executor.map(lambda query: engine.flow(toy_graph, query[0], query[1], "lstm"), queries))
+
+    assert all(flow is not None for flow in flows)
+    assert len(engine._flow_cache) <= 3
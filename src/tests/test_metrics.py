@@ -0,0 +1,33 @@
+# Project Imports
+import utilities.metrics as metrics
+
+
+def samples(metric):
+    return dict(line.rsplit(" ", 1) for line in metric.samples())
+
+
+def test_large_counter_keeps_every_digit():
+    counter = metrics.Counter("test_large_total", "Large counter", ["site"])
+    counter.labels("4034").inc(1234567)
+    counter.labels("4034").inc()
+
+    assert samples(counter) == {'test_large_total{site="4034"}': "1234568.0"}
+
+
+def test_histogram_sum_keeps_every_digit():
+    histogram = metrics.Histogram("test_sum_seconds", "Histogram sum", buckets=(1, 10))
+    histogram.observe(1234.5678)
+    histogram.observe(0.5)
+
+    rendered = samples(histogram)
+    assert rendered["test_sum_seconds_sum"] == "1235.0678"
+    assert rendered["test_sum_seconds_count"] == "2"
+    assert rendered['test_sum_seconds_bucket{le="1"}'] == "1"
+    assert rendered['test_sum_seconds_bucket{le="+Inf"}'] == "2"
+
+
+def test_format_value():
+    assert metrics.format_value(0) == "0.0"
+    assert metrics.format_value(12345678901) == "12345678901.0"
+    assert metrics.format_value(float("inf")) == "+Inf"
+    assert metrics.format_value(float("nan")) == "NaN"
@@ -0,0 +1,50 @@
+# Project Imports
+from utilities.time import SLOTS_PER_DAY, format_slot, parse_slots, slot_temporal_features, to_slot
+
+# Library Imports
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+DATE_TIMES = ["1/1/1970 00:00", "1/1/1970 00:15", "1/10/2006 08:00", "29/2/2024 23:45", "31/12/2025 12:30"]
+
+
+def test_parse_slots_round_trip():
+    slots = parse_slots(DATE_TIMES)
+
+    assert list(slots[:2]) == [0, 1]
+    assert [format_slot(slot) for slot in slots] == DATE_TIMES
+    assert list(slots) == [to_slot(date_time) for date_time in DATE_TIMES]
+    assert list(parse_slots([format_slot(slot) for slot in slots])) == list(slots)
+
+
+def test_parse_slots_floors_non_aligned_times():
+    slots = parse_slots(["1/10/2006 08:07", "1/10/2006 08:14", "31/12/2025 23:59", "1/1/1970 00:01"])
+
+    assert [format_slot(slot) for slot in slots] == [
+        "1/10/2006 08:00", "1/10/2006 08:00", "31/12/2025 23:45", "1/1/1970 00:00"
+    ]
+    assert to_slot("1/10/2006 08:14") == to_slot(datetime(2006, 10, 1, 8, 0))
+
+
+def test_parse_slots_timestamps():
+    timestamps = pd.to_datetime(["2006-10-01 08:07", "2024-02-29 23:45"])
+    assert list(parse_slots(timestamps)) == list(parse_slots(["1/10/2006 08:00", "29/2/2024 23:45"]))
+
+
+def test_slot_temporal_features():
+    date_times = DATE_TIMES + ["1/10/2006 08:07", "31/12/2025 23:59"]
+    features = slot_temporal_features(parse_slots(date_times))
+
+    for date_time, row in zip(date_times, features):
+        parsed = datetime.strptime(date_time, "%d/%m/%Y %H:%M")
+        minute = parsed.minute - parsed.minute % 15
+        assert list(row) == [parsed.hour, minute, parsed.weekday(), parsed.day, parsed.month]
+
+
+def test_slot_temporal_features_wrap_at_midnight():
+    start = to_slot("31/12/2025 00:00")
+    features = slot_temporal_features(np.arange(start, start + SLOTS_PER_DAY + 1))
+
+    assert list(features[-2]) == [23, 45, 2, 31, 12]
+    assert list(features[-1]) == [0, 0, 3, 1, 1]
@@ -2,59 +2,190 @@ import sys
 sys.dont_write_bytecode = True
 
 import os
+import json
 import warnings
 import argparse
 import numpy as np
 import pandas as pd
-from keras.models import Model
-from keras.callbacks import EarlyStopping
+from keras.models import Model, load_model
+from keras.callbacks import Callback, EarlyStopping, ReduceLROnPlateau
 from pathlib import Path
-from training.model import get_lstm, get_gru, get_saes, get_cnn
-from training.data import process_temporal_data
+from training.model import MODEL_BUILDERS, get_model as build_model
+from training.data import load_dataset
+from training.config import (
+    EPOCHS,
+    BATCH_SIZE,
+    LAG,
+    PATIENCE,
+    LR_FACTOR,
+    MIN_LR,
+    CHECKPOINT_EVERY,
+    SCATS_CSV_DIR,
+    TEST_CSV,
+    SCATS_CSV_DIR_DIRECTION,
+    TEST_CSV_DIRECTION,
+    MODEL_DIR,
+)
 
 warnings.filterwarnings("ignore")
 
-# Hyperparameters
-EPOCHS = 600
-BATCH_SIZE = 256
-LAG = 4
-SCATS_CSV_DIR = "../training_data/traffic_flows"
-TEST_CSV = f"{SCATS_CSV_DIR}/970_N_trafficflow.csv"
-SCATS_CSV_DIR_DIRECTION = "../training_data/new_traffic_flows"
-TEST_CSV_DIRECTION = f"{SCATS_CSV_DIR_DIRECTION}/970_trafficflow.csv"
-
-MODEL_DIR = "./saved_test_models/"
+# Future 15 minute slots each model forecasts per forward pass
+HORIZONS = 1
 
 # Models with input shape reflecting 14 features
-# (1 for flow + 5 for temporal + 8 for direction)
-MODELS = {
-    "lstm": get_lstm([LAG, 64, 64, 1]),
-    "gru": get_gru([LAG, 64, 64, 1]),
-    "saes": get_saes([LAG, 128, 64, 32, 1]),
-    "cnn": get_cnn([LAG, 128, 1]),
-}
+# (1 for flow + 5 for temporal + 8 for direction), built the first time a type is
+# trained rather than on import
+MODELS = {}
+
+def get_model(model_type):
+    if model_type not in MODEL_BUILDERS:
+        return None
+
+    if model_type not in MODELS:
+        MODELS[model_type] = build_model(model_type, LAG, HORIZONS)
+
+    return MODELS[model_type]
+
+# Counters of the early stopping and learning rate callbacks kept across a resume
+CALLBACK_STATE = {"early_stopping": ("wait", "best", "best_epoch"), "reduce_lr": ("wait", "best", "cooldown_counter")}
+
+class TrainingCheckpoint(Callback):
+    # Saves the model (with its optimizer state) every few epochs, and the last
+    # finished epoch next to it, so an interrupted run can be resumed. The patience
+    # counters and best val_loss of the other callbacks are saved with it (and the
+    # early stopping best weights beside it), so a resumed run stops where the
+    # uninterrupted one would have.
+    def __init__(self, checkpoint_path, state_path, every, callbacks, resume_state=None):
+        super().__init__()
+        self.checkpoint_path = checkpoint_path
+        self.state_path = state_path
+        self.best_weights_path = get_best_weights_path(checkpoint_path)
+        self.every = every
+        self.callbacks = callbacks  # name -> callback, see CALLBACK_STATE
+        self.resume_state = resume_state
+
+    def on_train_begin(self, logs=None):
+        # Runs after the other callbacks reset themselves in their own on_train_begin
+        if not self.resume_state:
+            return
+
+        for name, callback in self.callbacks.items():
+            for attribute, value in self.resume_state.get("callbacks", {}).get(name, {}).items():
+                setattr(callback, attribute, value)
+
+        early_stopping = self.callbacks["early_stopping"]
+        if early_stopping.restore_best_weights and os.path.exists(self.best_weights_path):
+            saved = np.load(self.best_weights_path)
+            early_stopping.best_weights = [saved[f"arr_{index}"] for index in range(len(saved.files))]
+
+    def on_epoch_end(self, epoch, logs=None):
+        if (epoch + 1) % self.every != 0:
+            return
+
+        self.model.save(self.checkpoint_path)
+
+        best_weights = self.callbacks["early_stopping"].best_weights
+        if best_weights is not None:
+            np.savez(self.best_weights_path, *best_weights)
+
+        callback_state = {
+            name: {
+                attribute: json_number(getattr(callback, attribute))
+                for attribute in CALLBACK_STATE[name]
+            }
+            for name, callback in self.callbacks.items()
+        }
+
+        with open(self.state_path, "w") as f:
+            json.dump({"epoch": epoch + 1, "val_loss": (logs or {}).get("val_loss"), "callbacks": callback_state}, f)
+
+def json_number(value):
+    # Callback counters are ints, their best values numpy floats or None
+    return value if value is None or isinstance(value, int) else float(value)
+
+def get_best_weights_path(checkpoint_path):
+    return checkpoint_path.replace(".keras", "_best.npz")
 
 class ModelTrainer:
-    def __init__(self):
+    def __init__(self, epochs=EPOCHS, patience=PATIENCE, checkpoint_every=CHECKPOINT_EVERY, resume=False):
         self.flow_scaler = None
         self.temporal_scaler = None
         self.direction_encoder = None
+
+        self.epochs = epochs
+        self.patience = patience
+        self.checkpoint_every = checkpoint_every
+        self.resume = resume
+
+    def get_config(self):
+        return {
+            "batch": BATCH_SIZE,
+            "epochs": self.epochs,
+            "patience": self.patience,
+            "checkpoint_every": self.checkpoint_every,
+            "resume": self.resume,
+        }
     
-    def get_early_stopping_callback(self):
+    def get_early_stopping_callback(self, config):
         return EarlyStopping(
-            monitor="loss",
-            patience=50,
+            monitor="val_loss",
+            patience=config["patience"],
             verbose=1,
             mode="min",
             restore_best_weights=True,
         )
 
-    def train_model(self, model, X_train, y_train, name, config, print_loss):
-        model.compile(loss="mse", optimizer="rmsprop", metrics=["mape"])
+    def get_callbacks(self, config, checkpoint_path=None, state_path=None, resume_state=None):
+        early_stopping = self.get_early_stopping_callback(config)
+        reduce_lr = ReduceLROnPlateau(
+            monitor="val_loss",
+            factor=LR_FACTOR,
+            patience=max(1, config["patience"] // 3),
+            min_lr=MIN_LR,
+            verbose=1,
+        )
+        callbacks = [early_stopping, reduce_lr]
+
+        # Last, so its on_train_begin restores state after the others reset
+        if checkpoint_path is not None:
+            callbacks.append(TrainingCheckpoint(
+                checkpoint_path,
+                state_path,
+                config["checkpoint_every"],
+                {"early_stopping": early_stopping, "reduce_lr": reduce_lr},
+                resume_state,
+            ))
 
+        return callbacks
+
+    def get_checkpoint_paths(self, name):
+        return MODEL_DIR + name + "_checkpoint.keras", MODEL_DIR + name + "_checkpoint.json"
+
+    def has_checkpoint(self, name, config):
+        return config["resume"] and all(os.path.exists(path) for path in self.get_checkpoint_paths(name))
+
+    def train_model(self, model, X_train, y_train, name, config, print_loss):
         model_path = MODEL_DIR + str(name) + ".keras"
         model_loss_path = MODEL_DIR + name + "_loss.csv"
         scaler_path = MODEL_DIR + name + "_scalers.npz"
+        checkpoint_path, state_path = self.get_checkpoint_paths(name)
+
+        os.makedirs(MODEL_DIR, exist_ok=True)
+
+        initial_epoch = 0
+        resume_state = None
+
+        # Pick up an interrupted run from its last checkpoint
+        if self.has_checkpoint(name, config):
+            model = load_model(checkpoint_path)
+
+            with open(state_path) as f:
+                resume_state = json.load(f)
+            initial_epoch = resume_state["epoch"]
+
+            print(f"Resuming {name} from checkpoint at epoch {initial_epoch}")
+        else:
+            model.compile(loss="mse", optimizer="rmsprop", metrics=["mape"])
 
         # Train the model
         hist = model.fit(
@@ -62,7 +193,9 @@ class ModelTrainer:
             y_train,
             batch_size=config["batch"],
             epochs=config["epochs"],
+            initial_epoch=initial_epoch,
             validation_split=0.05,
+            callbacks=self.get_callbacks(config, checkpoint_path, state_path, resume_state),
         )
 
         # Delete existing model if it exists
@@ -76,6 +209,11 @@ class ModelTrainer:
 
         # Save the model
         model.save(model_path)
+
+        # The finished model replaces the checkpoint
+        for path in (checkpoint_path, state_path, get_best_weights_path(checkpoint_path)):
+            if os.path.exists(path):
+                os.remove(path)
         
         # Save the scalers and encoder
         if self.flow_scaler is not None:
@@ -90,6 +228,11 @@ class ModelTrainer:
         # Flatten the X_train for the SAES model (now 14 features * LAG)
         X_train_flat = X_train.reshape(X_train.shape[0], -1)
 
+        # A checkpoint of the stacked model means pretraining already finished
+        if self.has_checkpoint(name, config):
+            self.train_model(models[-1], X_train_flat, y_train, name, config, print_loss)
+            return
+
         temp = X_train_flat
         for i in range(len(models) - 1):
             if i > 0:
@@ -107,6 +250,7 @@ class ModelTrainer:
                 batch_size=config["batch"],
                 epochs=config["epochs"],
                 validation_split=0.05,
+                callbacks=self.get_callbacks(config),
             )
             models[i] = m
 
@@ -119,13 +263,11 @@ class ModelTrainer:
         self.train_model(saes, X_train_flat, y_train, name, config, print_loss)
 
     def train_models(self, model_types, model_prefix, csv, print_loss):
-        config = {"batch": BATCH_SIZE, "epochs": EPOCHS}
+        config = self.get_config()
 
-        # Read the CSV file
-        df = pd.read_csv(csv, encoding="utf-8").fillna(0)
-        
-        # Process data including temporal features
-        X_train, y_train, self.flow_scaler, self.temporal_scaler, self.direction_encoder = process_temporal_data(df, LAG)
+        # Training windows of the chronological split, preprocessed once and cached
+        X_train, y_train, _, _, scalers = load_dataset(csv, LAG, HORIZONS)
+        self.flow_scaler, self.temporal_scaler, self.direction_encoder = scalers
 
         # For non-SAES models, reshape to (samples, timesteps, features)
         num_features = X_train.shape[2]  # Should be 14
@@ -136,7 +278,7 @@ class ModelTrainer:
 
         for model_type in model_types:
             model_name = model_prefix + model_type if model_prefix else model_type
-            model_instance = MODELS.get(model_type)
+            model_instance = get_model(model_type)
 
             if model_type == "saes":
                 self.train_saes(
@@ -155,13 +297,12 @@ class ModelTrainer:
 
         print(f"Training one model: {scat_number} {model_type}")
 
-        config = {"batch": BATCH_SIZE, "epochs": EPOCHS}
+        config = self.get_config()
 
-        # Load in traffic flow data
+        # Training windows of the chronological split, preprocessed once and cached
         csv_path = f"{SCATS_CSV_DIR_DIRECTION}/{scat_number}_trafficflow.csv"
-        df = pd.read_csv(csv_path, encoding="utf-8").fillna(0)
-
-        X_train, y_train, self.flow_scaler, self.temporal_scaler, self.direction_encoder = process_temporal_data(df, LAG)
+        X_train, y_train, _, _, scalers = load_dataset(csv_path, LAG, HORIZONS)
+        self.flow_scaler, self.temporal_scaler, self.direction_encoder = scalers
 
         # For non-SAES models, reshape to (samples, timesteps, features)
         num_features = X_train.shape[2]  # Should be 14
@@ -171,7 +312,7 @@ class ModelTrainer:
         X_train_saes = np.reshape(X_train, (X_train.shape[0], -1))
 
         model_name = f"{scat_number}_{model_type}"
-        model_instance = MODELS.get(model_type)
+        model_instance = get_model(model_type)
 
         if model_type == "saes":
             self.train_saes(model_instance, X_train_saes, y_train, model_name, config, False)
@@ -193,6 +334,12 @@ class ModelTrainer:
                 print(model_types)
                 self.train_models(model_types, model_prefix, path, False)
 
+def set_horizons(horizons):
+    global HORIZONS, MODELS
+
+    HORIZONS = horizons
+    MODELS = {}
+
 def main(argv):
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -215,11 +362,86 @@ def main(argv):
         "--one_model",
         help="Train just one scat model",
     )
+    parser.add_argument(
+        "--epochs",
+        help="Maximum training epochs (default 600)",
+        type=int,
+        default=EPOCHS,
+    )
+    parser.add_argument(
+        "--patience",
+        help="Epochs without a val_loss improvement before stopping (default 20)",
+        type=int,
+        default=PATIENCE,
+    )
+    parser.add_argument(
+        "--checkpoint_every",
+        help="Epochs between training checkpoints (default 5)",
+        type=int,
+        default=CHECKPOINT_EVERY,
+    )
+    parser.add_argument(
+        "--resume",
+        help="Resume interrupted training from its checkpoint, with its early stopping and learning rate state",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--horizons",
+        help="Future 15 minute slots each model forecasts (default 1)",
+        type=int,
+        default=HORIZONS,
+    )
+    parser.add_argument(
+        "--search",
+        help="Run a hyperparameter search with this many trials per --model type",
+        type=int,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Search trials to run in parallel",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--search_epochs",
+        help="Maximum epochs per search trial",
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        "--store",
+        help="SQLite file search results are recorded in",
+        default="./search_results.db",
+    )
+    parser.add_argument(
+        "--export",
+        help="Export every .keras model in a directory to .tflite (default MODEL_DIR)",
+        nargs="?",
+        const=MODEL_DIR,
+    )
 
     args = parser.parse_args()
-    trainer = ModelTrainer()
-
-    if args.one_model:
+    trainer = ModelTrainer(args.epochs, args.patience, args.checkpoint_every, args.resume)
+
+    if args.horizons != HORIZONS:
+        set_horizons(args.horizons)
+
+    if args.export:
+        from inference.tflite import export_directory
+        export_directory(args.export)
+    elif args.search:
+        from training.search import search
+        search(
+            args.model,
+            args.search,
+            TEST_CSV_DIRECTION,
+            LAG,
+            HORIZONS,
+            workers=args.workers,
+            epochs=args.search_epochs,
+            store_path=args.store,
+        )
+    elif args.one_model:
         trainer.train_one_model(args.one_model)
     elif args.scats:
         trainer.train_scats(args.model)
@@ -0,0 +1,17 @@
+# Training hyperparameters and data paths, kept free of keras so scripts that
+# only need them (test.py) don't pay for importing it
+
+# Hyperparameters
+EPOCHS = 600
+BATCH_SIZE = 256
+LAG = 4
+PATIENCE = 20  # epochs without a val_loss improvement before training stops
+LR_FACTOR = 0.5  # learning rate multiplier when val_loss plateaus
+MIN_LR = 1e-5
+CHECKPOINT_EVERY = 5  # epochs between checkpoints
+SCATS_CSV_DIR = "../training_data/traffic_flows"
+TEST_CSV = f"{SCATS_CSV_DIR}/970_N_trafficflow.csv"
+SCATS_CSV_DIR_DIRECTION = "../training_data/new_traffic_flows"
+TEST_CSV_DIRECTION = f"{SCATS_CSV_DIR_DIRECTION}/970_trafficflow.csv"
+
+MODEL_DIR = "./saved_test_models/"
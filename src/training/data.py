@@ -1,17 +1,18 @@
+import hashlib
+import os
+import shutil
+import tempfile
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
-from sklearn.model_selection import train_test_split
 
-def process_temporal_data(train_df, lags):
-    train_df['datetime'] = pd.to_datetime(train_df['15 Minutes'], dayfirst=True)
-    
-    # Extract temporal features
-    train_df['hour'] = train_df['datetime'].dt.hour
-    train_df['minute'] = train_df['datetime'].dt.minute
-    train_df['day_of_week'] = train_df['datetime'].dt.dayofweek
-    train_df['day_of_month'] = train_df['datetime'].dt.day
-    train_df['month'] = train_df['datetime'].dt.month
+from utilities.time import parse_slots, slot_temporal_features
+
+# sklearn is imported by the functions fitting scalers, keeping this module cheap to import
+
+def process_temporal_data(train_df, lags, horizons=1):
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
+    train_df['slot'] = parse_slots(train_df['15 Minutes'])
     
     # Normalize flow
     flow_scaler = MinMaxScaler(feature_range=(0, 1))
@@ -19,9 +20,7 @@ def process_temporal_data(train_df, lags):
     
     # Normalize temporal features
     temporal_scaler = MinMaxScaler(feature_range=(0, 1))
-    temporal_features = temporal_scaler.fit_transform(
-        train_df[['hour', 'minute', 'day_of_week', 'day_of_month', 'month']].values
-    )
+    temporal_features = temporal_scaler.fit_transform(slot_temporal_features(train_df['slot']))
     
     # One-hot encode direction
     direction_encoder = OneHotEncoder(
@@ -38,21 +37,183 @@ def process_temporal_data(train_df, lags):
         direction_encoded
     ])
     
-    # Create sequences for training
+    # Create sequences for training, each followed by the steps it forecasts
     train_data = []
-    for i in range(lags, len(flow)):
-        train_data.append(features[i - lags : i + 1])
+    for i in range(lags, len(flow) - horizons + 1):
+        train_data.append(features[i - lags : i + horizons])
     
     train_data = np.array(train_data)
     np.random.shuffle(train_data)
     
     # Split into X and y
-    X_train = train_data[:, :-1]  # All features except last timestep
-    y_train = train_data[:, -1, 0]  # Only the flow value from last timestep
+    X_train = train_data[:, :lags]  # The lagged timesteps
+    y_train = train_data[:, lags:, 0]  # The flow value of every forecast horizon
+
+    # Single horizon models keep a flat target
+    if horizons == 1:
+        y_train = y_train[:, 0]
     
     return X_train, y_train, flow_scaler, temporal_scaler, direction_encoder
 
+# Chronological splits and the preprocessed dataset cache. Windows are built per
+# direction, the last TEST_SIZE of the site's time span is held out and the flow
+# scaler is fitted on the training rows only, so nothing after the cutoff leaks
+# into training. load_dataset caches the arrays under DATASET_CACHE_DIR keyed by
+# the CSV contents, lag, horizons and feature set.
+
+DATASET_CACHE_DIR = "./dataset_cache"
+DATASET_VERSION = 1  # bump when the preprocessing changes to invalidate the cache
+TEST_SIZE = 0.2
+DIRECTIONS = ['N', 'S', 'E', 'W', 'NE', 'NW', 'SE', 'SW']
+
+# "temporal": flow (1) + temporal (5) + direction (8) = 14 features, the per-site models
+# "original": flow (1) + direction (8) = 9 features, the models in saved_models
+FEATURE_SETS = ("temporal", "original")
+
+# Fixed ranges of hour, minute, day of week, day of month and month, so the
+# temporal scaling doesn't depend on which days fall in the training split
+TEMPORAL_RANGES = [[0, 0, 0, 1, 1], [23, 45, 6, 31, 12]]
+
+
+def fit_scalers(train_rows):
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
+    flow_scaler = MinMaxScaler(feature_range=(0, 1))
+    flow_scaler.fit(train_rows['Lane 1 Flow (Veh/15 Minutes)'].values.reshape(-1, 1))
+
+    temporal_scaler = MinMaxScaler(feature_range=(0, 1)).fit(TEMPORAL_RANGES)
+
+    direction_encoder = OneHotEncoder(sparse_output=False, categories=[DIRECTIONS])
+    direction_encoder.fit(np.array(DIRECTIONS).reshape(-1, 1))
+
+    return flow_scaler, temporal_scaler, direction_encoder
+
+
+def build_features(df, scalers, feature_set="temporal"):
+    flow_scaler, temporal_scaler, direction_encoder = scalers
+
+    flow = flow_scaler.transform(df['Lane 1 Flow (Veh/15 Minutes)'].values.reshape(-1, 1))
+    direction_encoded = direction_encoder.transform(df['direction'].values.reshape(-1, 1))
+
+    if feature_set == "original":
+        return np.hstack([flow, direction_encoded])
+
+    temporal_features = temporal_scaler.transform(slot_temporal_features(df['slot']))
+    return np.hstack([flow, temporal_features, direction_encoded])
+
+
+def chronological_split(df, lags, horizons=1, test_size=TEST_SIZE, feature_set="temporal", scalers=None):
+    # Train windows forecast slots before the cutoff and test windows slots from it
+    # on, windows whose targets straddle it are dropped. Pass a model's saved scalers
+    # to build its inputs, otherwise they are fitted on the training rows.
+    if feature_set not in FEATURE_SETS:
+        raise ValueError(f"Unknown feature set: {feature_set}")
+
+    # Both sides of the cutoff need slots, and the cutoff has to index one
+    if not 0 < test_size < 1:
+        raise ValueError(f"test_size must be between 0 and 1, got {test_size}")
+
+    df = df.copy()
+    df['slot'] = parse_slots(df['15 Minutes'])
+
+    unique_slots = np.unique(df['slot'])
+    cutoff = unique_slots[int(len(unique_slots) * (1 - test_size))]
+
+    if scalers is None:
+        scalers = fit_scalers(df[df['slot'] < cutoff])
+
+    features = build_features(df, scalers, feature_set)
+    slots = df['slot'].to_numpy()
+
+    # Row positions of every window, each direction in time order (.indices are
+    # positions whatever the frame's index, .groups would be its labels)
+    windows = []
+    for _, rows in df.groupby('direction', sort=False).indices.items():
+        rows = np.asarray(rows)
+        rows = rows[np.argsort(slots[rows], kind="stable")]
+
+        if len(rows) >= lags + horizons:
+            windows.append(np.lib.stride_tricks.sliding_window_view(rows, lags + horizons))
+
+    windows = np.concatenate(windows)
+
+    # Interleave the directions by time, so a validation_split tail is the latest data
+    target_slots = slots[windows[:, lags:]]
+    order = np.argsort(target_slots[:, 0], kind="stable")
+    windows, target_slots = windows[order], target_slots[order]
+
+    train = target_slots[:, -1] < cutoff
+    test = target_slots[:, 0] >= cutoff
+
+    data = features[windows]
+    X, y = data[:, :lags], data[:, lags:, 0]
+
+    # Single horizon models keep a flat target
+    if horizons == 1:
+        y = y[:, 0]
+
+    return X[train], y[train], X[test], y[test], scalers
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def dataset_cache_path(csv_path, lags, horizons, test_size, feature_set, cache_dir):
+    key = f"{file_hash(csv_path)}-{lags}-{horizons}-{test_size}-{feature_set}-{DATASET_VERSION}"
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+
+    return os.path.join(cache_dir, f"{stem}_{hashlib.sha256(key.encode()).hexdigest()[:16]}")
+
+
+def load_dataset(csv_path, lags, horizons=1, test_size=TEST_SIZE, feature_set="temporal", cache_dir=DATASET_CACHE_DIR):
+    # chronological_split of a site CSV, read from the .npy cache when the CSV and
+    # settings haven't changed. Returns X_train, y_train, X_test, y_test and the
+    # (flow_scaler, temporal_scaler, direction_encoder) the windows were scaled with
+    path = dataset_cache_path(csv_path, lags, horizons, test_size, feature_set, cache_dir)
+    names = ["X_train", "y_train", "X_test", "y_test"]
+
+    if os.path.isdir(path):
+        arrays = [np.load(os.path.join(path, f"{name}.npy")) for name in names]
+        saved = np.load(os.path.join(path, "scalers.npz"), allow_pickle=True)
+        scalers = tuple(saved[name].item() for name in ("flow_scaler", "temporal_scaler", "direction_encoder"))
+
+        return (*arrays, scalers)
+
+    df = pd.read_csv(csv_path, encoding="utf-8").fillna(0)
+    *arrays, scalers = chronological_split(df, lags, horizons, test_size, feature_set)
+
+    # Written to a temporary directory and renamed into place, so a concurrent
+    # reader never sees a partial entry
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = tempfile.mkdtemp(dir=cache_dir)
+
+    for name, array in zip(names, arrays):
+        np.save(os.path.join(temp_path, f"{name}.npy"), array.astype(np.float32))
+
+    np.savez(
+        os.path.join(temp_path, "scalers.npz"),
+        flow_scaler=scalers[0],
+        temporal_scaler=scalers[1],
+        direction_encoder=scalers[2]
+    )
+
+    try:
+        os.rename(temp_path, path)
+    except OSError:
+        shutil.rmtree(temp_path)  # another process cached it first
+
+    return (*[array.astype(np.float32) for array in arrays], scalers)
+
 def original_process(train, lags):
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
     attr = "Lane 1 Flow (Veh/15 Minutes)"
     direction_attr = "direction"
 
@@ -99,6 +260,8 @@ def original_process(train, lags):
 
 
 def original_process_test(train, lags):
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
     attr = "Lane 1 Flow (Veh/15 Minutes)"
     direction_attr = "direction"
     # Read CSV file
@@ -122,6 +285,8 @@ def original_process_test(train, lags):
     X_data = train_data[:, :-1]  # All features except the last one for training
     y_data = train_data[:, -1, 0]  # The target is the flow column
     # Split into training and testing sets
+    from sklearn.model_selection import train_test_split
+
     X_train, X_test, y_train, y_test = train_test_split(
         X_data, y_data, test_size=0.2, shuffle=False
     )
@@ -0,0 +1,90 @@
+# Library Imports
+import time
+import numpy as np
+import pandas as pd
+
+# Held-out split, error metrics and latency timing shared by evaluate.py and
+# inference/optimize.py, so the fleet evaluation and the optimization report
+# score models the same way.
+
+LAG = 4
+
+
+def load_split(csv_path, model_type, scalers, lag=LAG):
+    # Chronological split of a site, scaled with the model's own saved scalers
+    from training.data import chronological_split
+
+    df = pd.read_csv(csv_path, encoding="utf-8").fillna(0)
+    X_train, y_train, X_test, y_test, _ = chronological_split(df, lag, scalers=scalers)
+
+    X_train, X_test = X_train.astype(np.float32), X_test.astype(np.float32)
+
+    if model_type == "saes":
+        X_train, X_test = X_train.reshape(len(X_train), -1), X_test.reshape(len(X_test), -1)
+
+    return X_train, y_train, X_test, y_test
+
+
+def load_scalers(scaler_path):
+    saved = np.load(scaler_path, allow_pickle=True)
+    return tuple(saved[name].item() for name in ("flow_scaler", "temporal_scaler", "direction_encoder"))
+
+
+def error_metrics(y_true, y_pred):
+    y_true = np.asarray(y_true, dtype=np.float64).reshape(-1)
+    y_pred = np.asarray(y_pred, dtype=np.float64).reshape(-1)
+    errors = y_pred - y_true
+
+    # Percentage error over the slots with traffic, zero flows make it unbounded
+    nonzero = y_true > 0
+
+    return {
+        "mae": float(np.mean(np.abs(errors))),
+        "rmse": float(np.sqrt(np.mean(errors ** 2))),
+        "mape": float(np.mean(np.abs(errors[nonzero] / y_true[nonzero])) * 100),
+    }
+
+
+def predict_batched(model, X, batch_size):
+    predictions = []
+
+    for start in range(0, len(X), batch_size):
+        batch = X[start:start + batch_size]
+
+        # First horizon of each prediction, the slot the held-out targets hold
+        predictions.append(np.asarray(model.predict(batch, verbose=0)).reshape(len(batch), -1)[:, 0])
+
+    return np.concatenate(predictions)
+
+
+def single_sample_latency(model, X, repeats=50):
+    # Median time of a single sample call, the shape routing predicts with
+    sample = X[:1]
+    model.predict(sample, verbose=0)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(sample, verbose=0)
+        timings.append(time.perf_counter() - start)
+
+    return float(np.median(timings) * 1000)
+
+
+def evaluate_model(model, X_test, y_test, flow_scaler, batch_size=512, repeats=50):
+    # Accuracy in vehicles per 15 minutes over the held-out set, with the single
+    # sample latency and batched throughput of the model
+    model.predict(X_test[:batch_size], verbose=0)  # warm up
+
+    start = time.perf_counter()
+    y_pred = predict_batched(model, X_test, batch_size)
+    duration = time.perf_counter() - start
+
+    y_true = flow_scaler.inverse_transform(y_test.reshape(-1, 1)).reshape(-1)
+    y_pred = flow_scaler.inverse_transform(y_pred.reshape(-1, 1)).reshape(-1)
+
+    return {
+        **error_metrics(y_true, y_pred),
+        "latency_ms": single_sample_latency(model, X_test, repeats),
+        "throughput": len(X_test) / duration,
+    }
@@ -117,16 +117,16 @@ def old_get_cnn(units):
     model.add(Dense(units[2], activation='sigmoid'))
     return model
 
-def get_cnn(units):
+def get_cnn(units, filters=(128, 256)):
     model = Sequential()
     # First Conv Block
-    model.add(Conv1D(filters=128, kernel_size=5, padding='same', input_shape=(units[0], 14)))
+    model.add(Conv1D(filters=filters[0], kernel_size=5, padding='same', input_shape=(units[0], 14)))
     model.add(BatchNormalization())
     model.add(Activation('relu'))
     model.add(MaxPooling1D(pool_size=2))
     model.add(Dropout(0.3))
     # Second Conv Block
-    model.add(Conv1D(filters=256, kernel_size=3, padding='same'))
+    model.add(Conv1D(filters=filters[1], kernel_size=3, padding='same'))
     model.add(BatchNormalization())
     model.add(Activation('relu'))
     model.add(MaxPooling1D(pool_size=2))
@@ -136,4 +136,16 @@ def get_cnn(units):
     model.add(Dense(units[1], activation='relu'))
     model.add(Dropout(0.3))
     model.add(Dense(units[2], activation='sigmoid'))
-    return model
\ No newline at end of file
+    return model
+
+MODEL_BUILDERS = {
+    "lstm": lambda lag, horizons: get_lstm([lag, 64, 64, horizons]),
+    "gru": lambda lag, horizons: get_gru([lag, 64, 64, horizons]),
+    "saes": lambda lag, horizons: get_saes([lag, 128, 64, 32, horizons]),
+    "cnn": lambda lag, horizons: get_cnn([lag, 128, horizons]),
+}
+
+def get_model(model_type, lag, horizons=1):
+    # The output head of every model emits one flow per future 15 minute horizon,
+    # so a single forward pass forecasts the next `horizons` slots
+    return MODEL_BUILDERS[model_type](lag, horizons)
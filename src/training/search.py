@@ -0,0 +1,281 @@
+# Project Imports
+import utilities.logger as logger
+
+# Library Imports
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+import numpy as np
+
+# Random search over model size, batch size and learning rate per model type.
+# Trials run in parallel worker processes, are pruned once their validation loss
+# falls behind the median of earlier trials at the same epoch, and every trial is
+# recorded in a local sqlite store so searches can be resumed and compared.
+
+DEFAULT_STORE = "./search_results.db"
+WARMUP_EPOCHS = 5  # epochs every trial runs before it can be pruned
+MIN_PRUNING_TRIALS = 3  # trials needed at an epoch before its median is trusted
+
+LEARNING_RATES = (1e-4, 1e-2)  # sampled log uniformly
+BATCH_SIZES = [64, 128, 256, 512]
+
+SEARCH_SPACES = {
+    "lstm": {"units1": [16, 32, 64, 128], "units2": [16, 32, 64]},
+    "gru": {"units1": [16, 32, 64, 128], "units2": [16, 32, 64]},
+    "saes": {"hidden1": [32, 64, 128, 256], "hidden2": [16, 32, 64], "hidden3": [8, 16, 32], "dropout": [0.0, 0.1, 0.2, 0.3]},
+    "cnn": {"filters1": [16, 32, 64, 128], "filters2": [32, 64, 128, 256], "dense": [32, 64, 128]},
+}
+
+
+def sample_params(model_type, rng):
+    params = {name: rng.choice(choices) for name, choices in SEARCH_SPACES[model_type].items()}
+    params["batch"] = rng.choice(BATCH_SIZES)
+    params["learning_rate"] = 10 ** rng.uniform(np.log10(LEARNING_RATES[0]), np.log10(LEARNING_RATES[1]))
+    return params
+
+
+def build_model(model_type, params, lag, horizons):
+    from training.model import get_lstm, get_gru, get_saes, get_cnn
+
+    if model_type == "lstm":
+        return get_lstm([lag, params["units1"], params["units2"], horizons])
+    if model_type == "gru":
+        return get_gru([lag, params["units1"], params["units2"], horizons])
+    if model_type == "saes":
+        # The combined stack only, trained end to end without layer-wise pretraining
+        layers = [lag, params["hidden1"], params["hidden2"], params["hidden3"], horizons]
+        return get_saes(layers, params["dropout"])[-1]
+    if model_type == "cnn":
+        return get_cnn([lag, params["dense"], horizons], (params["filters1"], params["filters2"]))
+
+    raise ValueError(f"No search space for model type: {model_type}")
+
+
+def connect(store_path):
+    connection = sqlite3.connect(store_path, timeout=60)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS trials ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, study TEXT, model_type TEXT, params TEXT, state TEXT,"
+        "val_loss REAL, epochs INTEGER, parameters INTEGER, latency_ms REAL, duration REAL, created REAL)"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS epochs ("
+        "trial_id INTEGER, epoch INTEGER, val_loss REAL, PRIMARY KEY (trial_id, epoch))"
+    )
+    return connection
+
+
+def create_trial(store_path, study, model_type, params):
+    with connect(store_path) as connection:
+        cursor = connection.execute(
+            "INSERT INTO trials (study, model_type, params, state, created) VALUES (?, ?, ?, 'running', ?)",
+            (study, model_type, json.dumps(params), time.time()),
+        )
+        return cursor.lastrowid
+
+
+def should_prune(store_path, study, trial_id, epoch, best_val_loss):
+    # Median rule: prune when this trial's best loss so far is worse than the median
+    # loss the study's other trials had reached by the same epoch
+    with connect(store_path) as connection:
+        rows = connection.execute(
+            "SELECT MIN(e.val_loss) FROM epochs e JOIN trials t ON t.id = e.trial_id "
+            "WHERE t.study = ? AND t.id != ? AND e.epoch <= ? GROUP BY t.id "
+            "HAVING MAX(e.epoch) >= ?",
+            (study, trial_id, epoch, epoch),
+        ).fetchall()
+
+    if len(rows) < MIN_PRUNING_TRIALS:
+        return False
+
+    return best_val_loss > float(np.median([row[0] for row in rows]))
+
+
+def make_pruning_callback(store_path, study, trial_id):
+    from keras.callbacks import Callback
+
+    class PruningCallback(Callback):
+        def __init__(self):
+            super().__init__()
+            self.best_val_loss = float("inf")
+            self.pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            val_loss = float(logs["val_loss"])
+            self.best_val_loss = min(self.best_val_loss, val_loss)
+
+            with connect(store_path) as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO epochs (trial_id, epoch, val_loss) VALUES (?, ?, ?)",
+                    (trial_id, epoch, val_loss),
+                )
+
+            if epoch + 1 >= WARMUP_EPOCHS and should_prune(store_path, study, trial_id, epoch, self.best_val_loss):
+                self.pruned = True
+                self.model.stop_training = True
+
+    return PruningCallback()
+
+
+def measure_latency(model, X, repeats=50):
+    # Median time of a single sample call through the compiled prediction backend
+    from inference.compiled import CompiledModel
+
+    compiled = CompiledModel(model)
+    sample = X[:1]
+    compiled.predict(sample)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        compiled.predict(sample)
+        timings.append(time.perf_counter() - start)
+
+    return float(np.median(timings) * 1000)
+
+
+def run_trial(trial_id, study, model_type, params, X_train, y_train, store_path, epochs, patience, lag, horizons, threads=None):
+    start = time.perf_counter()
+
+    import tensorflow as tf
+
+    if threads:
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(threads)
+        except RuntimeError:
+            pass  # TensorFlow is already running in this process
+
+    import keras
+    from keras.callbacks import EarlyStopping
+
+    try:
+        model = build_model(model_type, params, lag, horizons)
+        model.compile(
+            loss="mse",
+            optimizer=keras.optimizers.RMSprop(learning_rate=params["learning_rate"]),
+            metrics=["mape"],
+        )
+
+        X = X_train.reshape(len(X_train), -1) if model_type == "saes" else X_train
+        pruning = make_pruning_callback(store_path, study, trial_id)
+
+        hist = model.fit(
+            X,
+            y_train,
+            batch_size=params["batch"],
+            epochs=epochs,
+            validation_split=0.05,
+            verbose=0,
+            callbacks=[
+                EarlyStopping(monitor="val_loss", patience=patience, mode="min", restore_best_weights=True),
+                pruning,
+            ],
+        )
+
+        result = {
+            "state": "pruned" if pruning.pruned else "complete",
+            "val_loss": float(min(hist.history["val_loss"])),
+            "epochs": len(hist.history["val_loss"]),
+            "parameters": int(model.count_params()),
+            "latency_ms": measure_latency(model, X),
+        }
+    except Exception as e:
+        logger.log(f"Trial {trial_id} failed: {e}")
+        result = {"state": "failed", "val_loss": None, "epochs": None, "parameters": None, "latency_ms": None}
+
+    result["duration"] = time.perf_counter() - start
+
+    with connect(store_path) as connection:
+        connection.execute(
+            "UPDATE trials SET state = ?, val_loss = ?, epochs = ?, parameters = ?, latency_ms = ?, duration = ? WHERE id = ?",
+            (result["state"], result["val_loss"], result["epochs"], result["parameters"],
+             result["latency_ms"], result["duration"], trial_id),
+        )
+
+    return trial_id, result
+
+
+def report(store_path, study, top=5, tolerance=0.05):
+    with connect(store_path) as connection:
+        rows = connection.execute(
+            "SELECT id, params, val_loss, epochs, parameters, latency_ms FROM trials "
+            "WHERE study = ? AND state = 'complete' ORDER BY val_loss",
+            (study,),
+        ).fetchall()
+        counts = dict(connection.execute(
+            "SELECT state, COUNT(*) FROM trials WHERE study = ? GROUP BY state", (study,)
+        ).fetchall())
+
+    print(f"------------  {study}: {counts}  ------------")
+
+    if not rows:
+        return None
+
+    print(f"{'trial':>6}{'val_loss':>12}{'epochs':>8}{'params':>10}{'latency ms':>12}  settings")
+    for trial_id, params, val_loss, epochs, parameters, latency_ms in rows[:top]:
+        print(f"{trial_id:>6}{val_loss:>12.6f}{epochs:>8}{parameters:>10}{latency_ms:>12.3f}  {params}")
+
+    # The cheapest model whose accuracy is within tolerance of the best
+    best_loss = rows[0][2]
+    candidates = [row for row in rows if row[2] <= best_loss * (1 + tolerance)]
+    smallest = min(candidates, key=lambda row: (row[4], row[5]))
+
+    print(f"Smallest model within {tolerance:.0%} of the best val_loss: trial {smallest[0]} "
+          f"({smallest[4]} params, {smallest[5]:.3f} ms) {smallest[1]}")
+
+    return smallest
+
+
+def search(model_types, trials, csv, lag, horizons=1, workers=1, epochs=100, patience=10,
+           store_path=DEFAULT_STORE, seed=0):
+    from training.data import load_dataset
+
+    # Every trial trains on the same cached chronological training windows, and
+    # validates on their latest slots
+    X_train, y_train, *_ = load_dataset(csv, lag, horizons)
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    for model_type in model_types:
+        study = f"{model_type}_{Path(csv).stem}_lag{lag}_h{horizons}_e{epochs}"
+
+        with connect(store_path) as connection:
+            existing = connection.execute("SELECT COUNT(*) FROM trials WHERE study = ?", (study,)).fetchone()[0]
+
+        # Continue the sampling sequence of earlier runs of the same study
+        rng = random.Random(f"{seed}-{study}")
+        for _ in range(existing):
+            sample_params(model_type, rng)
+
+        logger.log(f"Searching {trials} {model_type} trials ({existing} already in {store_path}) with {workers} workers")
+
+        pending = []
+        for _ in range(trials):
+            params = sample_params(model_type, rng)
+            trial_id = create_trial(store_path, study, model_type, params)
+            pending.append((trial_id, study, model_type, params, X_train, y_train, store_path, epochs, patience, lag, horizons, threads))
+
+        executor = None
+        if workers == 1:
+            results = (run_trial(*trial) for trial in pending)
+        else:
+            # Spawned workers so every trial gets a fresh TensorFlow runtime
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            results = (future.result() for future in as_completed([executor.submit(run_trial, *trial) for trial in pending]))
+
+        try:
+            for trial_id, result in results:
+                logger.log(f"Trial {trial_id} {result['state']}: val_loss {result['val_loss']}, "
+                           f"{result['epochs']} epochs, {result['parameters']} params, {result['duration']:.1f}s")
+        finally:
+            # Also when a trial raises, so the spawned workers don't outlive the search
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        report(store_path, study)
@@ -1,5 +1,59 @@
 from datetime import datetime
+import json
+import os
 
-def log(message):
-    # Print current time only and the message
-    print(f'[{datetime.now().strftime("%H:%M:%S")}]: {message}')
\ No newline at end of file
+# Leveled logging. log() is the info level; debug() is for per call detail on the
+# hot paths and costs a single comparison while the level is above it, so pass
+# values as %-style args rather than formatting the message up front.
+# TPS_LOG_LEVEL=debug|info|warning|error sets the level, TPS_LOG_FORMAT=json writes
+# one JSON object per line with any keyword fields.
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LEVEL = LEVELS.get(os.environ.get("TPS_LOG_LEVEL", "info").lower(), LEVELS["info"])
+JSON_FORMAT = os.environ.get("TPS_LOG_FORMAT", "").lower() == "json"
+
+def set_level(level):
+    global LEVEL
+    LEVEL = LEVELS[level]
+
+def set_json_format(enabled):
+    global JSON_FORMAT
+    JSON_FORMAT = enabled
+
+def is_enabled(level):
+    return LEVELS[level] >= LEVEL
+
+def emit(level, message, args, fields):
+    if args:
+        message = message % args
+
+    now = datetime.now()
+
+    if JSON_FORMAT:
+        print(json.dumps({"time": now.isoformat(timespec="milliseconds"), "level": level, "message": message, **fields}, default=str))
+        return
+
+    if fields:
+        message += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+
+    # Print current time only and the message, tagged with the level unless it's info
+    if level == "info":
+        print(f'[{now.strftime("%H:%M:%S")}]: {message}')
+    else:
+        print(f'[{now.strftime("%H:%M:%S")}] {level.upper()}: {message}')
+
+def debug(message, *args, **fields):
+    if LEVEL <= 10:
+        emit("debug", message, args, fields)
+
+def log(message, *args, **fields):
+    if LEVEL <= 20:
+        emit("info", message, args, fields)
+
+def warning(message, *args, **fields):
+    if LEVEL <= 30:
+        emit("warning", message, args, fields)
+
+def error(message, *args, **fields):
+    if LEVEL <= 40:
+        emit("error", message, args, fields)
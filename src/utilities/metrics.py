@@ -0,0 +1,226 @@
+# Library Imports
+from bisect import bisect_left
+from contextlib import contextmanager
+import atexit
+import functools
+import os
+import threading
+import time
+
+# In-process metrics registry, rendered in the Prometheus text format. Metrics are
+# registered at import by the modules that update them and are always on; an
+# update is a dict lookup and an add under a lock.
+#
+#   PREDICTIONS = metrics.counter("tps_predictions_total", "Flows predicted", ["model"])
+#   PREDICTIONS.labels("lstm").inc(4)
+#
+# server.py serves them at GET /metrics; TPS_METRICS_FILE=<path> (or start_file_export)
+# rewrites a file periodically and at exit, e.g. for node_exporter's textfile collector.
+
+# Latency buckets in seconds, from a cached lookup up to a slow search
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EXPORT_INTERVAL = 15  # seconds between file exports
+
+registry = {}
+_lock = threading.Lock()
+
+
+def format_value(value):
+    # Every significant digit, so a large counter still moves by single increments
+    value = float(value)
+
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(value)
+
+
+class CounterChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # per bucket, the last one is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+
+    def labels(self, *values):
+        # Label values are given in labelnames order, as strings
+        child = self.children.get(values)
+
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+
+            with _lock:
+                child = self.children.setdefault(values, self.make_child())
+
+        return child
+
+    def label_text(self, values, extra=None):
+        pairs = list(zip(self.labelnames, values)) + (extra or [])
+
+        if not pairs:
+            return ""
+
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def make_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            yield f"{self.name}{self.label_text(values)} {format_value(child.value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def make_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                yield f"{self.name}_bucket{self.label_text(values, [('le', le)])} {cumulative}"
+
+            yield f"{self.name}_sum{self.label_text(values)} {format_value(total)}"
+            yield f"{self.name}_count{self.label_text(values)} {cumulative}"
+
+
+def register(metric_class, name, help_text, labelnames=(), **kwargs):
+    # Registering a name again returns the existing metric, so modules can share one
+    with _lock:
+        metric = registry.get(name)
+
+        if metric is None:
+            metric = registry[name] = metric_class(name, help_text, labelnames, **kwargs)
+        elif not isinstance(metric, metric_class) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} is already registered differently")
+
+    return metric
+
+
+def counter(name, help_text, labelnames=()):
+    return register(Counter, name, help_text, labelnames)
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+
+def timed(histogram_child):
+    # Decorator observing the duration of every call of a function
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram_child.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def render():
+    lines = []
+
+    for name, metric in sorted(registry.items()):
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric.samples())
+
+    return "\n".join(lines) + "\n"
+
+
+def write(path):
+    # Written beside the target and renamed, so a reader never sees half a file
+    temp_path = f"{path}.tmp"
+
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+
+    os.replace(temp_path, path)
+
+
+def start_file_export(path, interval=EXPORT_INTERVAL):
+    def export_loop():
+        while True:
+            time.sleep(interval)
+            write(path)
+
+    threading.Thread(target=export_loop, name="metrics-export", daemon=True).start()
+    atexit.register(write, path)
+
+
+# Shared by the modules that time their stages
+STAGE_SECONDS = histogram("tps_stage_seconds", "Time spent per pipeline stage", ["stage"])
+
+if os.environ.get("TPS_METRICS_FILE"):
+    start_file_export(os.environ["TPS_METRICS_FILE"])
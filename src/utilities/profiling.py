@@ -0,0 +1,141 @@
+# Project Imports
+import utilities.logger as logger
+
+# Library Imports
+from collections import Counter
+from contextlib import contextmanager
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+
+# Profiles one routing query (or any block) and writes, to the given directory:
+#   <name>.prof    the raw cProfile stats, for pstats / snakeviz
+#   <name>.txt     per function report of the routing code, by cumulative time
+#   <name>.folded  collapsed stacks from a sampling thread, for flamegraph.pl or
+#                  https://speedscope.app (cProfile only keeps caller / callee pairs)
+# Report lines and stacks are limited to FOCUS_MODULES; stacks start at the first
+# routing frame, so the GUI or server code above it is left out.
+
+FOCUS_MODULES = ("algorithms", "predict", "inference")
+SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+REPORT_LINES = 40
+
+# The switch interval is process wide, so overlapping profiles (the server's search
+# threads) share one override: set by the first to start, restored by the last to end
+_switch_lock = threading.Lock()
+_active_profiles = 0
+_saved_switch_interval = None
+
+
+def is_focus(module):
+    return module is not None and module.split(".")[0] in FOCUS_MODULES
+
+
+class StackSampler(threading.Thread):
+    # Samples one thread's Python stack every interval, counting each distinct stack
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            frames = []
+            while frame is not None:
+                frames.append((frame.f_globals.get("__name__"), frame.f_code.co_name))
+                frame = frame.f_back
+
+            frames.reverse()
+
+            # Root the stack at the first routing frame, skip samples outside of it
+            first = next((index for index, (module, _) in enumerate(frames) if is_focus(module)), None)
+            if first is not None:
+                self.stacks[";".join(f"{module}:{name}" for module, name in frames[first:])] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def write_report(profiler, path):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats("cumulative")
+
+    # pstats restricts by a regex over "file:line(function)"
+    focus = "|".join(re.escape(os.sep + module) for module in FOCUS_MODULES)
+    stats.print_stats(focus, REPORT_LINES)
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(stream.getvalue())
+
+
+def write_folded(stacks, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, samples in stacks.most_common():
+            f.write(f"{stack} {samples}\n")
+
+
+def begin_fast_switching():
+    # Let the sampler in more often than the default 5ms switch interval
+    global _active_profiles, _saved_switch_interval
+
+    with _switch_lock:
+        if _active_profiles == 0:
+            _saved_switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(SAMPLE_INTERVAL / 2)
+
+        _active_profiles += 1
+
+
+def end_fast_switching():
+    global _active_profiles
+
+    with _switch_lock:
+        _active_profiles -= 1
+
+        if _active_profiles == 0:
+            sys.setswitchinterval(_saved_switch_interval)
+
+
+@contextmanager
+def profile(output_dir, name):
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, name)
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident())
+
+    begin_fast_switching()
+    sampler.start()
+    start = time.perf_counter()
+    profiler.enable()
+
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+        end_fast_switching()
+
+        profiler.dump_stats(f"{base}.prof")
+        write_report(profiler, f"{base}.txt")
+        write_folded(sampler.stacks, f"{base}.folded")
+
+        logger.log(f"Profiled {name} in {elapsed:.2f}s ({sum(sampler.stacks.values())} samples), wrote {base}.txt, .folded and .prof")
+
+
+def profile_name(*parts):
+    # File name for one profiled query, e.g. route_2000_3002_11020060800_1700000000123
+    label = "_".join(re.sub(r"[^0-9A-Za-z]+", "", str(part)) for part in parts)
+    return f"{label}_{int(time.time() * 1000)}"
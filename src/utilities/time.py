@@ -1,19 +1,94 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
 
 from utilities import logger
 
+# Times are modelled as integer 15 minute slots since the epoch, the resolution
+# of the traffic data and the models
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOT_NANOSECONDS = SLOT_MINUTES * 60 * 10**9
+EPOCH = datetime(1970, 1, 1)
+DATE_TIME_FORMAT = "%d/%m/%Y %H:%M"
+
+@lru_cache(maxsize=65536)
+def parse_date_time(date_time):
+    # Fast path for the "d/m/yyyy HH:MM" strings used everywhere, falling back to strptime
+    try:
+        date, time = date_time.split(" ")
+        day, month, year = date.split("/")
+        hour, minute = time.split(":")
+
+        if len(year) != 4:
+            raise ValueError(date_time)
+
+        return datetime(int(year), int(month), int(day), int(hour), int(minute))
+    except ValueError:
+        return datetime.strptime(date_time, DATE_TIME_FORMAT)
+
+def to_slot(date_time):
+    # Slot index of a datetime or "d/m/yyyy HH:MM" string, rounded down to its 15 minutes
+    if isinstance(date_time, str):
+        date_time = parse_date_time(date_time)
+
+    return int((date_time - EPOCH).total_seconds() // (SLOT_MINUTES * 60))
+
+def slot_to_datetime(slot):
+    return EPOCH + timedelta(minutes=SLOT_MINUTES * int(slot))
+
+def format_slot(slot):
+    # Same "d/m/yyyy HH:MM" layout format_date_universal produces
+    date_time = slot_to_datetime(slot)
+    return f"{date_time.day}/{date_time.month}/{date_time.year} {date_time.hour:02d}:{date_time.minute:02d}"
+
+def parse_slots(date_times):
+    # Vectorised slot indexes for an array of "d/m/yyyy HH:MM" strings or timestamps
+    try:
+        parsed = pd.to_datetime(date_times, format=DATE_TIME_FORMAT)
+    except (ValueError, TypeError):
+        parsed = pd.to_datetime(date_times, dayfirst=True)
+
+    return np.asarray(parsed, dtype="datetime64[ns]").astype(np.int64) // SLOT_NANOSECONDS
+
+def slots_to_datetimes(slots):
+    return (np.asarray(slots, dtype=np.int64) * SLOT_NANOSECONDS).astype("datetime64[ns]")
+
+def slot_temporal_features(slots):
+    # hour, minute, day of week, day of month and month for an array of slots
+    slots = np.asarray(slots, dtype=np.int64)
+    days = (slots // SLOTS_PER_DAY).astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    slot_of_day = slots % SLOTS_PER_DAY
+
+    return np.column_stack([
+        slot_of_day // (60 // SLOT_MINUTES),
+        slot_of_day % (60 // SLOT_MINUTES) * SLOT_MINUTES,
+        (slots // SLOTS_PER_DAY + 3) % 7,  # 1/1/1970 was a Thursday
+        (days - months).astype(np.int64) + 1,
+        months.astype(np.int64) % 12 + 1
+    ])
+
+@lru_cache(maxsize=4096)
 def round_to_nearest_15_minutes(time_str):
     formats = ["%H:%M", "%I:%M %p"]  # 24-hour and 12-hour formats
 
-    for fmt in formats:
-        try:
-            # Try parsing with the current format
-            time_obj = datetime.strptime(time_str, fmt)
-            break
-        except ValueError:
-            continue
+    # Fast path for 24-hour "HH:MM"
+    hour, _, minute = time_str.partition(":")
+    if hour.isdigit() and minute.isdigit() and int(hour) < 24 and int(minute) < 60:
+        time_obj = datetime(1900, 1, 1, int(hour), int(minute))
     else:
-        raise ValueError(f"Unable to parse time string: {time_str}")
+        for fmt in formats:
+            try:
+                # Try parsing with the current format
+                time_obj = datetime.strptime(time_str, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"Unable to parse time string: {time_str}")
 
     # Round the time to the nearest 15 minutes
     minutes = time_obj.minute + time_obj.second / 60.0
@@ -28,8 +103,18 @@ def round_to_nearest_15_minutes(time_str):
 
     return time_obj.strftime("%H:%M")
 
+@lru_cache(maxsize=4096)
 def format_date_universal(date_str):
-    date_obj = datetime.strptime(date_str, '%d/%m/%Y')
+    try:
+        day, month, year = date_str.split("/")
+
+        if len(year) != 4:
+            raise ValueError(date_str)
+
+        date_obj = datetime(int(year), int(month), int(day))
+    except ValueError:
+        date_obj = datetime.strptime(date_str, '%d/%m/%Y')
+
     day = str(date_obj.day)
     month = str(date_obj.month)
     year = str(date_obj.year)
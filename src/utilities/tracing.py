@@ -0,0 +1,165 @@
+# Library Imports
+from collections import defaultdict
+from contextlib import contextmanager
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+# Timing spans and counters for the routing hot paths: graph build, model load,
+# feature assembly, inference and search. Disabled, span() hands back a shared
+# no-op context and count() returns straight away.
+#
+# Enable without code changes by setting TPS_TRACE to an output file; the trace is
+# written when the process exits, as a Chrome trace (load it in chrome://tracing or
+# https://ui.perfetto.dev) unless the file name ends in .summary.json, which writes
+# per span totals and the counters instead:
+#   TPS_TRACE=route.trace.json python server.py
+
+ENABLED = False
+
+events = []  # (name, thread id, start ns, duration ns, args)
+counters = defaultdict(float)
+counter_events = []  # (name, time ns, value) for the Chrome trace counter tracks
+
+_lock = threading.Lock()
+_origin = time.perf_counter_ns()
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        events.append((self.name, threading.get_ident(), self.start - _origin, end - self.start, self.args))
+        return False
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    with _lock:
+        events.clear()
+        counters.clear()
+        counter_events.clear()
+
+
+def span(name, **args):
+    if not ENABLED:
+        return NULL_SPAN
+
+    return Span(name, args)
+
+
+def traced(name):
+    # Decorator form of span() for whole functions
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+
+            with Span(name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, value=1):
+    if not ENABLED:
+        return
+
+    with _lock:
+        counters[name] += value
+        counter_events.append((name, time.perf_counter_ns() - _origin, counters[name]))
+
+
+def summary():
+    # Calls, total and mean milliseconds per span name, and the counter totals
+    spans = {}
+
+    for name, _, _, duration, _ in list(events):
+        entry = spans.setdefault(name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+        entry["calls"] += 1
+        entry["total_ms"] += duration / 1e6
+        entry["max_ms"] = max(entry["max_ms"], duration / 1e6)
+
+    for entry in spans.values():
+        entry["mean_ms"] = entry["total_ms"] / entry["calls"]
+
+    return {"spans": spans, "counters": dict(counters)}
+
+
+def chrome_trace():
+    pid = os.getpid()
+
+    trace_events = [
+        {"name": name, "ph": "X", "pid": pid, "tid": tid, "ts": start / 1000, "dur": duration / 1000, "args": args}
+        for name, tid, start, duration, args in list(events)
+    ]
+    trace_events += [
+        {"name": name, "ph": "C", "pid": pid, "ts": timestamp / 1000, "args": {name: value}}
+        for name, timestamp, value in list(counter_events)
+    ]
+
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def export(path):
+    data = summary() if path.endswith(".summary.json") else chrome_trace()
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, default=str)
+
+    return path
+
+
+@contextmanager
+def recording(path=None):
+    # Traces the enclosed block, exporting it to path if one is given
+    reset()
+    enable()
+
+    try:
+        yield
+    finally:
+        disable()
+
+        if path:
+            export(path)
+
+
+if os.environ.get("TPS_TRACE"):
+    enable()
+    atexit.register(export, os.environ["TPS_TRACE"])